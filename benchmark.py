@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+词库生成性能测试工具
+
+主要功能：
+1. 使用synthetic_corpus生成指定规模的五种格式合成语料
+2. 分别测量数据源解析、去重排序、音节切分、双拼转换、双拼词库生成和完整构建的耗时
+3. 将结果以JSON格式写出，便于比较不同版本的性能
+
+使用方法:
+    python benchmark.py [options]
+
+选项:
+    --sizes LIST           逗号分隔的语料规模(每种格式的条目数) (默认: 10k)
+    --repeat N             每项测试的重复次数，取最短耗时 (默认: 3)
+    --output FILE          结果文件路径 (默认: benchmark_results.json)
+    --work-dir DIR         语料和构建输出目录 (默认: 临时目录)
+    --seed N               语料随机种子 (默认: 0)
+    --jobs N               完整构建使用的并行进程数 (默认: 1)
+    --skip-full-build      不测量完整构建
+    --help                 显示帮助信息
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from kaomoji_processor import KaomojiProcessor
+from synthetic_corpus import SOURCE_FILENAMES, parse_size, write_corpus
+
+# 完整构建使用的生成脚本
+_GENERATE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'generate_dict.py')
+
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='词库生成性能测试工具')
+    parser.add_argument('--sizes', type=str, default='10k',
+                        help='逗号分隔的语料规模(每种格式的条目数)，如10k,100k,1M (默认: 10k)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='每项测试的重复次数，取最短耗时 (默认: 3)')
+    parser.add_argument('--output', type=str, default='benchmark_results.json',
+                        help='结果文件路径 (默认: benchmark_results.json)')
+    parser.add_argument('--work-dir', type=str, default=None,
+                        help='语料和构建输出目录 (默认: 临时目录)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='语料随机种子 (默认: 0)')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='完整构建使用的并行进程数 (默认: 1)')
+    parser.add_argument('--skip-full-build', action='store_true',
+                        help='不测量完整构建')
+    return parser.parse_args()
+
+
+def measure(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """
+    重复执行并计时
+
+    Args:
+        func: 被测函数
+        repeat: 重复次数
+
+    Returns:
+        包含最短、平均、最长耗时(秒)的字典
+    """
+    timings = []
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {
+        'min_s': min(timings),
+        'mean_s': sum(timings) / len(timings),
+        'max_s': max(timings)
+    }
+
+
+def _record(results: List[Dict], benchmark: str, size: int, items: int, timing: Dict[str, float], **extra):
+    """记录一项测试结果并输出摘要"""
+    result = {'benchmark': benchmark, 'size': size, 'items': items, **extra, **timing}
+    result['items_per_s'] = items / timing['min_s'] if timing['min_s'] > 0 else None
+    results.append(result)
+    label = ' '.join([benchmark] + [f"{key}={value}" for key, value in extra.items()])
+    print(f"{label}: {items} 项, 最短 {timing['min_s']:.4f} 秒")
+
+
+def run_size(size: int, work_dir: str, repeat: int, seed: int, jobs: int, full_build: bool) -> List[Dict]:
+    """
+    生成一种规模的语料并执行全部测试
+
+    Args:
+        size: 每种格式的条目数
+        work_dir: 工作目录
+        repeat: 重复次数
+        seed: 随机种子
+        jobs: 完整构建使用的并行进程数
+        full_build: 是否测量完整构建
+
+    Returns:
+        测试结果列表
+    """
+    import generate_dict
+    import pychaifen
+    from pyshuangpin import Scheme, shuangpin_by_syllabl
+
+    results = []
+    data_dir = os.path.join(work_dir, f'data_{size}')
+    print(f"正在生成合成语料: 每种格式 {size} 条 -> {data_dir}")
+    paths = write_corpus(data_dir, size, seed)
+
+    # 数据源解析，每次使用新的处理器，不复用上一次的拼音缓存
+    contents = {}
+    for source_format, path in paths.items():
+        with open(path, 'r', encoding='utf-8') as file:
+            contents[source_format] = file.read()
+    for source_format, content in contents.items():
+        is_pinyin = source_format != 'A_kaomoji'
+        timing = measure(lambda: KaomojiProcessor().process_source_data(content, source_format, is_pinyin), repeat)
+        _record(results, 'process_source_data', size, size, timing, format=source_format)
+
+    # 去重排序，输入为所有数据源的拼音词条
+    processor = KaomojiProcessor()
+    parsed_sources = {path: processor.parse_file(path, source_format=source_format)
+                      for source_format, path in paths.items()}
+    pinyin_entries = [entry for path, entries in parsed_sources.items() if 'A_kaomoji' not in path
+                      for entry in processor.build_pinyin_entries(entries, path)]
+    timing = measure(lambda: generate_dict.dedup_and_sort(pinyin_entries), repeat)
+    _record(results, 'dedup_and_sort', size, len(pinyin_entries), timing)
+
+    # 音节切分，输入为所有不同的拼音片段；先切分一次以加载HMM模型
+    parts = sorted({part for entry in pinyin_entries
+                    for part in entry.code.replace('\u2002', ' ').split(' ') if part})
+    pychaifen.quanp2shuangp(parts[0] if parts else 'a')
+    timing = measure(lambda: [pychaifen.quanp2shuangp(part) for part in parts], repeat)
+    _record(results, 'quanp2shuangp', size, len(parts), timing)
+
+    # 双拼转换，输入为切分得到的合法音节列表
+    syllablelists = [syllables for syllables in
+                     (generate_dict.normalize_syllables(pychaifen.quanp2shuangp(part)) for part in parts)
+                     if syllables is not None]
+    timing = measure(lambda: [shuangpin_by_syllabl(syllables, Scheme.小鹤) for syllables in syllablelists], repeat)
+    _record(results, 'shuangpin_by_syllabl', size, len(syllablelists), timing)
+
+    # 从拼音词库中间文件生成一个双拼方案的词库
+    unique_entries = generate_dict.dedup_and_sort(pinyin_entries)
+    pinyin_txt_file = os.path.join(work_dir, f'pinyin_{size}.txt')
+    shuangpin_txt_file = os.path.join(work_dir, f'shuangpin_{size}.txt')
+    generate_dict.write_lines(unique_entries, pinyin_txt_file)
+    timing = measure(lambda: generate_dict.generate_shuangpin_dictionary(
+        pinyin_txt_file, shuangpin_txt_file, Scheme.小鹤), repeat)
+    _record(results, 'generate_shuangpin_dictionary', size, len(unique_entries), timing, scheme='xiaohe')
+
+    # 完整构建，不使用构建缓存和构建清单
+    if full_build:
+        output_dir = os.path.join(work_dir, f'output_{size}')
+        command = [sys.executable, _GENERATE_SCRIPT, '--all', '--data-dir', data_dir, '--output-dir', output_dir,
+                   '--no-cache', '--force', '--jobs', str(jobs)]
+        timing = measure(lambda: subprocess.run(command, check=True, stdout=subprocess.DEVNULL), repeat)
+        _record(results, 'full_build', size, size * len(SOURCE_FILENAMES), timing, jobs=jobs)
+
+    return results
+
+
+def collect_environment() -> Dict[str, object]:
+    """收集测试环境信息"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(_GENERATE_SCRIPT)).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'commit': commit
+    }
+
+
+def main():
+    """主函数"""
+    args = parse_arguments()
+    sizes = [parse_size(size) for size in args.sizes.split(',') if size.strip()]
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix='kaomoji_bench_') as tmp_dir:
+        work_dir = args.work_dir or tmp_dir
+        os.makedirs(work_dir, exist_ok=True)
+        for size in sizes:
+            results.extend(run_size(size, work_dir, args.repeat, args.seed, args.jobs, not args.skip_full_build))
+
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump({
+            'environment': collect_environment(),
+            'parameters': {'sizes': sizes, 'repeat': args.repeat, 'seed': args.seed, 'jobs': args.jobs},
+            'results': results
+        }, file, ensure_ascii=False, indent=2)
+    print(f"测试结果已保存到: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+构建缓存模块 - 在多次构建之间持久化耗时的转换结果
+
+主要功能：
+1. 缓存 描述文本->拼音、全拼->音节列表、音节列表->汉字 的转换结果
+2. pypinyin、Pinyin2Hanzi 或缓存格式版本变化时自动清空旧缓存
+3. 限制缓存条目数量，超出时淘汰最久未使用的条目
+"""
+
+import os
+import sqlite3
+import threading
+from importlib import metadata
+from typing import Callable, Dict, Optional, Tuple
+from urllib.request import pathname2url
+
+# 缓存格式版本，缓存内容的含义改变(如切分算法变化)时需要递增
+CACHE_FORMAT_VERSION = '1'
+
+# 默认缓存条目上限
+DEFAULT_MAX_ENTRIES = 200000
+
+# 缓存文件名，位于输出目录下
+CACHE_FILENAME = '.build_cache.sqlite3'
+
+
+def _package_version(name: str) -> str:
+    """获取已安装包的版本号，未安装时返回'missing'"""
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return 'missing'
+
+
+def cache_fingerprint() -> str:
+    """
+    计算缓存版本指纹，由缓存格式版本和依赖库版本组成
+
+    Returns:
+        版本指纹字符串
+    """
+    return (f"format={CACHE_FORMAT_VERSION};"
+            f"pypinyin={_package_version('pypinyin')};"
+            f"Pinyin2Hanzi={_package_version('Pinyin2Hanzi')}")
+
+
+class BuildCache:
+    """
+    基于SQLite的内容键缓存，按 (命名空间, 输入文本) 保存转换结果
+
+    新增和命中的条目先记录在内存中，调用close时一次性写回并执行淘汰。
+    hits只统计命中缓存文件中已有条目的次数，命中本次构建新增的条目不计入hits和misses；
+    misses统计本次构建新增并写回的条目数。
+    并行构建时，工作进程以只读方式打开缓存，通过take_updates取出新增和命中的条目，
+    由主进程merge_updates后统一写回；多个工作进程新增的相同条目只计一次misses。
+    """
+
+    def __init__(self, path: str, max_entries: int = DEFAULT_MAX_ENTRIES, readonly: bool = False):
+        """
+        打开或创建缓存
+
+        Args:
+            path: 缓存文件路径
+            max_entries: 缓存条目上限，超出时淘汰最久未使用的条目
+            readonly: 是否以只读方式打开已有的缓存(用于工作进程)，只读时close不写回
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[str, str], str] = {}
+        self._touched = set()
+        self.readonly = readonly
+
+        if readonly:
+            uri = f"file:{pathname2url(os.path.abspath(path))}?mode=ro"
+            self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            self.generation = None
+            return
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS entries ('
+                           'namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, '
+                           'last_used INTEGER NOT NULL, PRIMARY KEY (namespace, key))')
+
+        # 依赖版本变化时整个缓存作废
+        fingerprint = cache_fingerprint()
+        if self._get_meta('fingerprint') != fingerprint:
+            self._conn.execute('DELETE FROM entries')
+            self._set_meta('fingerprint', fingerprint)
+
+        # 每次构建递增一代，用于按最近使用时间淘汰
+        self.generation = int(self._get_meta('generation') or 0) + 1
+        self._set_meta('generation', str(self.generation))
+        self._conn.commit()
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        self._conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def get(self, namespace: str, key: str) -> Optional[str]:
+        """
+        读取缓存条目
+
+        Args:
+            namespace: 命名空间，如'pinyin'、'segment'、'hanzi'
+            key: 输入文本
+
+        Returns:
+            缓存的结果，未命中时返回None
+        """
+        with self._lock:
+            # 本次构建新增的条目不计入命中统计，命中数只反映从缓存文件中复用的结果
+            value = self._pending.get((namespace, key))
+            if value is not None:
+                return value
+            row = self._conn.execute('SELECT value FROM entries WHERE namespace = ? AND key = ?',
+                                     (namespace, key)).fetchone()
+            if row is None:
+                return None
+            self.hits += 1
+            self._touched.add((namespace, key))
+            return row[0]
+
+    def set(self, namespace: str, key: str, value: str):
+        """
+        写入缓存条目，在close时才真正落盘
+
+        Args:
+            namespace: 命名空间
+            key: 输入文本
+            value: 转换结果
+        """
+        with self._lock:
+            if (namespace, key) not in self._pending:
+                self.misses += 1
+            self._pending[(namespace, key)] = value
+
+    def get_or_compute(self, namespace: str, key: str, compute: Callable[[str], str]) -> str:
+        """
+        读取缓存条目，未命中时调用compute计算并写入缓存
+
+        Args:
+            namespace: 命名空间
+            key: 输入文本
+            compute: 计算函数，参数为输入文本
+
+        Returns:
+            转换结果
+        """
+        value = self.get(namespace, key)
+        if value is None:
+            value = compute(key)
+            self.set(namespace, key, value)
+        return value
+
+    def take_updates(self) -> Dict:
+        """
+        取出并清空本进程新增和命中的条目以及命中统计，供主进程合并
+
+        新增条目的misses由主进程合并时统计，不随更新返回。
+
+        Returns:
+            包含pending、touched、hits的字典
+        """
+        with self._lock:
+            updates = {
+                'pending': self._pending,
+                'touched': self._touched,
+                'hits': self.hits
+            }
+            self._pending = {}
+            self._touched = set()
+            self.hits = 0
+            self.misses = 0
+            return updates
+
+    def merge_updates(self, updates: Dict):
+        """
+        合并工作进程取出的条目和命中统计，在close时一并写回
+
+        Args:
+            updates: 工作进程take_updates的结果
+        """
+        with self._lock:
+            for entry, value in updates['pending'].items():
+                if entry not in self._pending:
+                    self.misses += 1
+                    self._pending[entry] = value
+            self._touched.update(updates['touched'])
+            self.hits += updates['hits']
+
+    def close(self):
+        """写回新增条目，刷新命中条目的使用时间，并淘汰超出上限的旧条目"""
+        with self._lock:
+            if self._conn is None:
+                return
+            if self.readonly:
+                self._conn.close()
+                self._conn = None
+                return
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO entries (namespace, key, value, last_used) VALUES (?, ?, ?, ?)',
+                [(namespace, key, value, self.generation) for (namespace, key), value in self._pending.items()]
+            )
+            self._conn.executemany(
+                'UPDATE entries SET last_used = ? WHERE namespace = ? AND key = ?',
+                [(self.generation, namespace, key) for namespace, key in self._touched]
+            )
+            count = self._conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    'DELETE FROM entries WHERE rowid IN '
+                    '(SELECT rowid FROM entries ORDER BY last_used ASC LIMIT ?)',
+                    (count - self.max_entries,)
+                )
+            self._conn.commit()
+            self._conn.close()
+            self._conn = None
+            self._pending.clear()
+            self._touched.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
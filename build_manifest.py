@@ -0,0 +1,221 @@
+"""
+构建清单模块 - 支持增量构建
+
+主要功能：
+1. 记录每个输入文件的内容哈希、构建选项和工具版本
+2. 保存每个数据源的解析结果，数据源未变化时直接复用
+3. 记录每个输出的内容摘要，摘要未变化且文件存在时跳过重新生成
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 清单文件名和解析结果目录，位于输出目录下
+MANIFEST_FILENAME = '.build_manifest.json'
+PARSED_DIRNAME = os.path.join('.build', 'parsed')
+
+# 参与计算工具版本的源码文件，修改生成逻辑后旧的清单自动失效
+_TOOL_DIR = os.path.dirname(os.path.abspath(__file__))
+_TOOL_FILES = ('generate_dict.py', 'kaomoji_processor.py', 'build_manifest.py', 'external_sort.py',
+               'parallel_build.py', 'stage_scheduler.py', 'build_metrics.py', 'dict_writers.py', 'kaomoji_index.py',
+               'kaomoji_search.py', 'pychaifen', 'pyshuangpin')
+
+
+def file_sha256(path: str) -> str:
+    """
+    计算文件内容的SHA-256
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        十六进制摘要
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def content_digest(parts: Iterable[str]) -> str:
+    """
+    计算一组字符串的摘要，用于判断输出内容是否变化
+
+    Args:
+        parts: 字符串序列
+
+    Returns:
+        十六进制摘要
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def tool_fingerprint() -> str:
+    """
+    根据生成工具的源码计算工具版本
+
+    Returns:
+        十六进制摘要
+    """
+    paths = []
+    for name in _TOOL_FILES:
+        path = os.path.join(_TOOL_DIR, name)
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                paths.extend(os.path.join(root, f) for f in files if f.endswith('.py'))
+        elif os.path.exists(path):
+            paths.append(path)
+    return content_digest(f'{os.path.relpath(p, _TOOL_DIR)}:{file_sha256(p)}' for p in sorted(paths))
+
+
+class BuildManifest:
+    """
+    构建清单，保存在输出目录下的 .build_manifest.json 中
+
+    并发执行的构建阶段可以同时保存解析结果和记录输出。
+    """
+
+    def __init__(self, output_dir: str, tool: str, options: Dict):
+        """
+        读取输出目录下的构建清单，工具版本或构建选项变化时丢弃旧记录
+
+        Args:
+            output_dir: 输出目录
+            tool: 工具版本(tool_fingerprint的结果)
+            options: 影响输出内容的构建选项
+        """
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_FILENAME)
+        self.tool = tool
+        self.options = options
+        self.sources: Dict[str, Dict] = {}
+        self.outputs: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+        data = None
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as file:
+                    data = json.load(file)
+            except (OSError, ValueError):
+                data = None
+        if data and data.get('tool') == tool and data.get('options') == options:
+            self.sources = data.get('sources', {})
+            self.outputs = data.get('outputs', {})
+        elif data:
+            # 旧记录作废，同时清理其解析结果文件
+            for record in data.get('sources', {}).values():
+                self._remove_parsed(record)
+
+    def reset(self):
+        """丢弃所有记录，下次保存时重新生成完整清单"""
+        for record in self.sources.values():
+            self._remove_parsed(record)
+        self.sources = {}
+        self.outputs = {}
+
+    def load_parsed(self, input_filename: str,
+                    sha256: str) -> Optional[List[Tuple[str, Optional[str], Optional[str]]]]:
+        """
+        读取上次构建保存的数据源解析结果
+
+        Args:
+            input_filename: 输入文件路径
+            sha256: 输入文件当前的内容哈希
+
+        Returns:
+            (颜文字, 编码, 描述) 列表，数据源已变化或没有记录时返回None
+        """
+        record = self.sources.get(input_filename)
+        if not record or record.get('sha256') != sha256:
+            return None
+        parsed_file = record.get('parsed')
+        if not parsed_file:
+            return None
+        try:
+            with open(os.path.join(self.output_dir, parsed_file), 'r', encoding='utf-8') as file:
+                return [tuple(entry) for entry in json.load(file)]
+        except (OSError, ValueError):
+            return None
+
+    def store_parsed(self, input_filename: str, sha256: str,
+                     entries: List[Tuple[str, Optional[str], Optional[str]]]):
+        """
+        保存数据源解析结果，供下次构建复用
+
+        Args:
+            input_filename: 输入文件路径
+            sha256: 输入文件的内容哈希
+            entries: (颜文字, 编码, 描述) 列表
+        """
+        with self._lock:
+            record = self.sources.get(input_filename)
+            if not record or record.get('sha256') != sha256:
+                self._remove_parsed(record)
+                record = self.sources[input_filename] = {'sha256': sha256}
+
+        parsed_file = os.path.join(PARSED_DIRNAME, f'{sha256[:16]}.json')
+        os.makedirs(os.path.join(self.output_dir, PARSED_DIRNAME), exist_ok=True)
+        with open(os.path.join(self.output_dir, parsed_file), 'w', encoding='utf-8') as file:
+            json.dump(entries, file, ensure_ascii=False)
+        with self._lock:
+            record['parsed'] = parsed_file
+
+    def _remove_parsed(self, record: Optional[Dict]):
+        """删除数据源旧版本的解析结果文件"""
+        if not record or not record.get('parsed'):
+            return
+        try:
+            os.remove(os.path.join(self.output_dir, record['parsed']))
+        except OSError:
+            pass
+
+    def is_fresh(self, name: str, digest: str) -> bool:
+        """
+        判断输出是否无需重新生成：内容摘要与上次相同且所有输出文件仍然存在
+
+        Args:
+            name: 输出名称
+            digest: 输出内容摘要
+
+        Returns:
+            无需重新生成时返回True
+        """
+        record = self.outputs.get(name)
+        if not record or record.get('digest') != digest:
+            return False
+        return all(os.path.exists(path) for path in record.get('files', []))
+
+    def record_output(self, name: str, digest: str, files: List[str]):
+        """
+        记录已生成的输出
+
+        Args:
+            name: 输出名称
+            digest: 输出内容摘要
+            files: 输出文件路径列表
+        """
+        with self._lock:
+            self.outputs[name] = {'digest': digest, 'files': files}
+
+    def save(self):
+        """写回构建清单"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        # 并发执行的阶段记录顺序不固定，按名称排序保证清单内容稳定
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({
+                'tool': self.tool,
+                'options': self.options,
+                'sources': dict(sorted(self.sources.items())),
+                'outputs': dict(sorted(self.outputs.items()))
+            }, file, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,188 @@
+"""
+构建指标模块 - 记录各构建阶段和数据源的耗时、吞吐量与内存峰值
+
+主要功能：
+1. 记录每个构建阶段的耗时、输入输出条目数、去重比例和tracemalloc内存峰值
+2. 记录每个数据源的读取行数、生成条目数以及被正则表达式或中英文过滤规则排除的行数
+3. 可选地为每个构建阶段保存cProfile数据，并将全部指标写出为JSON
+"""
+
+import cProfile
+import json
+import os
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+class BuildMetrics:
+    """
+    构建指标收集器
+
+    tracemalloc的内存峰值是进程级的，阶段并发执行时各阶段的峰值会互相叠加；
+    工作进程中的计算不计入主进程的峰值和cProfile数据。
+    """
+
+    def __init__(self, trace_memory: bool = True, profile_dir: str = None):
+        """
+        初始化指标收集器
+
+        Args:
+            trace_memory: 是否使用tracemalloc记录内存峰值
+            profile_dir: cProfile数据的保存目录，为None时不保存
+        """
+        self.trace_memory = trace_memory
+        self.profile_dir = profile_dir
+        self.stages: Dict[str, Dict] = {}
+        self.sources: Dict[str, Dict] = {}
+        self.total: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._start = None
+        # 各阶段开始时都会重置tracemalloc的峰值，整个构建的峰值取重置前各峰值的最大值
+        self._peak_mem_bytes = 0
+
+    def start(self):
+        """开始收集指标"""
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+        self._start = time.perf_counter()
+
+    def stop(self):
+        """结束收集指标，记录总耗时和整个构建的内存峰值"""
+        self.total['wall_s'] = time.perf_counter() - self._start
+        if self.trace_memory and tracemalloc.is_tracing():
+            self._take_peak()
+            self.total['peak_mem_bytes'] = self._peak_mem_bytes
+            tracemalloc.stop()
+
+    def _take_peak(self) -> int:
+        """读取当前的tracemalloc峰值并计入整个构建的峰值，返回当前峰值"""
+        peak = tracemalloc.get_traced_memory()[1]
+        with self._lock:
+            self._peak_mem_bytes = max(self._peak_mem_bytes, peak)
+        return peak
+
+    @contextmanager
+    def measure_stage(self, name: str):
+        """
+        测量一个构建阶段的耗时和内存峰值，可选地保存cProfile数据
+
+        Args:
+            name: 阶段名称
+        """
+        profiler = cProfile.Profile() if self.profile_dir else None
+        if self.trace_memory and tracemalloc.is_tracing():
+            self._take_peak()
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profile_name = re.sub(r'[^\w.-]+', '_', name)
+                profiler.dump_stats(os.path.join(self.profile_dir, f'{profile_name}.prof'))
+            fields = {'wall_s': time.perf_counter() - start}
+            if self.trace_memory and tracemalloc.is_tracing():
+                fields['peak_mem_bytes'] = self._take_peak()
+            self.record_stage(name, **fields)
+
+    def record_stage(self, name: str, **fields):
+        """
+        记录构建阶段的指标，多次记录时合并字段
+
+        Args:
+            name: 阶段名称
+            **fields: 指标字段，如status、entries_in、entries_out
+        """
+        with self._lock:
+            record = self.stages.setdefault(name, {})
+            record.update(fields)
+            entries_in = record.get('entries_in')
+            entries_out = record.get('entries_out')
+            if entries_in and entries_out is not None:
+                record['dedup_ratio'] = 1 - entries_out / entries_in
+            if entries_out is not None and record.get('wall_s'):
+                record['entries_per_s'] = entries_out / record['wall_s']
+
+    def record_source(self, path: str, **fields):
+        """
+        记录数据源的指标
+
+        Args:
+            path: 数据源文件路径
+            **fields: 指标字段，如lines、entries、rejected、without_pinyin
+        """
+        with self._lock:
+            self.sources.setdefault(path, {}).update(fields)
+
+    def to_dict(self) -> Dict:
+        """
+        导出全部指标
+
+        Returns:
+            包含total、stages、sources的字典
+        """
+        return {'total': self.total, 'stages': self.stages, 'sources': self.sources}
+
+    def write(self, path: str):
+        """
+        将全部指标写出为JSON文件
+
+        Args:
+            path: 输出文件路径
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.to_dict(), file, ensure_ascii=False, indent=2)
+
+    def report(self) -> str:
+        """
+        生成可读的指标报告
+
+        Returns:
+            报告文本
+        """
+        lines = ['各阶段指标:']
+        for name, record in self.stages.items():
+            parts = [f"{name:<28}", f"{record.get('status', '-'):<8}", f"{record.get('wall_s', 0):8.3f} 秒"]
+            if 'entries_out' in record:
+                parts.append(f"输出 {record['entries_out']} 条")
+            if 'dedup_ratio' in record:
+                parts.append(f"去重 {record['dedup_ratio']:.1%}")
+            if 'peak_mem_bytes' in record:
+                parts.append(f"内存峰值 {_format_bytes(record['peak_mem_bytes'])}")
+            lines.append('  ' + '  '.join(parts))
+        if self.sources:
+            lines.append('各数据源指标:')
+            for path, record in self.sources.items():
+                if record.get('reused'):
+                    lines.append(f"  {path}: 复用上次的解析结果，{record.get('entries', 0)} 条")
+                else:
+                    lines.append(f"  {path}: 读取 {record.get('lines', 0)} 行，生成 {record.get('entries', 0)} 条，"
+                                 f"正则不匹配 {record.get('rejected', 0)} 行，"
+                                 f"无拼音 {record.get('without_pinyin', 0)} 条")
+        if self.total:
+            summary = f"总耗时 {self.total.get('wall_s', 0):.3f} 秒"
+            if 'peak_mem_bytes' in self.total:
+                summary += f"，内存峰值 {_format_bytes(self.total['peak_mem_bytes'])}"
+            lines.append(summary)
+        return '\n'.join(lines)
+
+
+def _format_bytes(size: Optional[int]) -> str:
+    """将字节数格式化为KB/MB"""
+    if size is None:
+        return '-'
+    if size >= 1024 * 1024:
+        return f"{size / 1024 / 1024:.1f} MB"
+    return f"{size / 1024:.1f} KB"
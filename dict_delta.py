@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+词库增量更新工具 - 生成和应用两次发布之间的词库差异
+
+主要功能：
+1. 比较新旧两个输出目录中的Rime词库文件，为每个有变化的词库生成按行的增删差异(.delta)
+2. 根据旧词库文件和差异文件重建完整的新词库，并用SHA-256校验重建结果
+3. 生成delta_index.json，记录每个词库的新旧哈希和状态，供同步工具判断需要下载的内容
+
+差异文件格式(UTF-8文本)：
+    KAOMOJI-DELTA 1
+    name <词库文件名>
+    base <旧文件SHA-256>
+    target <新文件SHA-256>
+    @@ <旧文件起始行号(从0开始)> <删除行数> <插入行数>
+    -<删除的行>
+    +<插入的行>
+
+使用方法:
+    python dict_delta.py diff OLD_DIR NEW_DIR [--delta-dir DIR]
+    python dict_delta.py apply OLD_FILE DELTA_FILE [--output FILE]
+
+选项:
+    --delta-dir DIR        差异文件输出目录 (默认: NEW_DIR/delta)
+    --output FILE          重建的词库文件路径 (默认: 覆盖OLD_FILE)
+    --help                 显示帮助信息
+"""
+
+import argparse
+import difflib
+import glob
+import hashlib
+import json
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+# 差异文件的格式标识和扩展名
+DELTA_MAGIC = 'KAOMOJI-DELTA 1'
+DELTA_SUFFIX = '.delta'
+DELTA_INDEX_FILENAME = 'delta_index.json'
+
+# 参与比较的词库文件
+DICT_PATTERN = '*.dict.yaml'
+
+# 索引中各状态的说明
+_STATUS_LABELS = {'unchanged': '未变化', 'added': '新增的词库', 'removed': '已删除的词库'}
+
+# 差异中的一段修改：(旧文件起始行号, 删除的行, 插入的行)
+Hunk = Tuple[int, List[str], List[str]]
+
+
+def _sha256(data: bytes) -> str:
+    """计算字节串的SHA-256"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _split_lines(text: str) -> List[str]:
+    """
+    按换行符切分并保留换行符；与str.splitlines不同，不在颜文字中可能出现的\u2028等字符处切分
+    """
+    lines = [line + '\n' for line in text.split('\n')]
+    lines[-1] = lines[-1][:-1]
+    if not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def _read_lines(path: str) -> Tuple[List[str], str]:
+    """
+    读取词库文件的所有行(保留换行符)
+
+    Returns:
+        (行列表, 文件内容的SHA-256)
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+    return _split_lines(data.decode('utf-8')), _sha256(data)
+
+
+def diff_lines(old_lines: List[str], new_lines: List[str]) -> List[Hunk]:
+    """
+    计算两个词库之间按行的差异
+
+    词库按编码排序，两次发布之间大部分行相同；先去掉相同的首尾部分再逐段比较，
+    使差异计算的开销与变化的范围而不是词库大小相关。
+
+    Args:
+        old_lines: 旧词库的行
+        new_lines: 新词库的行
+
+    Returns:
+        按旧文件行号排序的修改列表
+    """
+    prefix = 0
+    limit = min(len(old_lines), len(new_lines))
+    while prefix < limit and old_lines[prefix] == new_lines[prefix]:
+        prefix += 1
+    suffix = 0
+    while (suffix < limit - prefix
+           and old_lines[len(old_lines) - 1 - suffix] == new_lines[len(new_lines) - 1 - suffix]):
+        suffix += 1
+
+    old_middle = old_lines[prefix:len(old_lines) - suffix]
+    new_middle = new_lines[prefix:len(new_lines) - suffix]
+    hunks = []
+    matcher = difflib.SequenceMatcher(None, old_middle, new_middle, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != 'equal':
+            hunks.append((prefix + i1, old_middle[i1:i2], new_middle[j1:j2]))
+    return hunks
+
+
+def apply_hunks(old_lines: List[str], hunks: List[Hunk]) -> List[str]:
+    """
+    将差异应用到旧词库的行上
+
+    Args:
+        old_lines: 旧词库的行
+        hunks: 按旧文件行号排序的修改列表
+
+    Returns:
+        新词库的行
+
+    Raises:
+        ValueError: 差异与旧词库的内容不符
+    """
+    new_lines = []
+    position = 0
+    for start, removed, added in hunks:
+        if start < position or old_lines[start:start + len(removed)] != removed:
+            raise ValueError(f"差异与旧词库不符: 第 {start} 行")
+        new_lines.extend(old_lines[position:start])
+        new_lines.extend(added)
+        position = start + len(removed)
+    new_lines.extend(old_lines[position:])
+    return new_lines
+
+
+def write_delta(path: str, name: str, base_sha256: str, target_sha256: str, hunks: List[Hunk]):
+    """
+    写出差异文件
+
+    Args:
+        path: 差异文件路径
+        name: 词库文件名
+        base_sha256: 旧词库的SHA-256
+        target_sha256: 新词库的SHA-256
+        hunks: 修改列表
+    """
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        file.write(f"{DELTA_MAGIC}\nname {name}\nbase {base_sha256}\ntarget {target_sha256}\n")
+        for start, removed, added in hunks:
+            file.write(f"@@ {start} {len(removed)} {len(added)}\n")
+            file.writelines(_delta_line('-', line) for line in removed)
+            file.writelines(_delta_line('+', line) for line in added)
+
+
+def _delta_line(marker: str, line: str) -> str:
+    """
+    将词库行写为差异行；词库最后一行没有换行符时用单独的\\标记表示
+    """
+    if line.endswith('\n'):
+        return f"{marker}{line}"
+    return f"{marker}{line}\n\\\n"
+
+
+def read_delta(path: str) -> Tuple[Dict[str, str], List[Hunk]]:
+    """
+    读取差异文件
+
+    Args:
+        path: 差异文件路径
+
+    Returns:
+        (包含name、base、target的头部字段, 修改列表)
+
+    Raises:
+        ValueError: 差异文件格式错误
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        lines = _split_lines(file.read())
+    if not lines or lines[0].rstrip('\n') != DELTA_MAGIC:
+        raise ValueError(f"不是词库差异文件: {path}")
+
+    fields = {}
+    index = 1
+    while index < len(lines) and not lines[index].startswith('@@ '):
+        key, _, value = lines[index].rstrip('\n').partition(' ')
+        fields[key] = value
+        index += 1
+    for key in ('name', 'base', 'target'):
+        if key not in fields:
+            raise ValueError(f"差异文件缺少 {key} 字段: {path}")
+
+    hunks = []
+    while index < len(lines):
+        try:
+            start, removed_count, added_count = (int(value) for value in lines[index].split()[1:4])
+        except ValueError:
+            raise ValueError(f"差异文件格式错误: {path} 第 {index + 1} 行")
+        index += 1
+        hunk_lines = {'-': [], '+': []}
+        for marker, count in (('-', removed_count), ('+', added_count)):
+            for _ in range(count):
+                if index >= len(lines) or lines[index][:1] != marker:
+                    raise ValueError(f"差异文件格式错误: {path} 第 {index + 1} 行")
+                line = lines[index][1:]
+                index += 1
+                if index < len(lines) and lines[index] == '\\\n':
+                    line = line[:-1]
+                    index += 1
+                hunk_lines[marker].append(line)
+        hunks.append((start, hunk_lines['-'], hunk_lines['+']))
+    return fields, hunks
+
+
+def diff_directories(old_dir: str, new_dir: str, delta_dir: str) -> Dict[str, Dict]:
+    """
+    比较新旧输出目录中的词库，为有变化的词库写出差异文件和索引
+
+    Args:
+        old_dir: 上一次发布的输出目录
+        new_dir: 本次构建的输出目录
+        delta_dir: 差异文件输出目录
+
+    Returns:
+        词库文件名到索引记录的映射，记录包含status(unchanged、changed、added、removed)、
+        base、target以及差异文件名和大小
+    """
+    old_files = {os.path.basename(path): path for path in glob.glob(os.path.join(old_dir, DICT_PATTERN))}
+    new_files = {os.path.basename(path): path for path in glob.glob(os.path.join(new_dir, DICT_PATTERN))}
+    os.makedirs(delta_dir, exist_ok=True)
+
+    index = {}
+    for name in sorted(set(old_files) | set(new_files)):
+        delta_path = os.path.join(delta_dir, name + DELTA_SUFFIX)
+        # 清理上一次生成的同名差异文件，避免与本次索引不符
+        if os.path.exists(delta_path):
+            os.remove(delta_path)
+        if name not in new_files:
+            _, base_sha256 = _read_lines(old_files[name])
+            index[name] = {'status': 'removed', 'base': base_sha256}
+            continue
+        new_lines, target_sha256 = _read_lines(new_files[name])
+        if name not in old_files:
+            index[name] = {'status': 'added', 'target': target_sha256}
+            continue
+
+        old_lines, base_sha256 = _read_lines(old_files[name])
+        record = {'base': base_sha256, 'target': target_sha256}
+        if base_sha256 == target_sha256:
+            record['status'] = 'unchanged'
+        else:
+            hunks = diff_lines(old_lines, new_lines)
+            write_delta(delta_path, name, base_sha256, target_sha256, hunks)
+            record.update({
+                'status': 'changed',
+                'delta': os.path.basename(delta_path),
+                'delta_bytes': os.path.getsize(delta_path),
+                'full_bytes': os.path.getsize(new_files[name]),
+                'removed': sum(len(removed) for _, removed, _ in hunks),
+                'added': sum(len(added) for _, _, added in hunks)
+            })
+        index[name] = record
+
+    with open(os.path.join(delta_dir, DELTA_INDEX_FILENAME), 'w', encoding='utf-8') as file:
+        json.dump(index, file, ensure_ascii=False, indent=2)
+    return index
+
+
+def apply_delta(old_file: str, delta_file: str, output_file: Optional[str] = None) -> str:
+    """
+    根据旧词库和差异文件重建新词库，并校验新旧文件的SHA-256
+
+    Args:
+        old_file: 旧词库文件路径
+        delta_file: 差异文件路径
+        output_file: 重建的词库文件路径，为None时覆盖旧词库
+
+    Returns:
+        重建的词库文件路径
+
+    Raises:
+        ValueError: 旧词库与差异不匹配或重建结果校验失败
+    """
+    fields, hunks = read_delta(delta_file)
+    old_lines, base_sha256 = _read_lines(old_file)
+    if base_sha256 != fields['base']:
+        raise ValueError(f"旧词库 {old_file} 与差异文件的基准不一致")
+
+    data = ''.join(apply_hunks(old_lines, hunks)).encode('utf-8')
+    if _sha256(data) != fields['target']:
+        raise ValueError(f"重建的词库 {fields['name']} 校验失败")
+
+    output_file = output_file or old_file
+    tmp_file = f'{output_file}.tmp'
+    with open(tmp_file, 'wb') as file:
+        file.write(data)
+    os.replace(tmp_file, output_file)
+    return output_file
+
+
+def print_delta_summary(index: Dict[str, Dict]):
+    """输出各词库的差异摘要"""
+    for name, record in index.items():
+        status = record['status']
+        if status == 'changed':
+            print(f"{name}: 删除 {record['removed']} 行，新增 {record['added']} 行，"
+                  f"差异 {record['delta_bytes']} 字节 (完整文件 {record['full_bytes']} 字节)")
+        else:
+            print(f"{name}: {_STATUS_LABELS[status]}")
+
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='词库增量更新工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    diff_parser = subparsers.add_parser('diff', help='比较新旧输出目录，生成差异文件')
+    diff_parser.add_argument('old_dir', help='上一次发布的输出目录')
+    diff_parser.add_argument('new_dir', help='本次构建的输出目录')
+    diff_parser.add_argument('--delta-dir', type=str, default=None,
+                             help='差异文件输出目录 (默认: NEW_DIR/delta)')
+
+    apply_parser = subparsers.add_parser('apply', help='根据旧词库和差异文件重建新词库')
+    apply_parser.add_argument('old_file', help='旧词库文件')
+    apply_parser.add_argument('delta_file', help='差异文件')
+    apply_parser.add_argument('--output', type=str, default=None,
+                              help='重建的词库文件路径 (默认: 覆盖OLD_FILE)')
+    return parser.parse_args()
+
+
+def main():
+    """主函数"""
+    args = parse_arguments()
+    if args.command == 'diff':
+        delta_dir = args.delta_dir or os.path.join(args.new_dir, 'delta')
+        print_delta_summary(diff_directories(args.old_dir, args.new_dir, delta_dir))
+        print(f"差异文件已保存到: {delta_dir}")
+    else:
+        try:
+            output_file = apply_delta(args.old_file, args.delta_file, args.output)
+        except ValueError as e:
+            print(f"错误: {e}")
+            sys.exit(1)
+        print(f"已重建词库文件: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+词库写出模块 - 将同一份词条写出为多种输入法和通用格式
+
+主要功能：
+1. 定义词库写出器接口，各格式的写出器按名称注册
+2. 提供fcitx5拼音词库文本、通用TSV和JSON Lines写出器(Rime写出器在generate_dict中注册)
+3. 所有写出器直接使用内存中的词条，不需要重新读取和解析中间文本文件
+"""
+
+import json
+import os
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from kaomoji_processor import DictEntry
+
+
+class DictWriter:
+    """
+    词库写出器
+
+    写出函数签名为 write(entries, output_file, dict_name, dict_type, **options)，返回写出的词条数量；
+    options为写出器特有的选项(如Rime的version_mode)，写出器忽略不认识的选项。
+    """
+
+    def __init__(self, name: str, extension: str, write: Callable[..., int],
+                 dict_kinds: Optional[Tuple[str, ...]] = None, needs_segments: bool = False):
+        """
+        初始化词库写出器
+
+        Args:
+            name: 格式名称
+            extension: 输出文件扩展名，输出文件为<词库名称><扩展名>
+            write: 写出函数
+            dict_kinds: 支持的词库类型(pinyin、kmj、shuangpin)，为None时支持所有类型
+            needs_segments: 是否需要音节切分结果(DictEntry.syllables)
+        """
+        self.name = name
+        self.extension = extension
+        self.write = write
+        self.dict_kinds = dict_kinds
+        self.needs_segments = needs_segments
+
+    def supports(self, dict_kind: str) -> bool:
+        """判断写出器是否支持某类词库"""
+        return self.dict_kinds is None or dict_kind in self.dict_kinds
+
+    def output_path(self, output_dir: str, dict_name: str) -> str:
+        """获取词库的输出文件路径"""
+        return os.path.join(output_dir, f'{dict_name}{self.extension}')
+
+
+# 已注册的词库写出器，格式名称到写出器的映射
+DICT_WRITERS: Dict[str, DictWriter] = {}
+
+
+def register_dict_writer(writer: DictWriter) -> DictWriter:
+    """
+    注册词库写出器，同名写出器会被覆盖
+
+    Args:
+        writer: 词库写出器
+
+    Returns:
+        注册的写出器
+    """
+    DICT_WRITERS[writer.name] = writer
+    return writer
+
+
+def _ensure_parent_dir(output_file: str):
+    """确保输出文件所在目录存在"""
+    directory = os.path.dirname(output_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+def write_tsv(entries: Iterable[DictEntry], output_file: str, dict_name: str, dict_type: str, **options) -> int:
+    """
+    写出带表头的TSV文件，列为颜文字、编码、权重、来源，附加列(如详细模式的全拼和汉字)依次追加在后面
+
+    Returns:
+        写出的词条数量
+    """
+    _ensure_parent_dir(output_file)
+    entry_count = 0
+    with open(output_file, 'w', encoding='utf-8', newline='') as file:
+        file.write('emoticon\tcode\tweight\tsource\n')
+        for entry in entries:
+            columns = [entry.emoticon, entry.code, str(entry.weight), os.path.basename(entry.source)]
+            file.write('\t'.join(columns + list(entry.extra)) + '\n')
+            entry_count += 1
+    print(f"已生成TSV文件: {output_file}")
+    return entry_count
+
+
+def write_jsonl(entries: Iterable[DictEntry], output_file: str, dict_name: str, dict_type: str, **options) -> int:
+    """
+    写出JSON Lines文件，每行一个词条对象，包含emoticon、code、weight、source以及非空的extra
+
+    Returns:
+        写出的词条数量
+    """
+    _ensure_parent_dir(output_file)
+    entry_count = 0
+    with open(output_file, 'w', encoding='utf-8', newline='') as file:
+        for entry in entries:
+            record = {
+                'emoticon': entry.emoticon,
+                'code': entry.code,
+                'weight': entry.weight,
+                'source': os.path.basename(entry.source)
+            }
+            if entry.extra:
+                record['extra'] = list(entry.extra)
+            file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            entry_count += 1
+    print(f"已生成JSON Lines文件: {output_file}")
+    return entry_count
+
+
+def write_fcitx5_pinyin(entries: Iterable[DictEntry], output_file: str, dict_name: str, dict_type: str,
+                        **options) -> int:
+    """
+    写出fcitx5拼音词库文本(可用libime_pinyindict转换为.dict)，每行为"颜文字 全拼 0"，音节之间以'分隔
+
+    词条需要带有音节切分结果；编码中含非拼音片段(如英文缩写)或颜文字含ASCII空白的词条无法表示，会被跳过。
+
+    Returns:
+        写出的词条数量
+    """
+    _ensure_parent_dir(output_file)
+    entry_count = 0
+    skipped = 0
+    with open(output_file, 'w', encoding='utf-8', newline='') as file:
+        for entry in entries:
+            segments = entry.syllables or ()
+            if (not segments or any(syllables is None for _, syllables in segments)
+                    or any(c in ' \t\r\n\f\v' for c in entry.emoticon)):
+                skipped += 1
+                continue
+            pinyin = "'".join(syllable for _, syllables in segments for syllable in syllables)
+            file.write(f"{entry.emoticon} {pinyin} 0\n")
+            entry_count += 1
+    print(f"已生成fcitx5拼音词库文本: {output_file}，跳过 {skipped} 个无法表示的词条")
+    return entry_count
+
+
+register_dict_writer(DictWriter('tsv', '.tsv', write_tsv))
+register_dict_writer(DictWriter('jsonl', '.jsonl', write_jsonl))
+register_dict_writer(DictWriter('fcitx5', '.fcitx5.txt', write_fcitx5_pinyin,
+                                dict_kinds=('pinyin',), needs_segments=True))
@@ -0,0 +1,171 @@
+"""
+外部排序模块 - 对超出内存的词条进行去重排序
+
+主要功能：
+1. 按内存预算把输入切分为有界的分段，每段去重排序后写入临时文件
+2. 对所有分段做k路归并，归并时去除跨分段的重复词条
+3. 输出与内存内去重排序完全一致(排序键相同的词条只保留先出现的一个)
+4. 归并结果可以写入临时文件，供多个输出逐条读取而不必整体载入内存
+"""
+
+import heapq
+import os
+import pickle
+import sys
+import tempfile
+import weakref
+from typing import Any, Callable, Iterable, Iterator, List
+
+# 每个词条除自身外，字典和列表的额外开销估计(字节)
+_PER_ITEM_OVERHEAD = 100
+
+# 默认内存预算(MB)
+DEFAULT_MEMORY_BUDGET_MB = 256
+
+
+def _estimate_size(item: Any) -> int:
+    """估计词条占用的内存，元组(如DictEntry)计入各字段的大小"""
+    size = sys.getsizeof(item) + _PER_ITEM_OVERHEAD
+    if isinstance(item, tuple):
+        size += sum(sys.getsizeof(field) for field in item)
+    return size
+
+
+def _write_run(items: List[Any], tmp_dir: str) -> str:
+    """将已排序的一段词条逐个序列化写入临时文件"""
+    fd, path = tempfile.mkstemp(prefix='dedup_run_', suffix='.pickle', dir=tmp_dir)
+    with os.fdopen(fd, 'wb') as file:
+        for item in items:
+            pickle.dump(item, file, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def _read_run(path: str) -> Iterator[Any]:
+    """逐个读取分段临时文件中的词条"""
+    with open(path, 'rb') as file:
+        while True:
+            try:
+                yield pickle.load(file)
+            except EOFError:
+                return
+
+
+def _sorted_chunk(chunk: dict) -> List[Any]:
+    """按排序键对分段排序，chunk为 排序键->词条 的映射"""
+    return [chunk[key] for key in sorted(chunk)]
+
+
+def external_dedup_and_sort(items: Iterable[Any],
+                            sort_key_func: Callable[[Any], Any],
+                            memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB,
+                            tmp_dir: str = None) -> Iterator[Any]:
+    """
+    基于磁盘的去重排序，内存占用不超过预算
+
+    Args:
+        items: 需要去重排序的词条，可以是生成器，词条必须可以pickle序列化
+        sort_key_func: 排序键函数，排序键相同的词条视为重复
+        memory_budget_mb: 每个分段的内存预算(MB)
+        tmp_dir: 临时文件目录，默认使用系统临时目录
+
+    Returns:
+        去重排序后的词条迭代器
+    """
+    budget = max(1, int(memory_budget_mb * 1024 * 1024))
+
+    with tempfile.TemporaryDirectory(prefix='kaomoji_sort_', dir=tmp_dir) as work_dir:
+        run_paths = []
+        chunk = {}
+        used = 0
+        for item in items:
+            key = sort_key_func(item)
+            if key in chunk:
+                continue
+            chunk[key] = item
+            used += _estimate_size(item)
+            if used >= budget:
+                run_paths.append(_write_run(_sorted_chunk(chunk), work_dir))
+                chunk = {}
+                used = 0
+
+        # 只有一个分段时无需落盘
+        if not run_paths:
+            yield from _sorted_chunk(chunk)
+            return
+        if chunk:
+            run_paths.append(_write_run(_sorted_chunk(chunk), work_dir))
+            chunk = {}
+
+        # k路归并，heapq.merge对相等的键按分段顺序输出，相邻的重复词条只保留先出现的一个
+        previous = object()
+        for item in heapq.merge(*(_read_run(path) for path in run_paths), key=sort_key_func):
+            key = sort_key_func(item)
+            if key != previous:
+                yield item
+                previous = key
+
+
+def _remove_file(path: str):
+    """删除临时文件，文件已不存在时忽略"""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class SpilledEntries:
+    """
+    保存在临时文件中的去重排序结果，可以多次迭代，每次迭代都逐条从磁盘读取
+
+    对象被回收时删除临时文件。对象被pickle(如从工作进程返回主进程)时，
+    临时文件的所有权随之转移给反序列化得到的对象，原对象不再删除文件。
+    """
+
+    def __init__(self, path: str, count: int):
+        """
+        Args:
+            path: 逐个pickle序列化的词条所在的临时文件
+            count: 词条数量
+        """
+        self.path = path
+        self._count = count
+        self._finalizer = weakref.finalize(self, _remove_file, path)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[Any]:
+        return _read_run(self.path)
+
+    def __reduce__(self):
+        self._finalizer.detach()
+        return SpilledEntries, (self.path, self._count)
+
+
+def spill_dedup_and_sort(items: Iterable[Any],
+                         sort_key_func: Callable[[Any], Any],
+                         memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB,
+                         tmp_dir: str = None) -> SpilledEntries:
+    """
+    基于磁盘的去重排序，归并结果也写入临时文件，整个过程的内存占用不超过预算
+
+    Args:
+        items: 需要去重排序的词条，可以是生成器，词条必须可以pickle序列化
+        sort_key_func: 排序键函数，排序键相同的词条视为重复
+        memory_budget_mb: 每个分段的内存预算(MB)
+        tmp_dir: 临时文件目录，默认使用系统临时目录
+
+    Returns:
+        去重排序后的词条，可以多次迭代
+    """
+    fd, path = tempfile.mkstemp(prefix='dedup_result_', suffix='.pickle', dir=tmp_dir)
+    count = 0
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            for item in external_dedup_and_sort(items, sort_key_func, memory_budget_mb, tmp_dir):
+                pickle.dump(item, file, protocol=pickle.HIGHEST_PROTOCOL)
+                count += 1
+    except BaseException:
+        _remove_file(path)
+        raise
+    return SpilledEntries(path, count)
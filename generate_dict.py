@@ -14,6 +14,7 @@ Rime颜文字词库生成工具
 
 选项:
     --output-dir DIR       指定输出目录
+    --data-dir DIR         指定数据源目录
     --all                  生成所有类型的词库(全拼词库、kmj词库和所有双拼方案词库)
     --pinyin               生成拼音版词库
     --kmj                  生成kmj版词库
@@ -22,18 +23,59 @@ Rime颜文字词库生成工具
                           指定双拼方案
     --no-special-space    不使用特殊空格替换普通空格
     --no-dedup            不对生成的词库进行去重
+    --no-cache            不使用输出目录下的构建缓存
+    --cache-max-entries N 构建缓存的条目上限
+    --force               忽略构建清单，重新生成所有词库
+    --no-intermediate     不保存all_output_result_*.txt中间文件
+    --dedup-memory-mb N   使用内存预算为N MB的外部排序进行去重排序
+    --jobs N, -j N        使用N个进程并行解析数据源和生成双拼词库，0表示使用全部CPU核心
+    --profile             输出各阶段和各数据源的耗时、条目数和内存峰值
+    --metrics-out FILE    将各阶段和各数据源的指标写入JSON文件
+    --profile-dir DIR     为每个阶段保存cProfile数据
+    --version-mode {date,hash,keep}
+                          词库version的取值方式：构建日期、词条内容哈希或内容未变化时保留原version
+    --kmj-max-candidates N
+                          将kmj词库按描述拼音首字母分散到子编码，每个编码最多N个候选
+    --split-dicts {source,initial}
+                          按数据源或编码首字母拆分为子词库，主词库通过import_tables导入
+    --formats LIST        逗号分隔的输出格式：rime、fcitx5、tsv、jsonl
+    --index               生成按拼音、双拼编码和中文描述前缀检索的索引(kaomoji_index.bin)
+                          和中文描述的二元组倒排索引(kaomoji_desc_index.bin)
+    --delta-from DIR      生成相对于DIR中上一次发布词库的增量差异
+    --delta-dir DIR       增量差异的输出目录
     --help                显示帮助信息
 """
 
 import os
-import re
 import argparse
 import datetime
-from typing import List, Tuple, Dict
+import glob
+import hashlib
+import re
+import shutil
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
 from pypinyin import NORMAL
 from pyshuangpin import Scheme, shuangpin_by_syllabl
 
-from kaomoji_processor import KaomojiProcessor
+from kaomoji_processor import DictEntry, KaomojiProcessor, parse_dict_line
+from build_cache import BuildCache, CACHE_FILENAME, DEFAULT_MAX_ENTRIES
+from build_manifest import BuildManifest, content_digest, file_sha256, tool_fingerprint
+from external_sort import SpilledEntries, spill_dedup_and_sort
+from parallel_build import (create_executor, get_worker_cache, get_worker_processor, resolve_jobs, run_ordered,
+                            split_chunks, take_worker_cache_updates)
+from stage_scheduler import StageScheduler
+from build_metrics import BuildMetrics
+from dict_delta import diff_directories, print_delta_summary
+from dict_writers import DICT_WRITERS, DictWriter, register_dict_writer
+from kaomoji_index import INDEX_FILENAME, write_index
+from kaomoji_search import DESC_INDEX_FILENAME, write_description_index
+
+# 词库version的取值方式
+VERSION_MODES = ('date', 'hash', 'keep')
+
+# 拆分词库的方式：按数据源或按编码首字母
+SPLIT_MODES = ('source', 'initial')
 
 
 def parse_arguments():
@@ -41,6 +83,8 @@ def parse_arguments():
     parser = argparse.ArgumentParser(description='Rime颜文字词库生成工具')
     parser.add_argument('--output-dir', type=str, default='output',
                         help='指定输出目录 (默认: output)')
+    parser.add_argument('--data-dir', type=str, default='data',
+                        help='指定数据源目录 (默认: data)')
     parser.add_argument('--all', action='store_true',
                         help='生成所有类型的词库(全拼词库、kmj词库和所有双拼方案词库)')
     parser.add_argument('--pinyin', action='store_true',
@@ -55,7 +99,48 @@ def parse_arguments():
                         help='不使用特殊空格替换普通空格')
     parser.add_argument('--no-dedup', action='store_true',
                         help='不对生成的词库进行去重')
-    return parser.parse_args()
+    parser.add_argument('--no-cache', action='store_true',
+                        help='不使用输出目录下的构建缓存')
+    parser.add_argument('--cache-max-entries', type=int, default=DEFAULT_MAX_ENTRIES,
+                        help=f'构建缓存的条目上限 (默认: {DEFAULT_MAX_ENTRIES})')
+    parser.add_argument('--force', action='store_true',
+                        help='忽略构建清单，重新生成所有词库')
+    parser.add_argument('--no-intermediate', action='store_true',
+                        help='不保存all_output_result_*.txt中间文件，词条直接写入.dict.yaml')
+    parser.add_argument('--dedup-memory-mb', type=float, default=None,
+                        help='去重排序的内存预算(MB)，指定时使用基于磁盘的外部排序 (默认: 在内存中排序)')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='并行进程数，0表示使用全部CPU核心 (默认: 1，即串行生成)')
+    parser.add_argument('--profile', action='store_true',
+                        help='输出各阶段和各数据源的耗时、条目数和内存峰值')
+    parser.add_argument('--metrics-out', type=str, default=None,
+                        help='将各阶段和各数据源的指标写入指定的JSON文件')
+    parser.add_argument('--profile-dir', type=str, default=None,
+                        help='为每个阶段保存cProfile数据到指定目录(阶段改为依次执行)')
+    parser.add_argument('--version-mode', type=str, choices=VERSION_MODES, default='date',
+                        help='词库version的取值方式：date为构建日期，hash为词条内容哈希，'
+                             'keep为词条未变化时保留已有词库的version (默认: date)')
+    parser.add_argument('--kmj-max-candidates', type=int, default=None,
+                        help='每个kmj编码的最大候选数量，指定时按描述拼音首字母分散到kmja、kmjb等子编码 (默认: 全部使用kmj)')
+    parser.add_argument('--split-dicts', type=str, choices=SPLIT_MODES, default=None,
+                        help='按数据源(source)或编码首字母(initial)拆分为子词库，主词库通过import_tables导入 (默认: 不拆分)')
+    parser.add_argument('--formats', type=str, default='rime',
+                        help='逗号分隔的输出格式：rime、fcitx5(仅拼音词库)、tsv、jsonl，各格式由同一份词条并发写出 (默认: rime)')
+    parser.add_argument('--index', action='store_true',
+                        help=f'生成按拼音、双拼编码和中文描述前缀检索的索引({INDEX_FILENAME})和中文描述的'
+                             f'二元组倒排索引({DESC_INDEX_FILENAME})，可用kaomoji_index.py和kaomoji_search.py查询')
+    parser.add_argument('--delta-from', type=str, default=None,
+                        help='上一次发布的词库目录，指定时为每个有变化的词库生成增量差异')
+    parser.add_argument('--delta-dir', type=str, default=None,
+                        help='增量差异的输出目录 (默认: 输出目录下的delta)')
+    args = parser.parse_args()
+    if args.kmj_max_candidates is not None and args.kmj_max_candidates < 1:
+        parser.error('--kmj-max-candidates 必须大于0')
+    args.formats = list(dict.fromkeys(name.strip() for name in args.formats.split(',') if name.strip()))
+    unknown_formats = [name for name in args.formats if name not in DICT_WRITERS]
+    if unknown_formats or not args.formats:
+        parser.error(f"未知的输出格式: {', '.join(unknown_formats)} (可选: {', '.join(DICT_WRITERS)})")
+    return args
 
 
 def select_scheme(scheme_name: str) -> Scheme:
@@ -105,41 +190,185 @@ def get_pinyin_key(item: str) -> str:
     Returns:
         拼音键(小写)
     """
-    parts = item.split("\t")
+    parts = item.split("\t", 2)
     if len(parts) > 1:
         chinese_pinyin = parts[1]
         return chinese_pinyin.lower()  # 转换为小写进行来忽略大小写
     return ""
 
 
-def dedup_and_sort(lines: List[str], sort_key_func=None) -> List[str]:
+def get_line_sort_key(line: str) -> Tuple[str, str]:
     """
-    去除重复行并排序
+    获取文本行的排序键，用于无法解析为词条的行(如格式不符的行)
     
     Args:
-        lines: 需要去重排序的行列表
-        sort_key_func: 排序键函数，默认使用get_pinyin_key
+        line: 词库行
         
     Returns:
-        去重排序后的行列表
+        (拼音键, 整行)
     """
-    # 去除重复的行
-    unique_lines = list(set(lines))
+    return get_pinyin_key(line), line
+
+
+def dedup_and_sort(entries: Iterable, sort_key_func=None,
+                   memory_budget_mb: float = None) -> Union[list, SpilledEntries]:
+    """
+    去除重复词条并排序
     
-    # 排序
-    if sort_key_func:
-        sorted_lines = sorted(unique_lines, key=sort_key_func)
-    else:
-        sorted_lines = sorted(unique_lines, key=get_pinyin_key)
+    Args:
+        entries: 需要去重排序的词条，可以是生成器
+        sort_key_func: 排序键函数，默认使用DictEntry.sort_key；排序键相同的词条视为重复，只保留先出现的一个
+        memory_budget_mb: 内存预算(MB)，指定时使用基于磁盘的外部排序，结果与内存内排序完全一致
+        
+    Returns:
+        去重排序后的词条列表；指定内存预算时为保存在临时文件中的SpilledEntries，
+        支持len()和多次迭代，写出时逐条从磁盘读取
+    """
+    sort_key_func = sort_key_func or DictEntry.sort_key
+    
+    if memory_budget_mb:
+        return spill_dedup_and_sort(entries, sort_key_func, memory_budget_mb)
         
-    return sorted_lines
+    # 去除重复的词条并排序
+    unique = {}
+    for entry in entries:
+        unique.setdefault(sort_key_func(entry), entry)
+    return [unique[key] for key in sorted(unique)]
+
+
+def write_lines(entries: Iterable[DictEntry], output_file: str) -> int:
+    """
+    将词条逐条格式化写入文本文件
+    
+    Args:
+        entries: 词条，可以是列表或生成器
+        output_file: 输出文件路径
+        
+    Returns:
+        写入的行数
+    """
+    # 确保输出目录存在
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    
+    count = 0
+    with open(output_file, 'w', encoding='utf-8') as output_file_obj:
+        for entry in entries:
+            output_file_obj.write(entry.to_line())
+            count += 1
+    return count
+
+
+def _parse_source_chunk(content: str,
+                        source_type: str,
+                        use_special_space: bool) -> Tuple[Tuple[list, Dict[str, int]], None]:
+    """在工作进程中解析数据源的一个分块，返回 ((解析结果, 统计), None)，解析不使用构建缓存"""
+    processor = get_worker_processor()
+    stats = {}
+    entries = processor.parse_source_data(content, source_type, use_special_space, stats)
+    return (entries, stats), None
+
+
+def parse_input_files(processor: KaomojiProcessor,
+                      input_files: List[str],
+                      use_special_space: bool = True,
+                      source_formats: Dict[str, str] = None,
+                      manifest: BuildManifest = None,
+                      executor: Executor = None,
+                      metrics: BuildMetrics = None) -> Dict[str, List[Tuple[str, Optional[str], Optional[str]]]]:
+    """
+    读取并解析所有输入文件，每个文件只解析一次，结果供拼音词库、kmj词库和描述索引共用
+    
+    Args:
+        processor: 颜文字处理器
+        input_files: 输入文件列表
+        use_special_space: 是否使用特殊空格
+        source_formats: 输入文件到数据源格式名称的映射，未声明的文件根据文件名推断格式
+        manifest: 可选的构建清单，内容未变化的数据源直接复用上次的解析结果
+        executor: 可选的进程池，各数据源按行范围切分后并行解析，结果按原顺序合并
+        metrics: 可选的构建指标，记录每个数据源的读取行数、生成条目数和被排除的行数
+        
+    Returns:
+        输入文件路径到 (颜文字, 编码, 描述) 列表的有序映射
+    """
+    parsed_sources = {}
+    sha256s = {}
+    pending_files = []
+    for input_filename in input_files:
+        if not os.path.exists(input_filename):
+            print(f"警告: 文件 {input_filename} 不存在，已跳过")
+            continue
+            
+        if manifest is not None:
+            sha256s[input_filename] = file_sha256(input_filename)
+            entries = manifest.load_parsed(input_filename, sha256s[input_filename])
+            if entries is not None:
+                parsed_sources[input_filename] = entries
+                if metrics is not None:
+                    metrics.record_source(input_filename, reused=True, entries=len(entries))
+                continue
+        
+        # 先占位，保持输入文件的顺序
+        parsed_sources[input_filename] = None
+        pending_files.append(input_filename)
+        
+    source_stats = {input_filename: {} for input_filename in pending_files}
+    # 读取或解析失败的数据源结果为空列表，但不写入构建清单，下次构建重新解析
+    failed_files = set()
+    if executor is None:
+        for input_filename in pending_files:
+            try:
+                parsed_sources[input_filename] = processor.parse_file(
+                    input_filename,
+                    use_special_space=use_special_space,
+                    source_format=(source_formats or {}).get(input_filename),
+                    stats=source_stats[input_filename]
+                )
+            except Exception as e:
+                print(f"处理文件 {input_filename} 时发生错误: {str(e)}")
+                parsed_sources[input_filename] = []
+                failed_files.add(input_filename)
+    else:
+        tasks = []
+        task_files = []
+        for input_filename in pending_files:
+            source_format = (source_formats or {}).get(input_filename)
+            try:
+                content = processor.read_source_file(input_filename, source_format)
+            except Exception as e:
+                print(f"处理文件 {input_filename} 时发生错误: {str(e)}")
+                parsed_sources[input_filename] = []
+                failed_files.add(input_filename)
+                continue
+            # 各适配器都是逐行匹配，按行范围切分不影响解析结果
+            parsed_sources[input_filename] = []
+            for chunk in split_chunks(content.splitlines()):
+                tasks.append(('\n'.join(chunk), source_format or input_filename, use_special_space))
+                task_files.append(input_filename)
+        for input_filename, (entries, stats) in zip(task_files, run_ordered(executor, _parse_source_chunk, tasks)):
+            parsed_sources[input_filename].extend(entries)
+            for key, value in stats.items():
+                source_stats[input_filename][key] = source_stats[input_filename].get(key, 0) + value
+    
+    if metrics is not None:
+        for input_filename, stats in source_stats.items():
+            metrics.record_source(input_filename, reused=False, **stats)
+    
+    if manifest is not None:
+        for input_filename in pending_files:
+            if input_filename in failed_files:
+                continue
+            manifest.store_parsed(input_filename, sha256s[input_filename], parsed_sources[input_filename])
+    return parsed_sources
 
 
 def generate_pinyin_dictionary(processor: KaomojiProcessor, 
                               input_files: List[str], 
                               output_file: str,
                               use_special_space: bool = True,
-                              use_dedup: bool = True) -> List[str]:
+                              use_dedup: bool = True,
+                              parsed_sources: Dict[str, List[Tuple[str, Optional[str], Optional[str]]]] = None,
+                              save_txt: bool = True,
+                              memory_budget_mb: float = None) -> List[DictEntry]:
     """
     生成拼音版词库
     
@@ -149,50 +378,123 @@ def generate_pinyin_dictionary(processor: KaomojiProcessor,
         output_file: 输出文件路径
         use_special_space: 是否使用特殊空格
         use_dedup: 是否进行去重排序
+        parsed_sources: parse_input_files的解析结果，为None时自行读取并解析输入文件
+        save_txt: 是否保存中间文本文件，为False时只返回结果
+        memory_budget_mb: 去重排序的内存预算(MB)，指定时使用外部排序
         
     Returns:
-        处理结果列表
+        词条列表
     """
-    all_output_result = []
-    
     print("正在生成拼音版词库...")
-    for input_filename in input_files:
-        if not os.path.exists(input_filename):
-            print(f"警告: 文件 {input_filename} 不存在，已跳过")
-            continue
-            
-        # A_kaomoji文件不支持拼音转换，直接跳过
-        if 'A_kaomoji' in input_filename:
-            continue
-            
-        pinyin_results, _ = processor.process_file(
-            input_filename=input_filename,
-            is_pinyin=True,
-            save_file=False,
-            use_special_space=use_special_space
-        )
-        all_output_result.extend(pinyin_results)
+    if parsed_sources is None:
+        parsed_sources = parse_input_files(processor, input_files, use_special_space)
+        
+    # A_kaomoji文件不支持拼音转换，直接跳过
+    candidates = (
+        entry for input_filename, entries in parsed_sources.items() if 'A_kaomoji' not in input_filename
+        for entry in processor.build_pinyin_entries(entries, input_filename)
+    )
     
     # 使用去重排序函数处理结果
     if use_dedup:
-        all_output_result = dedup_and_sort(all_output_result)
-    
-    # 确保输出目录存在
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        all_output_result = dedup_and_sort(candidates, memory_budget_mb=memory_budget_mb)
+    else:
+        all_output_result = list(candidates)
     
     # 保存结果
-    with open(output_file, 'w', encoding='utf-8') as output_file_obj:
-        output_file_obj.writelines(all_output_result)
+    if save_txt:
+        write_lines(all_output_result, output_file)
     
     print(f"拼音版词库已生成，共 {len(all_output_result)} 个颜文字")
     return all_output_result
 
 
+# 没有拼音(如A_kaomoji数据源)的颜文字使用的分组字母，拼音不会以v开头
+_KMJ_NO_PINYIN_GROUP = 'v'
+
+# 候选数量直方图的区间下限
+_HISTOGRAM_EDGES = (1, 11, 51, 101, 201, 501, 1001, 2001, 5001)
+
+
+def _page_suffix(page: int, width: int) -> str:
+    """将分页序号转换为固定宽度的字母后缀(a、b、...、z、aa、ab、...)"""
+    suffix = ''
+    for _ in range(width):
+        page, remainder = divmod(page, 26)
+        suffix = chr(ord('a') + remainder) + suffix
+    return suffix
+
+
+def assign_kmj_codes(entries: List[DictEntry], pinyin_map: Dict[str, str], max_candidates: int) -> List[DictEntry]:
+    """
+    将kmj词条分散到候选数量有上限的子编码中
+    
+    颜文字按描述拼音的首字母分组，编码为kmj加首字母(如kmjk)，没有拼音的颜文字归入kmjv；
+    分组的条目数超过max_candidates时按拼音排序后分页，每页编码再加上固定宽度的字母序号(如kmjka、kmjkb)。
+    同一分组的编码长度相同，不同分组的首字母不同，因此各子编码互不重叠。
+    
+    Args:
+        entries: kmj词条
+        pinyin_map: 颜文字到描述拼音的映射
+        max_candidates: 每个编码的最大候选数量
+        
+    Returns:
+        替换了编码的词条列表，顺序与输入相同
+    """
+    groups: Dict[str, List[int]] = {}
+    sort_keys = []
+    for index, entry in enumerate(entries):
+        letters = ''.join(c for c in (pinyin_map.get(entry.emoticon) or '').lower() if 'a' <= c <= 'z')
+        sort_keys.append((letters, entry.emoticon))
+        groups.setdefault(letters[:1] or _KMJ_NO_PINYIN_GROUP, []).append(index)
+        
+    codes = [''] * len(entries)
+    for group, indexes in groups.items():
+        if len(indexes) <= max_candidates:
+            for index in indexes:
+                codes[index] = f'kmj{group}'
+            continue
+        indexes.sort(key=lambda index: sort_keys[index])
+        pages = -(-len(indexes) // max_candidates)
+        width = 1
+        while 26 ** width < pages:
+            width += 1
+        for position, index in enumerate(indexes):
+            codes[index] = f'kmj{group}{_page_suffix(position // max_candidates, width)}'
+            
+    return [entry._replace(code=code) for entry, code in zip(entries, codes)]
+
+
+def candidate_histogram(entries: Iterable[DictEntry]) -> Dict[str, int]:
+    """
+    统计每个编码的候选数量分布
+    
+    Args:
+        entries: 词条
+        
+    Returns:
+        候选数量区间(如"11-50")到编码个数的有序映射
+    """
+    counts: Dict[str, int] = {}
+    for entry in entries:
+        counts[entry.code] = counts.get(entry.code, 0) + 1
+        
+    histogram = {}
+    for lower, upper in zip(_HISTOGRAM_EDGES, _HISTOGRAM_EDGES[1:] + (None,)):
+        label = f'{lower}-{upper - 1}' if upper is not None else f'{lower}+'
+        histogram[label] = sum(1 for count in counts.values() if count >= lower and (upper is None or count < upper))
+    return histogram
+
+
 def generate_kmj_dictionary(processor: KaomojiProcessor, 
                            input_files: List[str], 
                            output_file: str,
                            use_special_space: bool = True,
-                           use_dedup: bool = True) -> List[str]:
+                           use_dedup: bool = True,
+                           parsed_sources: Dict[str, List[Tuple[str, Optional[str], Optional[str]]]] = None,
+                           save_txt: bool = True,
+                           memory_budget_mb: float = None,
+                           max_candidates: int = None) -> List[DictEntry]:
     """
     生成kmj版词库
     
@@ -202,228 +504,409 @@ def generate_kmj_dictionary(processor: KaomojiProcessor,
         output_file: 输出文件路径
         use_special_space: 是否使用特殊空格
         use_dedup: 是否进行去重排序
+        parsed_sources: parse_input_files的解析结果，为None时自行读取并解析输入文件
+        save_txt: 是否保存中间文本文件，为False时只返回结果
+        memory_budget_mb: 去重排序的内存预算(MB)，指定时使用外部排序
+        max_candidates: 每个编码的最大候选数量，指定时按描述拼音的首字母分散到kmj子编码(见assign_kmj_codes)
         
     Returns:
-        处理结果列表
+        词条列表
     """
-    all_output_result = []
-    
     print("正在生成kmj版词库...")
-    for input_filename in input_files:
-        if not os.path.exists(input_filename):
-            print(f"警告: 文件 {input_filename} 不存在，已跳过")
-            continue
-            
-        _, kmj_results = processor.process_file(
-            input_filename=input_filename,
-            is_pinyin=False,
-            save_file=False,
-            use_special_space=use_special_space
-        )
-        all_output_result.extend(kmj_results)
+    if parsed_sources is None:
+        parsed_sources = parse_input_files(processor, input_files, use_special_space)
+        
+    candidates = (
+        entry for input_filename, entries in parsed_sources.items()
+        for entry in processor.build_kmj_entries(entries, input_filename)
+    )
     
     # 使用去重排序函数处理结果
     if use_dedup:
-        all_output_result = dedup_and_sort(all_output_result)
-    
-    # 确保输出目录存在
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        all_output_result = dedup_and_sort(candidates, memory_budget_mb=memory_budget_mb)
+    else:
+        all_output_result = list(candidates)
+        
+    if max_candidates is not None:
+        # 同一颜文字取第一个有拼音的描述
+        pinyin_map = {}
+        for input_filename, entries in parsed_sources.items():
+            for entry in processor.build_pinyin_entries(entries, input_filename):
+                pinyin_map.setdefault(entry.emoticon, entry.code)
+        all_output_result = assign_kmj_codes(all_output_result, pinyin_map, max_candidates)
+        if use_dedup:
+            all_output_result.sort(key=DictEntry.sort_key)
+        histogram = ', '.join(f"{label}: {count}" for label, count in candidate_histogram(all_output_result).items()
+                              if count)
+        print(f"kmj子编码的候选数量分布(候选数: 编码数): {histogram}")
     
     # 保存结果
-    with open(output_file, 'w', encoding='utf-8') as output_file_obj:
-        output_file_obj.writelines(all_output_result)
+    if save_txt:
+        write_lines(all_output_result, output_file)
     
     print(f"kmj版词库已生成，共 {len(all_output_result)} 个颜文字")
     return all_output_result
 
 
-def generate_shuangpin_dictionary(pinyin_dict_file: str, 
-                                 output_file: str,
-                                 scheme: Scheme,
-                                 include_details: bool = False,
-                                 use_dedup: bool = True,
-                                 use_special_space: bool = True) -> Tuple[List[str], List[str]]:
+def normalize_syllables(syllablelist: List[str]) -> Optional[List[str]]:
     """
-    生成双拼版词库
+    检查音节列表是否为纯拼音编码，并将 jue、lüe 等写法规范化
     
     Args:
-        pinyin_dict_file: 拼音词库文件路径
-        output_file: 输出文件路径
-        scheme: 双拼方案
-        include_details: 是否包含详细信息(全拼和汉字)
-        use_dedup: 是否进行去重排序
-        use_special_space: 是否使用特殊空格(U+2002)
+        syllablelist: 音节列表
         
     Returns:
-        处理结果元组 (成功列表, 失败列表)
+        规范化后的音节列表，包含非拼音音节时返回None
     """
     from Pinyin2Hanzi import simplify_pinyin, is_pinyin
+    
+    normalized = []
+    for syllable in syllablelist:
+        if not is_pinyin(syllable):
+            syllable = simplify_pinyin(syllable)
+            if not is_pinyin(syllable):
+                return None
+        normalized.append(syllable)
+    return normalized
+
+
+def read_pinyin_dictionary(pinyin_dict_file: str) -> Tuple[List[DictEntry], List[str]]:
+    """
+    读取拼音词库中间文件并解析为词条
+    
+    Args:
+        pinyin_dict_file: 拼音词库文件路径
+        
+    Returns:
+        (词条列表, 格式不符行列表)
+    """
+    pinyin_entries = []
+    bad_lines = []
+    with open(pinyin_dict_file, 'r', encoding='utf-8') as file:
+        for line in file:
+            entry = parse_dict_line(line, pinyin_dict_file)
+            if entry is None:
+                # 不符合格式的行添加到bad结果
+                bad_lines.append(line)
+            else:
+                pinyin_entries.append(entry)
+    return pinyin_entries, bad_lines
+
+
+def _segment_chunk(pinyin_entries: List[DictEntry],
+                   include_details: bool,
+                   cache_path: Optional[str]) -> Tuple[List[DictEntry], Optional[Dict]]:
+    """在工作进程中切分一个分块的拼音词条，返回 (切分结果, 构建缓存更新)"""
+    cache = get_worker_cache(cache_path)
+    segmented, _ = segment_pinyin_dictionary(None, include_details, cache, pinyin_entries)
+    return segmented, take_worker_cache_updates(cache)
+
+
+def segment_pinyin_dictionary(pinyin_dict_file: str,
+                              include_details: bool = False,
+                              cache: BuildCache = None,
+                              pinyin_entries: Iterable[DictEntry] = None) -> Tuple[List[DictEntry], List[str]]:
+    """
+    读取拼音词库并完成音节切分，结果可供所有双拼方案共用
+    
+    Args:
+        pinyin_dict_file: 拼音词库文件路径
+        include_details: 是否需要详细信息(为无空格的编码识别汉字)
+        cache: 可选的构建缓存，复用之前构建的切分和汉字识别结果
+        pinyin_entries: 拼音词库词条，提供时直接使用而不读取pinyin_dict_file
+        
+    Returns:
+        (切分结果列表, 格式不符行列表)
+        切分结果为填入了syllables的拼音词条，syllables的每一项为 (原始片段, 规范化音节元组或None)；
+        需要详细信息且识别出汉字时，汉字保存在extra中
+    """
     import pychaifen
     
-    if not os.path.exists(pinyin_dict_file):
-        print(f"错误: 拼音词库文件 {pinyin_dict_file} 不存在")
-        return [], []
+    def segment(part: str) -> List[str]:
+        if cache is None:
+            return pychaifen.quanp2shuangp(part)
+        return cache.get_or_compute('segment', part, lambda key: ' '.join(pychaifen.quanp2shuangp(key))).split(' ')
         
-    print(f"正在生成双拼版词库 (方案: {scheme.name})...")
+    def recognize(syllablelist: Tuple[str, ...]) -> str:
+        if cache is None:
+            return pychaifen.py2hz(list(syllablelist))
+        return cache.get_or_compute('hanzi', ' '.join(syllablelist), lambda key: pychaifen.py2hz(key.split(' ')))
     
-    # 读取拼音词库
-    with open(pinyin_dict_file, 'r', encoding='utf-8') as file:
-        lines = file.readlines()
-        
-    pattern = r'^(.*?)\t(.*)\t(.*)$'
-    output_result_shuangpin = []
-    output_result_shuangpin_bad = []  # 仅用于记录完全无法处理的条目
-    
-    # 处理每一行
-    for line in lines:
-        match = re.search(pattern, line)
-        if match:
-            quanpin_text = match.group(2)  # 提取拼音
-            emoticon = match.group(1).strip()  # 提取颜文字
+    bad_lines = []  # 仅用于记录完全无法处理的条目
+    if pinyin_entries is None:
+        pinyin_entries, bad_lines = read_pinyin_dictionary(pinyin_dict_file)
+        
+    segmented = []
+    for entry in pinyin_entries:
+        quanpin_text = entry.code
+        
+        # 特殊空格临时替换为普通空格进行处理
+        has_special_spaces = '\u2002' in quanpin_text
+        temp_quanpin_text = quanpin_text.replace('\u2002', ' ') if has_special_spaces else quanpin_text
+        spaced = ' ' in temp_quanpin_text or has_special_spaces
+        
+        if spaced:
+            # 按空格分割拼音字符串，逐个处理每部分拼音，跳过空字符串
+            parts = [part for part in temp_quanpin_text.split(' ') if part]
+        else:
+            parts = [quanpin_text]
             
-            # 处理任何类型的空格，包括普通空格和特殊空格
-            space_char = '\u2002' if use_special_space else ' '
+        segments = []
+        for part in parts:
+            syllablelist = normalize_syllables(segment(part))
+            segments.append((part, tuple(syllablelist) if syllablelist is not None else None))
+        
+        extra = ()
+        if include_details and not spaced and segments[0][1] is not None:
+            extra = (recognize(segments[0][1]),)
             
-            # 检测并替换特殊空格为临时标记，以便后续处理
-            has_special_spaces = '\u2002' in quanpin_text
-            if has_special_spaces:
-                # 临时替换特殊空格为普通空格进行处理
-                temp_quanpin_text = quanpin_text.replace('\u2002', ' ')
-            else:
-                temp_quanpin_text = quanpin_text
-                
-            # 处理带空格的拼音情况
-            if ' ' in temp_quanpin_text or has_special_spaces:
-                # 按空格分割拼音字符串
-                quanpin_parts = temp_quanpin_text.split(' ')
-                shuangpin_parts = []
-                
-                # 逐个处理每部分拼音
-                for part in quanpin_parts:
-                    if not part:  # 跳过空字符串
-                        continue
-                        
-                    syllablelist = pychaifen.quanp2shuangp(part)
-                    
-                    # 检查编码是否为纯拼音编码
-                    is_pinyin_syllablelist = True
-                    for i in range(len(syllablelist)):
-                        syllable = syllablelist[i]
-                        if not is_pinyin(syllable):
-                            syllable_mod = simplify_pinyin(syllable)
-                            if not is_pinyin(syllable_mod):
-                                is_pinyin_syllablelist = False
-                                continue
-                            else:
-                                if syllable_mod != syllable:
-                                    syllablelist[i] = syllable_mod
-                    
-                    if is_pinyin_syllablelist:
-                        # 使用pyshuangpin库将全拼转换为双拼
-                        shuangpin_text = shuangpin_by_syllabl(syllablelist, scheme, style=NORMAL)
-                        shuangpin_str = ''.join([item[0] for item in shuangpin_text])
-                        shuangpin_parts.append(shuangpin_str)
-                    else:
-                        # 对于无效的拼音部分，保留原始文本
-                        shuangpin_parts.append(part)
-                
-                # 用适当的空格类型重新连接各部分双拼结果
-                final_shuangpin_str = space_char.join(shuangpin_parts)
-                
-                # 格式化输出行
-                if include_details:
-                    output_line = f"{emoticon}\t{final_shuangpin_str}\t1\t{quanpin_text}\n"
-                else:
-                    output_line = f"{emoticon}\t{final_shuangpin_str}\t1\n"
-                    
-                output_result_shuangpin.append(output_line)
-            else:
-                # 无空格情况
-                syllablelist = pychaifen.quanp2shuangp(quanpin_text)
-                
-                # 检查编码是否为纯拼音编码
-                is_pinyin_syllablelist = True
-                for i in range(len(syllablelist)):
-                    syllable = syllablelist[i]
-                    if not is_pinyin(syllable):
-                        syllable_mod = simplify_pinyin(syllable)
-                        if not is_pinyin(syllable_mod):
-                            is_pinyin_syllablelist = False
-                            continue
-                        else:
-                            if syllable_mod != syllable:
-                                syllablelist[i] = syllable_mod
-                
-                if is_pinyin_syllablelist:
-                    # 使用pyshuangpin库将全拼转换为双拼
-                    shuangpin_text = shuangpin_by_syllabl(syllablelist, scheme, style=NORMAL)
-                    shuangpin_str = ''.join([item[0] for item in shuangpin_text])
-                    
-                    # 格式化输出行
-                    if include_details:
-                        hanzi_text = pychaifen.py2hz(syllablelist)
-                        output_line = f"{emoticon}\t{shuangpin_str}\t1\t{quanpin_text}\t{hanzi_text}\n"
-                    else:
-                        output_line = f"{emoticon}\t{shuangpin_str}\t1\n"
-                        
-                    output_result_shuangpin.append(output_line)
-                else:
-                    # 对于单字母或中文缩写等，直接使用原始文本作为双拼结果
-                    output_line = f"{emoticon}\t{quanpin_text}\t1\n"
-                    output_result_shuangpin.append(output_line)
+        segmented.append(entry._replace(emoticon=entry.emoticon.strip(), syllables=tuple(segments), extra=extra))
+        
+    return segmented, bad_lines
+
+
+def render_shuangpin_entries(segmented: List[DictEntry],
+                             scheme: Scheme,
+                             include_details: bool = False,
+                             use_special_space: bool = True) -> List[DictEntry]:
+    """
+    将切分结果按指定双拼方案转换为双拼词条
+    
+    Args:
+        segmented: segment_pinyin_dictionary返回的切分结果
+        scheme: 双拼方案
+        include_details: 是否包含详细信息(全拼和汉字)
+        use_special_space: 是否使用特殊空格(U+2002)连接各部分双拼
+        
+    Returns:
+        双拼词条列表
+    """
+    # 处理任何类型的空格，包括普通空格和特殊空格
+    space_char = '\u2002' if use_special_space else ' '
+    output_entries = []
+    
+    for entry in segmented:
+        quanpin_text = entry.code
+        # 对于无效的拼音部分(单字母或中文缩写等)，保留原始文本
+        codes = [
+            ''.join(item[0] for item in shuangpin_by_syllabl(syllablelist, scheme, style=NORMAL))
+            if syllablelist is not None else part
+            for part, syllablelist in entry.syllables
+        ]
+        
+        if ' ' in quanpin_text or '\u2002' in quanpin_text:
+            # 用适当的空格类型重新连接各部分双拼结果
+            code = space_char.join(codes)
+            extra = (quanpin_text,) if include_details else ()
         else:
-            # 不符合格式的行添加到bad结果
-            output_result_shuangpin_bad.append(line)
+            code = codes[0]
+            # 识别出汉字时附加全拼和汉字
+            extra = (quanpin_text,) + entry.extra if include_details and entry.extra else ()
+            
+        output_entries.append(DictEntry(entry.emoticon, code, 1, entry.source, extra=extra))
+            
+    return output_entries
+
+
+def prepare_shuangpin_segments(pinyin_dict_file: str,
+                               include_details: bool = False,
+                               use_dedup: bool = True,
+                               cache: BuildCache = None,
+                               pinyin_entries: Iterable[DictEntry] = None,
+                               memory_budget_mb: float = None,
+                               executor: Executor = None) -> Tuple[List[DictEntry], List[str]]:
+    """
+    切分拼音词库，结果供所有双拼方案共用
     
-    # 如果启用去重，对结果进行去重排序
+    Args:
+        pinyin_dict_file: 拼音词库文件路径
+        include_details: 是否需要详细信息
+        use_dedup: 是否对格式不符的行去重排序
+        cache: 可选的构建缓存
+        pinyin_entries: 拼音词库词条，提供时直接使用而不读取pinyin_dict_file
+        memory_budget_mb: 去重排序的内存预算(MB)
+        executor: 可选的进程池，拼音词条按范围分块并行切分，结果按原顺序合并
+        
+    Returns:
+        (切分结果列表, 格式不符行列表)
+    """
+    if executor is None:
+        segmented, bad_lines = segment_pinyin_dictionary(pinyin_dict_file, include_details, cache, pinyin_entries)
+    else:
+        bad_lines = []
+        if pinyin_entries is None:
+            pinyin_entries, bad_lines = read_pinyin_dictionary(pinyin_dict_file)
+        cache_path = cache.path if cache is not None else None
+        tasks = [(chunk, include_details, cache_path) for chunk in split_chunks(list(pinyin_entries))]
+        segmented = [entry for chunk in run_ordered(executor, _segment_chunk, tasks, cache) for entry in chunk]
     if use_dedup:
-        output_result_shuangpin = dedup_and_sort(output_result_shuangpin)
-        output_result_shuangpin_bad = dedup_and_sort(output_result_shuangpin_bad)
-    
-    # 确保输出目录存在
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        bad_lines = dedup_and_sort(bad_lines, get_line_sort_key, memory_budget_mb)
+    return segmented, bad_lines
+
+
+def save_shuangpin_results(scheme: Scheme,
+                           output_file: str,
+                           output_result_shuangpin: List[DictEntry],
+                           output_result_shuangpin_bad: List[str],
+                           save_txt: bool = True):
+    """
+    保存一个双拼方案的中间文本文件和格式不符的条目
     
-    # 保存结果
-    with open(output_file, 'w', encoding='utf-8') as output_file_obj:
-        output_file_obj.writelines(output_result_shuangpin)
+    Args:
+        scheme: 双拼方案
+        output_file: 中间文本文件路径
+        output_result_shuangpin: 双拼词条
+        output_result_shuangpin_bad: 格式不符的行
+        save_txt: 是否保存中间文本文件，格式不符的条目总是单独保存
+    """
+    if save_txt:
+        write_lines(output_result_shuangpin, output_file)
         
     # 保存格式不符的结果
     if output_result_shuangpin_bad:
         bad_output_file = output_file.replace('.txt', '_format_error.txt')
-        with open(bad_output_file, 'w', encoding='utf-8') as output_file_obj:
-            output_file_obj.writelines(output_result_shuangpin_bad)
+        with open(bad_output_file, 'w', encoding='utf-8') as bad_output_file_obj:
+            bad_output_file_obj.writelines(output_result_shuangpin_bad)
         print(f"格式可能错误条目已保存到: {bad_output_file}")
         
-    print(f"双拼版词库已生成，共 {len(output_result_shuangpin)} 个有效条目，{len(output_result_shuangpin_bad)} 个格式可能错误条目")
-    return output_result_shuangpin, output_result_shuangpin_bad
+    print(f"双拼版词库({scheme.name})已生成，共 {len(output_result_shuangpin)} 个有效条目，{len(output_result_shuangpin_bad)} 个格式可能错误条目")
 
 
-def generate_rime_dict_file(input_file: str, output_file: str, dict_name: str, dict_type: str):
+def _render_scheme(segmented: List[DictEntry],
+                   scheme: Scheme,
+                   include_details: bool,
+                   use_special_space: bool,
+                   use_dedup: bool,
+                   memory_budget_mb: Optional[float]) -> Tuple[List[DictEntry], None]:
+    """生成一个双拼方案的词条并去重排序，可在工作进程中执行"""
+    output_result_shuangpin = render_shuangpin_entries(segmented, scheme, include_details, use_special_space)
+    
+    # 如果启用去重，对结果进行去重排序
+    if use_dedup:
+        output_result_shuangpin = dedup_and_sort(output_result_shuangpin, memory_budget_mb=memory_budget_mb)
+    return output_result_shuangpin, None
+
+
+def generate_shuangpin_dictionaries(pinyin_dict_file: str,
+                                    scheme_outputs: Dict[str, Tuple[Scheme, str]],
+                                    include_details: bool = False,
+                                    use_dedup: bool = True,
+                                    use_special_space: bool = True,
+                                    cache: BuildCache = None,
+                                    pinyin_entries: Iterable[DictEntry] = None,
+                                    save_txt: bool = True,
+                                    memory_budget_mb: float = None,
+                                    executor: Executor = None) -> Dict[str, Tuple[List[DictEntry], List[str]]]:
     """
-    生成Rime词库文件(.dict.yaml)
+    一次读取和切分拼音词库，同时生成多个双拼方案的词库
     
     Args:
-        input_file: 输入文件路径
-        output_file: 输出文件路径
-        dict_name: 词库名称
-        dict_type: 词库类型
+        pinyin_dict_file: 拼音词库文件路径
+        scheme_outputs: 方案名称到 (双拼方案, 输出文件路径) 的映射
+        include_details: 是否包含详细信息(全拼和汉字)
+        use_dedup: 是否进行去重排序
+        use_special_space: 是否使用特殊空格(U+2002)
+        cache: 可选的构建缓存
+        pinyin_entries: 拼音词库词条，提供时直接使用而不读取pinyin_dict_file
+        save_txt: 是否保存双拼中间文本文件，格式不符的条目总是单独保存
+        memory_budget_mb: 去重排序的内存预算(MB)，指定时使用外部排序
+        executor: 可选的进程池，拼音词条按范围分块并行切分，各方案并行转换，结果按原顺序合并
+        
+    Returns:
+        方案名称到处理结果元组 (成功列表, 失败列表) 的映射
     """
-    if not os.path.exists(input_file):
-        print(f"错误: 输入文件 {input_file} 不存在")
-        return
+    if pinyin_entries is None and not os.path.exists(pinyin_dict_file):
+        print(f"错误: 拼音词库文件 {pinyin_dict_file} 不存在")
+        return {scheme_name: ([], []) for scheme_name in scheme_outputs}
         
-    # 读取词条
-    with open(input_file, 'r', encoding='utf-8') as file:
-        content = file.read()
+    scheme_labels = ', '.join(scheme.name for scheme, _ in scheme_outputs.values())
+    print(f"正在生成双拼版词库 (方案: {scheme_labels})...")
+    
+    # 切分只做一次，所有方案共用
+    segmented, output_result_shuangpin_bad = prepare_shuangpin_segments(
+        pinyin_dict_file, include_details, use_dedup, cache, pinyin_entries, memory_budget_mb, executor
+    )
         
-    # 统计词条数量
-    entry_count = content.count('\n')
+    # 各方案互相独立，有进程池时并行转换
+    rendered = run_ordered(executor, _render_scheme, [
+        (segmented, scheme, include_details, use_special_space, use_dedup, memory_budget_mb)
+        for scheme, _ in scheme_outputs.values()
+    ])
     
-    # 获取当前日期，格式为YYYY-MM-DD
-    current_date = datetime.datetime.now().strftime("%Y-%m-%d")
+    results = {}
+    for (scheme_name, (scheme, output_file)), output_result_shuangpin in zip(scheme_outputs.items(), rendered):
+        save_shuangpin_results(scheme, output_file, output_result_shuangpin, output_result_shuangpin_bad, save_txt)
+        results[scheme_name] = (output_result_shuangpin, output_result_shuangpin_bad)
+        
+    return results
+
+
+def generate_shuangpin_dictionary(pinyin_dict_file: str, 
+                                 output_file: str,
+                                 scheme: Scheme,
+                                 include_details: bool = False,
+                                 use_dedup: bool = True,
+                                 use_special_space: bool = True) -> Tuple[List[DictEntry], List[str]]:
+    """
+    生成双拼版词库
     
-    # 生成词库头部
-    header = f"""# Rime dictionary
+    Args:
+        pinyin_dict_file: 拼音词库文件路径
+        output_file: 输出文件路径
+        scheme: 双拼方案
+        include_details: 是否包含详细信息(全拼和汉字)
+        use_dedup: 是否进行去重排序
+        use_special_space: 是否使用特殊空格(U+2002)
+        
+    Returns:
+        处理结果元组 (成功列表, 失败列表)
+    """
+    results = generate_shuangpin_dictionaries(
+        pinyin_dict_file, {scheme.name: (scheme, output_file)},
+        include_details=include_details,
+        use_dedup=use_dedup,
+        use_special_space=use_special_space
+    )
+    return results[scheme.name]
+
+
+def get_build_date() -> str:
+    """
+    获取写入词库version的日期，格式为YYYY-MM-DD
+    
+    设置了环境变量SOURCE_DATE_EPOCH(可复现构建的通用约定)时使用其指定的时间，
+    以便在不同日期生成完全相同的词库文件；否则使用当前日期。
+    
+    Returns:
+        日期字符串
+    """
+    source_date_epoch = os.environ.get('SOURCE_DATE_EPOCH')
+    if source_date_epoch:
+        return datetime.datetime.fromtimestamp(int(source_date_epoch), datetime.timezone.utc).strftime("%Y-%m-%d")
+    return datetime.datetime.now().strftime("%Y-%m-%d")
+
+
+def build_rime_dict_header(dict_name: str, dict_type: str, entry_count, version: str = None,
+                           import_tables: List[str] = None) -> str:
+    """
+    生成Rime词库文件头部
+    
+    Args:
+        dict_name: 词库名称
+        dict_type: 词库类型
+        entry_count: 词条数量
+        version: 词库version，为None时使用构建日期
+        import_tables: 导入的子词库名称，为None时不写入import_tables
+        
+    Returns:
+        词库头部文本
+    """
+    current_date = version if version is not None else get_build_date()
+    imports = ''
+    if import_tables is not None:
+        imports = 'import_tables:\n' + ''.join(f'  - {table}\n' for table in import_tables)
+    
+    return f"""# Rime dictionary
 # encoding: utf-8
 #
 # Kaomoji dictionary for Rime input method engine
@@ -439,126 +922,725 @@ sort: by_weight
 use_preset_vocabulary: false
 max_phrase_length: 99
 min_phrase_weight: 1
-...
+{imports}...
 
 # {dict_type} entries: {entry_count}
 """
+
+
+# 内容哈希version的长度(十六进制字符数)
+_CONTENT_VERSION_LENGTH = 12
+
+# 已有词库文件的version行和头部结束行(词条数量注释)
+_VERSION_PATTERN = re.compile(rb'^version: "(.*)"$', re.MULTILINE)
+_HEADER_END_PATTERN = re.compile(rb'^\.\.\.\n\n# .* entries: *\d+ *\n', re.MULTILINE)
+
+
+def read_rime_dict_version(dict_file: str) -> Optional[Tuple[str, str]]:
+    """
+    读取已有Rime词库文件的version和词条部分的SHA-256
     
-    # 确保输出目录存在
+    Args:
+        dict_file: 词库文件路径
+        
+    Returns:
+        (version, 词条部分的十六进制摘要)，文件不存在或无法识别头部时返回None
+    """
+    if not os.path.exists(dict_file):
+        return None
+    with open(dict_file, 'rb') as file:
+        content = file.read()
+    version_match = _VERSION_PATTERN.search(content)
+    header_end = _HEADER_END_PATTERN.search(content)
+    if version_match is None or header_end is None:
+        return None
+    return version_match.group(1).decode('utf-8'), hashlib.sha256(content[header_end.end():]).hexdigest()
+
+
+def resolve_dict_version(dict_file: str, body_digest: str, version_mode: str) -> str:
+    """
+    根据version取值方式确定词库的version
+    
+    Args:
+        dict_file: 词库文件路径，keep方式下读取其中已有的version
+        body_digest: 本次词条部分的十六进制摘要
+        version_mode: version取值方式(见VERSION_MODES)
+        
+    Returns:
+        词库version
+    """
+    if version_mode == 'hash':
+        return body_digest[:_CONTENT_VERSION_LENGTH]
+    if version_mode == 'keep':
+        previous = read_rime_dict_version(dict_file)
+        if previous is not None and previous[1] == body_digest:
+            return previous[0]
+    return get_build_date()
+
+
+def _write_versioned_rime_dict(entries: Iterable[DictEntry], output_file: str, dict_name: str, dict_type: str,
+                               version_mode: str) -> Tuple[int, str, bool]:
+    """
+    写入version由词条内容决定的Rime词库文件
+    
+    词条先写入临时文件并计算摘要，确定version后再拼接头部；
+    生成的文件与已有文件完全相同时不改写，保留其修改时间。
+    
+    Returns:
+        (词条数量, 词条部分的十六进制摘要, 是否改写了文件)
+    """
+    body_file = f'{output_file}.body.tmp'
+    digest = hashlib.sha256()
+    entry_count = 0
+    try:
+        with open(body_file, 'wb') as body_file_obj:
+            for entry in entries:
+                line = entry.to_line().encode('utf-8')
+                digest.update(line)
+                body_file_obj.write(line)
+                entry_count += 1
+        body_digest = digest.hexdigest()
+        version = resolve_dict_version(output_file, body_digest, version_mode)
+        header = build_rime_dict_header(dict_name, dict_type, entry_count, version).encode('utf-8')
+        
+        if os.path.exists(output_file) and os.path.getsize(output_file) == len(header) + os.path.getsize(body_file):
+            with open(output_file, 'rb') as file:
+                unchanged = file.read(len(header)) == header and read_rime_dict_version(output_file)[1] == body_digest
+            if unchanged:
+                print(f"Rime词库文件内容未变化，保留: {output_file}")
+                return entry_count, body_digest, False
+                
+        with open(body_file, 'rb') as body_file_obj, open(output_file, 'wb') as output_file_obj:
+            output_file_obj.write(header)
+            shutil.copyfileobj(body_file_obj, output_file_obj)
+    finally:
+        if os.path.exists(body_file):
+            os.remove(body_file)
+            
+    print(f"已生成Rime词库文件: {output_file} (version: {version})")
+    return entry_count, body_digest, True
+
+
+def get_split_shard(entry: DictEntry, split_by: str) -> str:
+    """
+    获取词条所属的子词库
+    
+    Args:
+        entry: 词条
+        split_by: 拆分方式，source为按数据源，initial为按编码首字母
+        
+    Returns:
+        子词库名称后缀，如lmeee、k；无法归类的词条为other
+    """
+    if split_by == 'source':
+        source_format = SOURCE_FILES.get(os.path.basename(entry.source))
+        return source_format.lower() if source_format else 'other'
+    initial = entry.code[:1].lower()
+    return initial if 'a' <= initial <= 'z' else 'other'
+
+
+def list_split_dict_files(output_file: str, dict_name: str) -> List[str]:
+    """
+    列出输出目录中属于某个词库的子词库文件
+    
+    Args:
+        output_file: 主词库文件路径
+        dict_name: 主词库名称
+        
+    Returns:
+        排序后的子词库文件路径列表
+    """
+    return sorted(glob.glob(os.path.join(glob.escape(os.path.dirname(output_file)), f'{dict_name}.*.dict.yaml')))
+
+
+def write_split_rime_dict(entries: Iterable[DictEntry], output_file: str, dict_name: str, dict_type: str,
+                          split_by: str, version_mode: str = 'date') -> int:
+    """
+    将词条拆分写入多个子词库，并写出通过import_tables导入它们的主词库
+    
+    子词库命名为<词库名称>.<分组>，version由词条内容决定(keep方式时沿用已有version)，
+    内容未变化的子词库逐字节相同且不会被改写；主词库只包含头部，version按version_mode确定。
+    上一次构建遗留的、本次不再生成的子词库会被删除。
+    
+    Args:
+        entries: 词条
+        output_file: 主词库文件路径
+        dict_name: 主词库名称
+        dict_type: 词库类型
+        split_by: 拆分方式(见SPLIT_MODES)
+        version_mode: 主词库version的取值方式
+        
+    Returns:
+        写入的词条总数
+    """
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
     
-    # 写入词库文件
+    # 保持各分组内词条的原有顺序
+    shards: Dict[str, List[DictEntry]] = {}
+    for entry in entries:
+        shards.setdefault(get_split_shard(entry, split_by), []).append(entry)
+        
+    sub_version_mode = 'keep' if version_mode == 'keep' else 'hash'
+    tables = []
+    table_digests = []
+    any_changed = False
+    for shard in sorted(shards):
+        table = f'{dict_name}.{shard}'
+        _, body_digest, changed = _write_versioned_rime_dict(
+            shards[shard], os.path.join(os.path.dirname(output_file), f'{table}.dict.yaml'),
+            table, f'{dict_type} [{shard}]', sub_version_mode
+        )
+        tables.append(table)
+        table_digests.append(f'{table}:{body_digest}')
+        any_changed = any_changed or changed
+        
+    written = {os.path.join(os.path.dirname(output_file), f'{table}.dict.yaml') for table in tables}
+    for path in list_split_dict_files(output_file, dict_name):
+        if path not in written:
+            os.remove(path)
+            any_changed = True
+            print(f"已删除不再使用的子词库: {path}")
+            
+    entry_count = sum(len(shard_entries) for shard_entries in shards.values())
+    if version_mode == 'hash':
+        version = content_digest(table_digests)[:_CONTENT_VERSION_LENGTH]
+    elif version_mode == 'keep':
+        # 子词库和导入列表都未变化时沿用主词库已有的version
+        previous = read_rime_dict_version(output_file)
+        version = get_build_date()
+        if previous is not None and not any_changed:
+            with open(output_file, 'r', encoding='utf-8') as file:
+                if file.read() == build_rime_dict_header(dict_name, dict_type, entry_count, previous[0], tables):
+                    version = previous[0]
+    else:
+        version = get_build_date()
+        
+    header = build_rime_dict_header(dict_name, dict_type, entry_count, version, tables)
+    if os.path.exists(output_file):
+        with open(output_file, 'r', encoding='utf-8') as file:
+            if file.read() == header:
+                print(f"Rime词库文件内容未变化，保留: {output_file}")
+                return entry_count
     with open(output_file, 'w', encoding='utf-8') as output_file_obj:
-        output_file_obj.write(header + content)
+        output_file_obj.write(header)
+    print(f"已生成Rime词库文件: {output_file} (导入 {len(tables)} 个子词库)")
+    return entry_count
+
+
+def write_rime_dict(entries: Iterable[DictEntry], output_file: str, dict_name: str, dict_type: str,
+                    version_mode: str = 'date') -> int:
+    """
+    将词条直接写入Rime词库文件(.dict.yaml)，不经过中间文本文件
+    
+    entries为列表等已知长度的序列时直接写入词条数量；
+    为生成器时先将词条写入临时文件并统计数量，再拼接头部和词条。
+    version_mode为hash或keep时version由词条内容决定，词条未变化时文件保持不变，
+    Rime客户端同步后无需重新部署。
+    
+    Args:
+        entries: 词条
+        output_file: 输出文件路径
+        dict_name: 词库名称
+        dict_type: 词库类型
+        version_mode: version取值方式，date为构建日期，hash为词条内容哈希，keep为词条未变化时保留原version
+        
+    Returns:
+        写入的词条数量
+    """
+    # 确保输出目录存在
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    
+    if version_mode != 'date':
+        return _write_versioned_rime_dict(entries, output_file, dict_name, dict_type, version_mode)[0]
         
+    if hasattr(entries, '__len__'):
+        header = build_rime_dict_header(dict_name, dict_type, len(entries))
+        with open(output_file, 'w', encoding='utf-8') as output_file_obj:
+            output_file_obj.write(header)
+            output_file_obj.writelines(entry.to_line() for entry in entries)
+        entry_count = len(entries)
+    else:
+        body_file = f'{output_file}.body.tmp'
+        entry_count = 0
+        try:
+            with open(body_file, 'wb') as body_file_obj:
+                for entry in entries:
+                    body_file_obj.write(entry.to_line().encode('utf-8'))
+                    entry_count += 1
+            header = build_rime_dict_header(dict_name, dict_type, entry_count).encode('utf-8')
+            with open(body_file, 'rb') as body_file_obj, open(output_file, 'wb') as output_file_obj:
+                output_file_obj.write(header)
+                shutil.copyfileobj(body_file_obj, output_file_obj)
+        finally:
+            if os.path.exists(body_file):
+                os.remove(body_file)
+                
     print(f"已生成Rime词库文件: {output_file}")
+    return entry_count
 
 
-def main():
-    """主函数"""
-    args = parse_arguments()
+def write_rime_target(entries: Iterable[DictEntry], output_file: str, dict_name: str, dict_type: str,
+                      version_mode: str = 'date', split_by: str = None, **options) -> int:
+    """
+    Rime写出器的写出函数，按split_by决定写出单个词库还是拆分的子词库
     
-    # 如果没有指定任何操作，默认生成所有类型词库
-    if not (args.all or args.pinyin or args.kmj or args.shuangpin):
-        args.all = True
+    Args:
+        entries: 词条
+        output_file: 输出文件路径
+        dict_name: 词库名称
+        dict_type: 词库类型
+        version_mode: version取值方式
+        split_by: 拆分方式，为None时不拆分
         
-    # 初始化颜文字处理器
-    processor = KaomojiProcessor()
-    
-    # 输入文件列表
-    input_files = [
-        'data/A_kaomoji_dict_data.txt',
-        'data/custom_phrase_dict_data.txt',
-        'data/lmeee_dict_data.txt',
-        'data/sougou_dict_data.txt',
-        'data/Temreg_dict_data.txt'
-    ]
+    Returns:
+        写入的词条数量
+    """
+    if split_by is not None:
+        return write_split_rime_dict(entries, output_file, dict_name, dict_type, split_by, version_mode)
+    return write_rime_dict(entries, output_file, dict_name, dict_type, version_mode)
+
+
+register_dict_writer(DictWriter('rime', '.dict.yaml', write_rime_target))
+
+
+def generate_rime_dict_file(input_file: str, output_file: str, dict_name: str, dict_type: str):
+    """
+    生成Rime词库文件(.dict.yaml)
     
+    Args:
+        input_file: 输入文件路径
+        output_file: 输出文件路径
+        dict_name: 词库名称
+        dict_type: 词库类型
+    """
+    if not os.path.exists(input_file):
+        print(f"错误: 输入文件 {input_file} 不存在")
+        return
+        
+    # 逐行统计词条数量，不把整个文件读入内存
+    with open(input_file, 'r', encoding='utf-8') as file:
+        entry_count = sum(line.endswith('\n') for line in file)
+        
     # 确保输出目录存在
-    os.makedirs(args.output_dir, exist_ok=True)
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
     
-    # 使用特殊空格
-    use_special_space = not args.no_special_space
+    # 写入词库文件
+    with open(input_file, 'r', encoding='utf-8') as file, \
+            open(output_file, 'w', encoding='utf-8') as output_file_obj:
+        output_file_obj.write(build_rime_dict_header(dict_name, dict_type, entry_count))
+        shutil.copyfileobj(file, output_file_obj)
+        
+    print(f"已生成Rime词库文件: {output_file}")
+
+
+# 数据源文件名及其数据源格式，格式名称对应kaomoji_processor.SOURCE_ADAPTERS中注册的适配器
+SOURCE_FILES = {
+    'A_kaomoji_dict_data.txt': 'A_kaomoji',
+    'custom_phrase_dict_data.txt': 'custom_phrase',
+    'lmeee_dict_data.txt': 'lmeee',
+    'sougou_dict_data.txt': 'sougou',
+    'Temreg_dict_data.txt': 'Temreg'
+}
+
+
+def get_input_sources(data_dir: str = 'data') -> Dict[str, str]:
+    """
+    获取输入文件路径及其数据源格式
+    
+    Args:
+        data_dir: 数据源目录
+        
+    Returns:
+        输入文件路径到数据源格式名称的有序映射
+    """
+    return {os.path.join(data_dir, filename): source_format for filename, source_format in SOURCE_FILES.items()}
+
+
+def build_stages(args,
+                 processor: KaomojiProcessor,
+                 cache: Optional[BuildCache],
+                 manifest: BuildManifest,
+                 executor: Optional[Executor] = None,
+                 metrics: BuildMetrics = None) -> StageScheduler:
+    """
+    根据命令行参数构建生成阶段的依赖图
+    
+    阶段包括：parse:<格式>(解析数据源)、pinyin/kmj(生成词库词条和中间文件)、
+    segment(切分拼音音节)、shuangpin:<方案>(转换双拼)以及对应的yaml:<词库>(写出Rime词库)。
+    输入未变化的词库阶段根据构建清单跳过。
     
-    # 是否使用去重
+    Args:
+        args: 命令行参数
+        processor: 颜文字处理器
+        cache: 可选的构建缓存
+        manifest: 构建清单
+        executor: 可选的进程池
+        metrics: 可选的构建指标，记录各阶段和各数据源的指标
+        
+    Returns:
+        阶段调度器
+    """
+    scheduler = StageScheduler(metrics)
+    input_sources = get_input_sources(args.data_dir)
+    input_files = list(input_sources)
+    use_special_space = not args.no_special_space
+    save_txt = not args.no_intermediate
     use_dedup = not args.no_dedup
+    memory_budget_mb = args.dedup_memory_mb
+    version_mode = args.version_mode
+    kmj_max_candidates = args.kmj_max_candidates
+    split_by = args.split_dicts
+    writers = [DICT_WRITERS[name] for name in args.formats]
     
-    # 临时文件路径
+    # 生成双拼版词库(--all选项生成所有方案，--shuangpin选项生成指定方案)
+    if args.all:
+        shuangpin_schemes = get_all_schemes()
+    elif args.shuangpin:
+        shuangpin_schemes = {args.scheme: select_scheme(args.scheme)}
+    else:
+        shuangpin_schemes = {}
+        
+    need_pinyin = args.all or args.pinyin or bool(shuangpin_schemes)
+    need_kmj = args.all or args.kmj
+    
+    # 中间文件和词库文件路径
     pinyin_txt_file = os.path.join(args.output_dir, 'all_output_result_pinyin.txt')
     kmj_txt_file = os.path.join(args.output_dir, 'all_output_result_kmj.txt')
     
-    # 生成拼音版词库(--all或--pinyin或--shuangpin选项)
-    if args.all or args.pinyin or args.shuangpin:
-        pinyin_results = generate_pinyin_dictionary(
-            processor, input_files, pinyin_txt_file, 
-            use_special_space=use_special_space,
-            use_dedup=use_dedup
-        )
-        generate_rime_dict_file(
-            pinyin_txt_file, 
-            os.path.join(args.output_dir, 'kaomoji_pinyin.dict.yaml'), 
-            'kaomoji_pinyin', 
-            'Pinyin'
+    # 每个数据源只读取和解析一次，拼音词库和kmj词库共用解析结果
+    parse_stages = {}
+    for input_filename, source_format in input_sources.items():
+        parse_stages[input_filename] = f'parse:{source_format}'
+        scheduler.add_stage(
+            parse_stages[input_filename],
+            lambda results, input_filename=input_filename: parse_input_files(
+                processor, [input_filename],
+                use_special_space=use_special_space,
+                source_formats=input_sources,
+                manifest=manifest,
+                executor=executor,
+                metrics=metrics
+            ).get(input_filename)
         )
-        
-    # 生成kmj版词库(--all或--kmj选项)
-    if args.all or args.kmj:
-        kmj_results = generate_kmj_dictionary(
-            processor, input_files, kmj_txt_file, 
-            use_special_space=use_special_space,
-            use_dedup=use_dedup
-        )
-        generate_rime_dict_file(
-            kmj_txt_file, 
-            os.path.join(args.output_dir, 'kaomoji_kmj.dict.yaml'), 
-            'kaomoji_kmj', 
-            'KMJ'
-        )
-        
-    # 生成双拼版词库(--all选项生成所有方案，--shuangpin选项生成指定方案)
-    if args.all:
-        # 生成所有双拼方案的词库
-        all_schemes = get_all_schemes()
-        for scheme_name, scheme in all_schemes.items():
-            shuangpin_txt_file = os.path.join(args.output_dir, f'all_output_result_shuangpin_{scheme_name}.txt')
-            shuangpin_dict_file = os.path.join(args.output_dir, f'kaomoji_shuangpin_{scheme_name}.dict.yaml')
+    parse_deps = list(parse_stages.values())
+    
+    def parsed_sources(results) -> Dict[str, List[Tuple[str, Optional[str], Optional[str]]]]:
+        # 不存在的数据源解析结果为None
+        return {input_filename: results[stage] for input_filename, stage in parse_stages.items()
+                if results[stage] is not None}
+    
+    def record(stage: str, **fields):
+        if metrics is not None:
+            metrics.record_stage(stage, **fields)
             
-            # 确保拼音词库已生成
-            if not os.path.exists(pinyin_txt_file):
-                print(f"错误: 拼音词库文件 {pinyin_txt_file} 不存在，无法生成双拼词库")
+    def output_files(kind: str, txt_file: str, dict_name: str) -> List[str]:
+        # 所有输出格式的文件都是输出的一部分，拆分词库时还包括子词库，缺少任何一个都需要重新生成
+        files = [txt_file] if save_txt else []
+        for writer in writers:
+            if writer.supports(kind):
+                files.append(writer.output_path(args.output_dir, dict_name))
+                if writer.name == 'rime' and split_by is not None:
+                    files.extend(list_split_dict_files(writer.output_path(args.output_dir, dict_name), dict_name))
+        return files
+    
+    def add_writer_stages(kind: str, build_stage: str, dict_name: str, dict_type: str, txt_file: str,
+                          output_name: str, digest_func: Callable[[Dict[str, Any]], str],
+                          is_fresh: Callable[[Dict[str, Any]], bool]):
+        # 每种输出格式一个阶段，依赖的阶段完成后各格式可以并发写出
+        for writer in writers:
+            if not writer.supports(kind):
                 continue
+            stage_name = f'yaml:{build_stage}' if writer.name == 'rime' else f'{writer.name}:{build_stage}'
+            
+            def write_output(results, writer=writer, stage_name=stage_name):
+                entries = results['segment'][0] if writer.needs_segments else results[build_stage]
+                entry_count = writer.write(entries, writer.output_path(args.output_dir, dict_name), dict_name, dict_type,
+                                           version_mode=version_mode, split_by=split_by)
+                record(stage_name, entries_out=entry_count)
+                manifest.record_output(output_name, digest_func(results), output_files(kind, txt_file, dict_name))
                 
-            shuangpin_results, shuangpin_bad_results = generate_shuangpin_dictionary(
-                pinyin_txt_file, shuangpin_txt_file, scheme, 
-                include_details=False,
-                use_dedup=use_dedup,
-                use_special_space=use_special_space
+            deps = [build_stage, 'segment'] if writer.needs_segments else [build_stage]
+            scheduler.add_stage(stage_name, write_output, deps, is_fresh)
+    
+    # 内容摘要在判断是否跳过和记录清单时共用，只计算一次
+    digests = {}
+    
+    def pinyin_digest(results) -> str:
+        # 拼音由编码和描述决定，直接对解析结果计算摘要，判断是否跳过时不必转换拼音
+        if 'pinyin' not in digests:
+            digests['pinyin'] = content_digest(
+                f'{emoticon}\t{code or ""}\t{description or ""}'
+                for input_filename, entries in parsed_sources(results).items() if 'A_kaomoji' not in input_filename
+                for emoticon, code, description in entries if processor.has_pinyin(code, description)
             )
-            generate_rime_dict_file(
-                shuangpin_txt_file, 
-                shuangpin_dict_file, 
-                f'kaomoji_shuangpin_{scheme_name}', 
-                f'Shuangpin ({scheme_name})'
+        return digests['pinyin']
+    
+    def kmj_digest(results) -> str:
+        if 'kmj' not in digests:
+            # 分散到子编码时编码取决于描述拼音，编码和描述也计入摘要
+            digests['kmj'] = content_digest(
+                entry.to_line() + (f'\t{code or ""}\t{description or ""}' if kmj_max_candidates is not None else '')
+                for entries in parsed_sources(results).values()
+                for entry, (_, code, description) in zip(processor.build_kmj_entries(entries), entries)
             )
-    elif args.shuangpin:
-        # 只生成指定方案的双拼词库
-        scheme = select_scheme(args.scheme)
-        shuangpin_txt_file = os.path.join(args.output_dir, f'all_output_result_shuangpin_{args.scheme}.txt')
-        shuangpin_dict_file = os.path.join(args.output_dir, f'kaomoji_shuangpin_{args.scheme}.dict.yaml')
-        
-        shuangpin_results, shuangpin_bad_results = generate_shuangpin_dictionary(
-            pinyin_txt_file, shuangpin_txt_file, scheme, 
+        return digests['kmj']
+    
+    def build_pinyin(results, save: bool = save_txt) -> List[DictEntry]:
+        sources = parsed_sources(results)
+        pinyin_entries = generate_pinyin_dictionary(
+            processor, input_files, pinyin_txt_file,
+            use_special_space=use_special_space,
+            use_dedup=use_dedup,
+            parsed_sources=sources,
+            save_txt=save,
+            memory_budget_mb=memory_budget_mb
+        )
+        if save is save_txt:
+            record('pinyin', entries_out=len(pinyin_entries), entries_in=sum(
+                1 for input_filename, entries in sources.items() if 'A_kaomoji' not in input_filename
+                for _, code, description in entries if processor.has_pinyin(code, description)
+            ))
+        return pinyin_entries
+    
+    def build_kmj(results) -> List[DictEntry]:
+        sources = parsed_sources(results)
+        kmj_entries = generate_kmj_dictionary(
+            processor, input_files, kmj_txt_file,
+            use_special_space=use_special_space,
+            use_dedup=use_dedup,
+            parsed_sources=sources,
+            save_txt=save_txt,
+            memory_budget_mb=memory_budget_mb,
+            max_candidates=kmj_max_candidates
+        )
+        record('kmj', entries_out=len(kmj_entries), entries_in=sum(len(entries) for entries in sources.values()))
+        if kmj_max_candidates is not None:
+            record('kmj', candidate_histogram=candidate_histogram(kmj_entries))
+        return kmj_entries
+    
+    pinyin_is_fresh = lambda results: manifest.is_fresh('pinyin', pinyin_digest(results))
+    kmj_is_fresh = lambda results: manifest.is_fresh('kmj', kmj_digest(results))
+    
+    # 双拼词库由拼音词库转换而来，拼音词库内容未变化的方案无需重新生成
+    def scheme_is_fresh(scheme_name: str):
+        return lambda results: manifest.is_fresh(
+            f'shuangpin_{scheme_name}', content_digest([pinyin_digest(results), scheme_name])
+        )
+    
+    # 拼音词库的部分输出格式(如fcitx5)需要音节切分结果，与双拼词库共用切分阶段
+    pinyin_needs_segments = need_pinyin and any(writer.needs_segments and writer.supports('pinyin')
+                                                for writer in writers)
+    
+
+    def segment(results) -> Tuple[List[DictEntry], List[str]]:
+        pinyin_entries = results['pinyin']
+        # 拼音词库本次已跳过且没有中间文件时，从解析结果重新得到拼音词条；
+        # 按数据源拆分词库时需要词条来源，中间文件中没有来源，同样从解析结果重新得到
+        if pinyin_entries is None and (split_by == 'source' or not (save_txt and os.path.exists(pinyin_txt_file))):
+            pinyin_entries = build_pinyin(results, save=False)
+        segmented, bad_lines = prepare_shuangpin_segments(
+            pinyin_txt_file,
             include_details=False,
             use_dedup=use_dedup,
-            use_special_space=use_special_space
+            cache=cache,
+            pinyin_entries=pinyin_entries,
+            memory_budget_mb=memory_budget_mb,
+            executor=executor
         )
-        generate_rime_dict_file(
-            shuangpin_txt_file, 
-            shuangpin_dict_file, 
-            f'kaomoji_shuangpin_{args.scheme}', 
-            f'Shuangpin ({args.scheme})'
+        record('segment', entries_out=len(segmented), rejected=len(bad_lines))
+        return segmented, bad_lines
+    
+    # 生成拼音版词库(--all或--pinyin或--shuangpin选项)
+    if need_pinyin:
+        scheduler.add_stage('pinyin', build_pinyin, parse_deps, pinyin_is_fresh)
+        
+    # 所有方案和需要切分结果的拼音词库输出都已是最新时才跳过切分
+    if shuangpin_schemes or pinyin_needs_segments:
+        scheduler.add_stage(
+            'segment', segment, ['pinyin'],
+            lambda results: (all(scheme_is_fresh(scheme_name)(results) for scheme_name in shuangpin_schemes)
+                             and not (pinyin_needs_segments and not pinyin_is_fresh(results)))
         )
+        
+    if need_pinyin:
+        add_writer_stages('pinyin', 'pinyin', 'kaomoji_pinyin', 'Pinyin', pinyin_txt_file,
+                          'pinyin', pinyin_digest, pinyin_is_fresh)
+        
+    # 生成kmj版词库(--all或--kmj选项)
+    if need_kmj:
+        scheduler.add_stage('kmj', build_kmj, parse_deps, kmj_is_fresh)
+        add_writer_stages('kmj', 'kmj', 'kaomoji_kmj', 'KMJ', kmj_txt_file, 'kmj', kmj_digest, kmj_is_fresh)
+        
+    for scheme_name, scheme in shuangpin_schemes.items():
+        shuangpin_txt_file = os.path.join(args.output_dir, f'all_output_result_shuangpin_{scheme_name}.txt')
+        
+        def build_shuangpin(results, scheme_name=scheme_name, scheme=scheme,
+                            shuangpin_txt_file=shuangpin_txt_file) -> List[DictEntry]:
+            segmented, bad_lines = results['segment']
+            output_result_shuangpin = run_ordered(executor, _render_scheme, [
+                (segmented, scheme, False, use_special_space, use_dedup, memory_budget_mb)
+            ])[0]
+            save_shuangpin_results(scheme, shuangpin_txt_file, output_result_shuangpin, bad_lines, save_txt)
+            record(f'shuangpin:{scheme_name}', entries_in=len(segmented), entries_out=len(output_result_shuangpin))
+            return output_result_shuangpin
+        
+        scheduler.add_stage(f'shuangpin:{scheme_name}', build_shuangpin, ['segment'], scheme_is_fresh(scheme_name))
+        add_writer_stages(
+            'shuangpin', f'shuangpin:{scheme_name}', f'kaomoji_shuangpin_{scheme_name}', f'Shuangpin ({scheme_name})',
+            shuangpin_txt_file, f'shuangpin_{scheme_name}',
+            lambda results, scheme_name=scheme_name: content_digest([pinyin_digest(results), scheme_name]),
+            scheme_is_fresh(scheme_name)
+        )
+        
+    # 生成检索索引(--index选项)，检索键包括拼音编码、各双拼方案编码和数据源中的中文描述
+    if args.index:
+        index_file = os.path.join(args.output_dir, INDEX_FILENAME)
+        
+        def read_descriptions(results) -> List[Tuple[str, str]]:
+            # 描述随解析结果保存在构建清单中，不必重新读取和解析数据源
+            return [(emoticon, description) for entries in parsed_sources(results).values()
+                    for emoticon, _, description in entries if description is not None]
+        
+        def descriptions_digest(results) -> str:
+            if 'descriptions' not in digests:
+                digests['descriptions'] = content_digest(
+                    f'{emoticon}\t{description}' for emoticon, description in read_descriptions(results)
+                )
+            return digests['descriptions']
+        
+        def index_digest(results) -> str:
+            if 'index' not in digests:
+                digests['index'] = content_digest(
+                    [pinyin_digest(results) if need_pinyin else ''] + list(shuangpin_schemes)
+                    + [descriptions_digest(results)]
+                )
+            return digests['index']
+        
+        def build_index(results) -> int:
+            records = []
+            if need_pinyin:
+                # 对应的阶段本次已跳过时重新得到词条
+                pinyin_entries = results['pinyin'] if results['pinyin'] is not None else build_pinyin(results, save=False)
+                records.extend(('pinyin', entry.code, entry.emoticon) for entry in pinyin_entries)
+            segmented = None
+            for scheme_name, scheme in shuangpin_schemes.items():
+                shuangpin_entries = results[f'shuangpin:{scheme_name}']
+                if shuangpin_entries is None:
+                    if segmented is None:
+                        segmented = results['segment'][0] if results['segment'] is not None else segment(results)[0]
+                    shuangpin_entries = _render_scheme(segmented, scheme, False, use_special_space, use_dedup,
+                                                       memory_budget_mb)[0]
+                records.extend((f'shuangpin:{scheme_name}', entry.code, entry.emoticon) for entry in shuangpin_entries)
+            records.extend(('desc', description, emoticon) for emoticon, description in read_descriptions(results))
+                
+            record_count = write_index(records, index_file)
+            record('index', entries_in=len(records), entries_out=record_count)
+            manifest.record_output('index', index_digest(results), [index_file])
+            print(f"已生成检索索引: {index_file}，共 {record_count} 条记录")
+            return record_count
+        
+        index_deps = (['pinyin'] if need_pinyin else []) + [f'shuangpin:{name}' for name in shuangpin_schemes]
+        scheduler.add_stage('index', build_index, index_deps or parse_deps,
+                            lambda results: manifest.is_fresh('index', index_digest(results)))
+        
+        # 中文描述的二元组倒排索引只依赖数据源的解析结果，与其他阶段并发执行
+        desc_index_file = os.path.join(args.output_dir, DESC_INDEX_FILENAME)
+        
+        def build_desc_index(results) -> int:
+            descriptions = read_descriptions(results)
+            doc_count = write_description_index(descriptions, desc_index_file)
+            record('desc_index', entries_in=len(descriptions), entries_out=doc_count)
+            manifest.record_output('desc_index', descriptions_digest(results), [desc_index_file])
+            print(f"已生成描述检索索引: {desc_index_file}，共 {doc_count} 个颜文字")
+            return doc_count
+        
+        scheduler.add_stage('desc_index', build_desc_index, parse_deps,
+                            lambda results: manifest.is_fresh('desc_index', descriptions_digest(results)))
+        
+    return scheduler
+
+
+def main():
+    """主函数"""
+    args = parse_arguments()
+    
+    # 如果没有指定任何操作，默认生成所有类型词库
+    if not (args.all or args.pinyin or args.kmj or args.shuangpin):
+        args.all = True
+        
+    # 确保输出目录存在
+    os.makedirs(args.output_dir, exist_ok=True)
     
+    # 构建缓存，复用之前构建的拼音、切分和汉字识别结果
+    cache = None
+    if not args.no_cache:
+        cache = BuildCache(os.path.join(args.output_dir, CACHE_FILENAME), max_entries=args.cache_max_entries)
+        
+    # 构建失败时也要关闭缓存，保留已写入的转换结果
+    try:
+        # 初始化颜文字处理器
+        processor = KaomojiProcessor(cache=cache)
+        
+        # 进程池，--jobs为1时为None，所有步骤串行执行
+        executor = create_executor(args.jobs)
+        
+        # 构建清单，只重新生成输入发生变化的词库
+        manifest = BuildManifest(args.output_dir, tool_fingerprint(), {
+            'use_special_space': not args.no_special_space,
+            'use_dedup': not args.no_dedup,
+            'save_txt': not args.no_intermediate,
+            'version_mode': args.version_mode,
+            'kmj_max_candidates': args.kmj_max_candidates,
+            'split_dicts': args.split_dicts,
+            'formats': args.formats,
+            'sources': get_input_sources(args.data_dir)
+        })
+        if args.force:
+            manifest.reset()
+            
+        # 构建指标，只在需要时启用(tracemalloc会明显拖慢构建)
+        metrics = None
+        if args.profile or args.metrics_out or args.profile_dir:
+            metrics = BuildMetrics(profile_dir=args.profile_dir)
+            metrics.start()
+            
+        # 按依赖关系执行各生成阶段，--jobs大于1时依赖已完成的阶段并发执行
+        # 同一时间只能有一个cProfile在采样，保存cProfile数据时各阶段依次执行
+        scheduler = build_stages(args, processor, cache, manifest, executor, metrics)
+        try:
+            scheduler.run(max_workers=1 if args.profile_dir else resolve_jobs(args.jobs))
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        
+        manifest.save()
+        print(scheduler.report())
+        
+        # 与上一次发布的词库比较，生成增量差异
+        if args.delta_from:
+            delta_dir = args.delta_dir or os.path.join(args.output_dir, 'delta')
+            print_delta_summary(diff_directories(args.delta_from, args.output_dir, delta_dir))
+            print(f"增量差异已保存到: {delta_dir}")
+            
+        if metrics is not None:
+            metrics.stop()
+            if args.profile:
+                print(metrics.report())
+            if args.metrics_out:
+                metrics.write(args.metrics_out)
+                print(f"构建指标已保存到: {args.metrics_out}")
+            if args.profile_dir:
+                print(f"cProfile数据已保存到: {args.profile_dir}")
+        
+        memo_stats = processor.pinyin_memo_stats()
+        print(f"拼音转换LRU缓存命中 {memo_stats['hits']} 次，未命中 {memo_stats['misses']} 次")
+    finally:
+        if cache is not None:
+            cache.close()
+            
+    if cache is not None:
+        print(f"构建缓存命中 {cache.hits} 次，未命中 {cache.misses} 次")
+        
     print("词库生成完成!")
     print(f"输出目录: {os.path.abspath(args.output_dir)}")
 
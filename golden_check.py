@@ -0,0 +1,574 @@
+#!/usr/bin/env python3
+"""
+词库输出一致性校验工具 - 确认优化后的实现生成完全相同的词库
+
+主要功能：
+1. 以固定的日期(SOURCE_DATE_EPOCH)分别对data目录和合成语料运行完整构建
+2. 计算每个.dict.yaml文件的内容哈希，与golden目录中保存的基准输出比较
+3. 不一致时输出第一处不同的词条；--update时用本次输出更新基准
+4. 将data用例的拼音和kmj词条与优化前的输出(reference.json)比较，并校验双拼查找表，
+   任何一项不通过时拒绝更新基准，避免把错误的输出保存为基准
+5. 校验音节切分的典型用例和外部排序与内存内排序的一致性
+6. 对data用例启用构建缓存依次运行冷缓存、热缓存和增量构建，输出都应与基准一致
+7. 对每个用例的输出生成增量差异并应用，重建的词库应与本次输出的SHA-256一致
+8. 写出小型检索索引，校验已知前缀的查询结果
+9. 校验查询服务在索引生成、替换后自动重新加载并清空查询缓存
+10. 写出小型描述检索索引，校验按描述检索的结果和排序
+
+使用方法:
+    python golden_check.py [options]
+
+选项:
+    --update               用本次构建的输出更新基准
+    --case NAME            只校验指定的用例(data或synthetic)，可重复指定
+    --extra-args=ARGS      传给generate_dict.py的额外参数，如--extra-args="--jobs 4"
+    --max-diffs N          每个文件最多显示的不同词条数 (默认: 10)
+    --help                 显示帮助信息
+"""
+
+import argparse
+import contextlib
+import difflib
+import glob
+import gzip
+import hashlib
+import io
+import json
+import gc
+import os
+import pickle
+import random
+import shlex
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Optional
+
+import pychaifen
+from dict_delta import apply_delta, diff_directories
+from generate_dict import dedup_and_sort
+from kaomoji_index import KaomojiIndex, write_index
+from kaomoji_processor import DictEntry
+from kaomoji_search import DescriptionIndex, write_description_index
+from kaomoji_server import KaomojiLookupService
+from pyshuangpin import verify_tables
+from synthetic_corpus import write_corpus
+
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+_GENERATE_SCRIPT = os.path.join(_ROOT, 'generate_dict.py')
+
+# 基准输出目录，每个用例一个子目录，保存gzip压缩的词库文件和哈希清单
+GOLDEN_DIR = os.path.join(_ROOT, 'golden')
+HASHES_FILENAME = 'hashes.json'
+
+# 优化前的输出中拼音和kmj词条(不含头部，按行排序)的哈希，只有data用例有参照
+REFERENCE_FILENAME = 'reference.json'
+
+# 固定的构建时间(2024-01-01)，词库头部的version不随运行日期变化
+PINNED_SOURCE_DATE_EPOCH = '1704067200'
+
+# 合成语料用例的规模和随机种子
+SYNTHETIC_SIZE = 1000
+SYNTHETIC_SEED = 0
+
+CASES = ('data', 'synthetic')
+
+# 启用构建缓存运行的用例
+CACHED_CASES = ('data',)
+
+# 音节切分的典型用例：零声母音节只能跟在元音或鼻音结尾的音节之后，
+# 单独的a、o、e只在整段为一个音节时使用，emo、oye等不是拼音的片段保持原样
+SEGMENTER_CASES = {
+    'tiananmen': ['tian', 'an', 'men'],
+    'xianer': ['xian', 'er'],
+    'pingan': ['ping', 'an'],
+    'kaixin': ['kai', 'xin'],
+    'haha': ['ha', 'ha'],
+    'emo': ['emo'],
+    'oye': ['oye'],
+    'a': ['a'],
+}
+
+# 外部排序校验的词条数和内存预算(MB)，预算足够小以产生多个分段
+EXTERNAL_SORT_ENTRIES = 5000
+EXTERNAL_SORT_BUDGET_MB = 0.05
+
+# 检索索引校验的记录：(类别, 检索键, 颜文字)，kai xin、kai\u2002xin和kaixin规范化后是同一个检索键
+INDEX_RECORDS = [
+    ('pinyin', 'kai xin', '(^_^)'),
+    ('pinyin', 'kai\u2002xin', '(^o^)'),
+    ('pinyin', 'ku', '(T_T)'),
+    ('pinyin', 'kaixin', '(^_^)'),
+    ('shuangpin:xiaohe', 'kdxb', '(^_^)'),
+    ('desc', '开心', '(^_^)'),
+    ('desc', '开心果', '(^o^)'),
+]
+INDEX_RECORD_COUNT = 6
+
+# 描述检索索引校验的(颜文字, 描述)，同一颜文字的多个描述合并为一个文档
+DESCRIPTION_RECORDS = [
+    ('(^_^)', '开心'),
+    ('(T_T)', '不开心'),
+    ('(^o^)', '真开心'),
+    ('(;_;)', '哭'),
+    ('(^_^)', '微笑'),
+]
+
+# 描述检索的查询用例：(查询, 期望的 (颜文字, 描述) 列表)；较短的文档得分较高，同分时按颜文字首次出现的顺序
+DESCRIPTION_CASES = [
+    ('开心', [('(T_T)', '不开心'), ('(^o^)', '真开心'), ('(^_^)', '开心、微笑')]),
+    ('哭', [('(;_;)', '哭')]),
+    ('微笑', [('(^_^)', '开心、微笑')]),
+    ('生气', []),
+]
+
+# 检索索引的查询用例：(查询, 类别, 最多返回数, 期望的颜文字)；不指定类别时按类别名称的顺序检索
+INDEX_CASES = [
+    ('kai', 'pinyin', 20, ['(^_^)', '(^o^)']),
+    ('k', None, 20, ['(^_^)', '(^o^)', '(T_T)']),
+    ('KAI XIN', None, 1, ['(^_^)']),
+    ('开心', None, 20, ['(^_^)', '(^o^)']),
+    ('kd', 'shuangpin:xiaohe', 20, ['(^_^)']),
+    ('kx', 'pinyin', 20, []),
+]
+
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='词库输出一致性校验工具')
+    parser.add_argument('--update', action='store_true',
+                        help='用本次构建的输出更新基准')
+    parser.add_argument('--case', action='append', choices=CASES,
+                        help='只校验指定的用例，可重复指定 (默认: 全部)')
+    parser.add_argument('--extra-args', type=str, default='',
+                        help='传给generate_dict.py的额外参数，如"--jobs 4"')
+    parser.add_argument('--max-diffs', type=int, default=10,
+                        help='每个文件最多显示的不同词条数 (默认: 10)')
+    return parser.parse_args()
+
+
+def sha256_bytes(data: bytes) -> str:
+    """计算字节串的SHA-256"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def build_case(case: str, work_dir: str, extra_args: List[str], use_cache: bool = False,
+               force: bool = True) -> Dict[str, bytes]:
+    """
+    为用例准备输入并运行完整构建
+
+    Args:
+        case: 用例名称
+        work_dir: 工作目录，同一工作目录的多次构建共用输出目录、构建缓存和构建清单
+        extra_args: 传给generate_dict.py的额外参数
+        use_cache: 是否启用构建缓存
+        force: 是否忽略构建清单重新生成所有输出
+
+    Returns:
+        词库文件名到文件内容的映射
+    """
+    if case == 'data':
+        data_dir = os.path.join(_ROOT, 'data')
+    else:
+        data_dir = os.path.join(work_dir, 'data')
+        write_corpus(data_dir, SYNTHETIC_SIZE, SYNTHETIC_SEED)
+
+    output_dir = os.path.join(work_dir, 'output')
+    env = dict(os.environ, SOURCE_DATE_EPOCH=PINNED_SOURCE_DATE_EPOCH)
+    command = [sys.executable, _GENERATE_SCRIPT, '--all', '--data-dir', data_dir, '--output-dir', output_dir]
+    command += ([] if use_cache else ['--no-cache']) + (['--force'] if force else []) + extra_args
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL, env=env, cwd=_ROOT)
+
+    outputs = {}
+    for path in sorted(glob.glob(os.path.join(output_dir, '*.dict.yaml'))):
+        with open(path, 'rb') as file:
+            outputs[os.path.basename(path)] = file.read()
+    return outputs
+
+
+def entry_digest(data: bytes) -> str:
+    """
+    计算词库词条的哈希：去掉头部(第一个...行及之前的内容)后按行排序，与词条顺序和version无关
+
+    Args:
+        data: 词库文件内容
+
+    Returns:
+        SHA-256
+    """
+    lines = data.decode('utf-8').split('\n')
+    if '...' in lines:
+        lines = lines[lines.index('...') + 1:]
+    return sha256_bytes('\n'.join(sorted(line for line in lines if line)).encode('utf-8'))
+
+
+def check_reference(case: str, outputs: Dict[str, bytes]) -> bool:
+    """
+    将词条与优化前的输出比较
+
+    Args:
+        case: 用例名称
+        outputs: 词库文件名到文件内容的映射
+
+    Returns:
+        一致或用例没有参照时返回True
+    """
+    path = os.path.join(GOLDEN_DIR, case, REFERENCE_FILENAME)
+    if not os.path.exists(path):
+        return True
+    with open(path, 'r', encoding='utf-8') as file:
+        reference = json.load(file)
+
+    matched = True
+    for filename, expected in sorted(reference['entries'].items()):
+        if filename not in outputs:
+            print(f"[{case}] {filename}: 缺少输出文件，无法与优化前的输出比较")
+            matched = False
+        elif entry_digest(outputs[filename]) != expected:
+            print(f"[{case}] {filename}: 词条与优化前的输出不一致")
+            matched = False
+    return matched
+
+
+def check_shuangpin_tables() -> bool:
+    """校验双拼查找表，有错误时输出错误的音节"""
+    errors = verify_tables()
+    for scheme, syllable, table_code, expected in errors:
+        print(f"双拼查找表错误: {scheme.name} {syllable} -> {table_code}" + (f"，期望 {expected}" if expected else ''))
+    return not errors
+
+
+def check_segmenter() -> bool:
+    """校验音节切分的典型用例，有错误时输出实际的切分结果"""
+    matched = True
+    for text, expected in SEGMENTER_CASES.items():
+        actual = pychaifen.quanp2shuangp(text)
+        if actual != expected:
+            print(f"音节切分错误: {text} -> {' '.join(actual)}，期望 {' '.join(expected)}")
+            matched = False
+    return matched
+
+
+def check_external_sort() -> bool:
+    """校验外部排序的结果与内存内去重排序完全一致，且结果可以多次迭代、跨进程传递"""
+    rng = random.Random(SYNTHETIC_SEED)
+    emoticons = [f'(^{index}^)' for index in range(500)]
+    codes = ['kai xin', 'Kai xin', 'ku', 'xiao', 'ai ni', 'hao de']
+    entries = [DictEntry(rng.choice(emoticons), rng.choice(codes), rng.randrange(3), f'source{rng.randrange(2)}')
+               for _ in range(EXTERNAL_SORT_ENTRIES)]
+    expected = dedup_and_sort(entries)
+
+    spilled = dedup_and_sort(iter(entries), memory_budget_mb=EXTERNAL_SORT_BUDGET_MB)
+    matched = len(spilled) == len(expected) and list(spilled) == expected and list(spilled) == expected
+    # 反序列化得到的对象接管临时文件，两者都被回收后临时文件应被删除
+    restored = pickle.loads(pickle.dumps(spilled))
+    path = restored.path
+    del spilled
+    gc.collect()
+    matched = matched and list(restored) == expected
+    del restored
+    gc.collect()
+    if not matched:
+        print("外部排序错误: 结果与内存内去重排序不一致")
+    if os.path.exists(path):
+        print(f"外部排序错误: 临时文件 {path} 未被删除")
+        matched = False
+    return matched
+
+
+def check_index() -> bool:
+    """写出小型检索索引，通过mmap打开后校验记录数和已知前缀的查询结果"""
+    matched = True
+    with tempfile.TemporaryDirectory(prefix='kaomoji_golden_index_') as work_dir:
+        path = os.path.join(work_dir, 'index.bin')
+        record_count = write_index(INDEX_RECORDS, path)
+        with KaomojiIndex(path) as index:
+            if record_count != INDEX_RECORD_COUNT or index.record_count != INDEX_RECORD_COUNT:
+                print(f"检索索引错误: 记录数为 {record_count}/{index.record_count}，期望 {INDEX_RECORD_COUNT}")
+                matched = False
+            for query, kind, limit, expected in INDEX_CASES:
+                actual = index.prefix(query, kind, limit)
+                if actual != expected:
+                    print(f"检索索引错误: 查询 {query!r}(类别 {kind}) -> {actual}，期望 {expected}")
+                    matched = False
+    return matched
+
+
+def check_description_search() -> bool:
+    """写出小型描述检索索引，校验文档数和已知查询的结果及排序"""
+    matched = True
+    with tempfile.TemporaryDirectory(prefix='kaomoji_golden_desc_') as work_dir:
+        path = os.path.join(work_dir, 'desc_index.bin')
+        doc_count = write_description_index(DESCRIPTION_RECORDS, path)
+        expected_count = len({emoticon for emoticon, _ in DESCRIPTION_RECORDS})
+        if doc_count != expected_count:
+            print(f"描述检索索引错误: 文档数为 {doc_count}，期望 {expected_count}")
+            matched = False
+        with DescriptionIndex(path) as index:
+            for query, expected in DESCRIPTION_CASES:
+                actual = [(emoticon, description) for emoticon, _, description in index.search(query)]
+                if actual != expected:
+                    print(f"描述检索索引错误: 查询 {query!r} -> {actual}，期望 {expected}")
+                    matched = False
+    return matched
+
+
+def check_server_reload() -> bool:
+    """
+    模拟生成器先后写出两版索引，校验查询服务的加载、缓存和重新加载：
+    索引生成前返回503，生成后加载，重复查询命中缓存，索引替换后重新加载并返回新结果
+    """
+    with tempfile.TemporaryDirectory(prefix='kaomoji_golden_server_') as work_dir, \
+            contextlib.redirect_stdout(io.StringIO()):
+        path = os.path.join(work_dir, 'index.bin')
+        service = KaomojiLookupService(path, cache_size=16)
+        steps = [service.handle('GET', '/lookup?q=kai')]
+        write_index(INDEX_RECORDS, path)
+        steps.append(service.reload_if_changed())
+        steps.append(service.handle('GET', '/lookup?q=kai&kind=pinyin'))
+        steps.append(service.handle('GET', '/lookup?q=kai&kind=pinyin'))
+        steps.append(service.reload_if_changed())
+        write_index([('pinyin', 'kai xin', '(>_<)')], path)
+        steps.append(service.reload_if_changed())
+        steps.append(service.handle('GET', '/lookup?q=kai&kind=pinyin'))
+        reloads = service.reloads
+        service.close()
+
+    expected = [
+        (503, {'error': f'检索索引尚未生成: {path}'}),
+        True,
+        (200, {'query': 'kai', 'kind': 'pinyin', 'candidates': ['(^_^)', '(^o^)'], 'cached': False}),
+        (200, {'query': 'kai', 'kind': 'pinyin', 'candidates': ['(^_^)', '(^o^)'], 'cached': True}),
+        False,
+        True,
+        (200, {'query': 'kai', 'kind': 'pinyin', 'candidates': ['(>_<)'], 'cached': False}),
+    ]
+    if steps != expected or reloads != 1:
+        print(f"查询服务重新加载错误: {steps}，重新加载 {reloads} 次")
+        return False
+    return True
+
+
+def check_delta(case: str, outputs: Dict[str, bytes]) -> bool:
+    """
+    以本次输出为新版本、删改部分行后的输出为旧版本生成增量差异，再应用到旧版本，
+    重建结果必须与本次输出逐字节一致
+
+    Args:
+        case: 用例名称
+        outputs: 词库文件名到文件内容的映射
+
+    Returns:
+        全部一致时返回True
+    """
+    matched = True
+    with tempfile.TemporaryDirectory(prefix=f'kaomoji_golden_{case}_delta_') as work_dir:
+        old_dir = os.path.join(work_dir, 'old')
+        new_dir = os.path.join(work_dir, 'new')
+        os.makedirs(old_dir)
+        os.makedirs(new_dir)
+        for position, (filename, data) in enumerate(sorted(outputs.items())):
+            with open(os.path.join(new_dir, filename), 'wb') as file:
+                file.write(data)
+            # 第一个词库保持不变，其余词库修改version并隔行删除部分词条
+            lines = data.decode('utf-8').split('\n')
+            if position:
+                lines = [line.replace('version:', 'version: old') for index, line in enumerate(lines)
+                         if index % 7 != 3]
+            with open(os.path.join(old_dir, filename), 'wb') as file:
+                file.write('\n'.join(lines).encode('utf-8'))
+
+        delta_dir = os.path.join(work_dir, 'delta')
+        for filename, record in diff_directories(old_dir, new_dir, delta_dir).items():
+            expected_status = 'changed' if filename != min(outputs) else 'unchanged'
+            if record['status'] != expected_status or record['target'] != sha256_bytes(outputs[filename]):
+                print(f"[{case}] {filename}: 增量差异索引错误: {record}")
+                matched = False
+                continue
+            if record['status'] != 'changed':
+                continue
+            try:
+                rebuilt = apply_delta(os.path.join(old_dir, filename), os.path.join(delta_dir, record['delta']),
+                                      os.path.join(work_dir, filename))
+            except ValueError as e:
+                print(f"[{case}] {filename}: 无法应用增量差异: {e}")
+                matched = False
+                continue
+            with open(rebuilt, 'rb') as file:
+                if file.read() != outputs[filename]:
+                    print(f"[{case}] {filename}: 应用增量差异后与本次输出不一致")
+                    matched = False
+    return matched
+
+
+def load_golden(case: str) -> Optional[Dict[str, str]]:
+    """读取用例的基准哈希清单，没有基准时返回None"""
+    path = os.path.join(GOLDEN_DIR, case, HASHES_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def load_golden_file(case: str, filename: str) -> Optional[bytes]:
+    """读取基准词库文件内容"""
+    path = os.path.join(GOLDEN_DIR, case, f'{filename}.gz')
+    if not os.path.exists(path):
+        return None
+    with gzip.open(path, 'rb') as file:
+        return file.read()
+
+
+def update_golden(case: str, outputs: Dict[str, bytes]):
+    """
+    用本次输出替换用例的基准
+
+    Args:
+        case: 用例名称
+        outputs: 词库文件名到文件内容的映射
+    """
+    case_dir = os.path.join(GOLDEN_DIR, case)
+    os.makedirs(case_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(case_dir, '*.gz')):
+        os.remove(path)
+    for filename, data in outputs.items():
+        # 固定gzip头部的时间和文件名，相同内容的基准文件字节完全一致
+        with open(os.path.join(case_dir, f'{filename}.gz'), 'wb') as raw_file, \
+                gzip.GzipFile(filename='', mode='wb', fileobj=raw_file, mtime=0) as file:
+            file.write(data)
+    with open(os.path.join(case_dir, HASHES_FILENAME), 'w', encoding='utf-8') as file:
+        json.dump({filename: sha256_bytes(data) for filename, data in outputs.items()}, file, indent=2)
+        file.write('\n')
+
+
+def first_differences(expected: bytes, actual: bytes, max_diffs: int) -> List[str]:
+    """
+    找出两个词库文件中最先出现的不同词条
+
+    Args:
+        expected: 基准内容
+        actual: 本次输出内容
+        max_diffs: 最多返回的行数
+
+    Returns:
+        以-标记基准词条、以+标记本次词条的差异行
+    """
+    expected_lines = expected.decode('utf-8').splitlines()
+    actual_lines = actual.decode('utf-8').splitlines()
+    diffs = []
+    matcher = difflib.SequenceMatcher(None, expected_lines, actual_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        diffs.append(f"  @@ 第 {i1 + 1} 行")
+        diffs.extend(f"  - {line}" for line in expected_lines[i1:i2])
+        diffs.extend(f"  + {line}" for line in actual_lines[j1:j2])
+        if len(diffs) >= max_diffs:
+            break
+    return diffs[:max_diffs]
+
+
+def compare_case(case: str, outputs: Dict[str, bytes], max_diffs: int) -> bool:
+    """
+    将本次输出与基准比较并输出结果
+
+    Args:
+        case: 用例名称
+        outputs: 词库文件名到文件内容的映射
+        max_diffs: 每个文件最多显示的不同词条数
+
+    Returns:
+        全部一致时返回True
+    """
+    golden = load_golden(case)
+    if golden is None:
+        print(f"[{case}] 没有基准输出，请先运行 python golden_check.py --update")
+        return False
+
+    matched = True
+    for filename in sorted(set(golden) | set(outputs)):
+        if filename not in outputs:
+            print(f"[{case}] {filename}: 缺少输出文件")
+            matched = False
+            continue
+        if filename not in golden:
+            print(f"[{case}] {filename}: 基准中没有该文件")
+            matched = False
+            continue
+        actual_hash = sha256_bytes(outputs[filename])
+        if actual_hash == golden[filename]:
+            print(f"[{case}] {filename}: 一致")
+            continue
+
+        matched = False
+        print(f"[{case}] {filename}: 不一致 (基准 {golden[filename][:12]}，本次 {actual_hash[:12]})")
+        expected = load_golden_file(case, filename)
+        if expected is None:
+            print("  基准文件内容缺失，无法显示差异")
+        else:
+            print('\n'.join(first_differences(expected, outputs[filename], max_diffs)))
+    return matched
+
+
+def check_cached_builds(case: str, extra_args: List[str]) -> bool:
+    """
+    启用构建缓存依次运行冷缓存、热缓存和增量构建(不加--force，输出均由构建清单跳过)，
+    每次的输出都与基准比较
+
+    Args:
+        case: 用例名称
+        extra_args: 传给generate_dict.py的额外参数
+
+    Returns:
+        全部一致时返回True
+    """
+    golden = load_golden(case) or {}
+    matched = True
+    with tempfile.TemporaryDirectory(prefix=f'kaomoji_golden_{case}_cached_') as work_dir:
+        for label, force in (('冷缓存', True), ('热缓存', True), ('增量构建', False)):
+            outputs = build_case(case, work_dir, extra_args, use_cache=True, force=force)
+            different = sorted(filename for filename in set(golden) | set(outputs)
+                               if filename not in outputs or sha256_bytes(outputs[filename]) != golden.get(filename))
+            if different:
+                print(f"[{case}] 启用构建缓存({label}): 与基准不一致: {', '.join(different)}")
+                matched = False
+            else:
+                print(f"[{case}] 启用构建缓存({label}): 一致")
+    return matched
+
+
+def main():
+    """主函数"""
+    args = parse_arguments()
+    extra_args = shlex.split(args.extra_args)
+
+    all_matched = check_shuangpin_tables()
+    all_matched = check_segmenter() and all_matched
+    all_matched = check_external_sort() and all_matched
+    all_matched = check_index() and all_matched
+    all_matched = check_server_reload() and all_matched
+    all_matched = check_description_search() and all_matched
+    for case in args.case or CASES:
+        with tempfile.TemporaryDirectory(prefix=f'kaomoji_golden_{case}_') as work_dir:
+            outputs = build_case(case, work_dir, extra_args)
+        if not check_reference(case, outputs):
+            all_matched = False
+        if not check_delta(case, outputs):
+            all_matched = False
+        if args.update:
+            if not all_matched:
+                print(f"[{case}] 输出未通过校验，拒绝更新基准")
+                sys.exit(1)
+            update_golden(case, outputs)
+            print(f"[{case}] 已更新 {len(outputs)} 个基准文件")
+        elif not compare_case(case, outputs, args.max_diffs):
+            all_matched = False
+        if not args.update and case in CACHED_CASES and not check_cached_builds(case, extra_args):
+            all_matched = False
+
+    if not all_matched:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
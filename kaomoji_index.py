@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+颜文字检索索引模块 - 按拼音、双拼编码和中文描述前缀检索颜文字
+
+主要功能：
+1. 将(类别, 检索键, 颜文字)记录写为紧凑的二进制索引，每个类别内的检索键按字节序排列
+2. 通过mmap打开索引，二分查找前缀所在的区间，查询时不需要把索引加载为Python对象
+3. 提供命令行查询入口，便于调试和测量查询耗时
+
+索引文件格式(所有整数为小端序uint32)：
+    文件头      8字节标识KMJIDX01，类别数，颜文字数，记录数，保留字段
+    类别表      每个类别：名称偏移，名称长度，起始记录，结束记录
+    颜文字偏移  颜文字数+1个偏移，第i个颜文字为字符串区[offset[i], offset[i+1])
+    检索键偏移  记录数+1个偏移，按类别和检索键排序
+    颜文字编号  记录数个颜文字编号
+    字符串区    UTF-8编码的类别名称、颜文字和检索键
+
+使用方法:
+    python kaomoji_index.py INDEX_FILE QUERY [options]
+
+选项:
+    --kind KIND            只检索指定类别(如pinyin、shuangpin:xiaohe、desc)
+    --limit N              最多返回的颜文字数 (默认: 20)
+    --help                 显示帮助信息
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 索引文件标识和文件名
+INDEX_MAGIC = b'KMJIDX01'
+INDEX_FILENAME = 'kaomoji_index.bin'
+
+_UINT32 = struct.Struct('<I')
+_HEADER = struct.Struct('<8sIIII')
+_KIND = struct.Struct('<IIII')
+
+
+def normalize_key(text: str) -> str:
+    """
+    规范化检索键和查询：转为小写并去掉普通空格和特殊空格(U+2002)，
+    使kai xin、kaixin、kai\\u2002xin都能命中同一个编码
+
+    Args:
+        text: 编码、描述或查询文本
+
+    Returns:
+        规范化后的文本
+    """
+    return ''.join(text.lower().split())
+
+
+def write_index(records: Iterable[Tuple[str, str, str]], path: str) -> int:
+    """
+    写出检索索引
+
+    Args:
+        records: (类别, 检索键, 颜文字) 记录，检索键写入前会经过normalize_key
+        path: 索引文件路径
+
+    Returns:
+        写入的记录数(去除重复后)
+    """
+    emoticon_ids: Dict[str, int] = {}
+    unique = set()
+    for kind, key, emoticon in records:
+        key = normalize_key(key)
+        if not key:
+            continue
+        emoticon_id = emoticon_ids.setdefault(emoticon, len(emoticon_ids))
+        unique.add((kind, key.encode('utf-8'), emoticon_id))
+    # 类别内按检索键的字节序排序，字节序与UTF-8字符串的前缀关系一致
+    sorted_records = sorted(unique)
+    kinds = sorted({kind for kind, _, _ in sorted_records})
+
+    blob = bytearray()
+    kind_table = []
+    position = 0
+    for kind in kinds:
+        start = position
+        while position < len(sorted_records) and sorted_records[position][0] == kind:
+            position += 1
+        name = kind.encode('utf-8')
+        kind_table.append((len(blob), len(name), start, position))
+        blob += name
+
+    emoticon_offsets = []
+    for emoticon in emoticon_ids:
+        emoticon_offsets.append(len(blob))
+        blob += emoticon.encode('utf-8')
+    emoticon_offsets.append(len(blob))
+
+    key_offsets = []
+    for _, key, _ in sorted_records:
+        key_offsets.append(len(blob))
+        blob += key
+    key_offsets.append(len(blob))
+
+    # 先写临时文件再替换，已通过mmap打开旧索引的进程(如kaomoji_server.py)不会读到写了一半的文件
+    tmp_file = f'{path}.tmp'
+    with open(tmp_file, 'wb') as file:
+        file.write(_HEADER.pack(INDEX_MAGIC, len(kinds), len(emoticon_ids), len(sorted_records), 0))
+        for entry in kind_table:
+            file.write(_KIND.pack(*entry))
+        file.write(struct.pack(f'<{len(emoticon_offsets)}I', *emoticon_offsets))
+        file.write(struct.pack(f'<{len(key_offsets)}I', *key_offsets))
+        file.write(struct.pack(f'<{len(sorted_records)}I', *(emoticon_id for _, _, emoticon_id in sorted_records)))
+        file.write(blob)
+    os.replace(tmp_file, path)
+    return len(sorted_records)
+
+
+class KaomojiIndex:
+    """
+    通过mmap打开的颜文字检索索引，支持按前缀查询
+
+    查询时只在索引文件上二分查找和读取命中的记录，打开大索引的开销与索引大小无关。
+    """
+
+    def __init__(self, path: str):
+        """
+        打开检索索引
+
+        Args:
+            path: 索引文件路径
+
+        Raises:
+            ValueError: 文件不是颜文字检索索引
+        """
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, kind_count, emoticon_count, record_count, _ = _HEADER.unpack_from(self._mm, 0)
+        if magic != INDEX_MAGIC:
+            self.close()
+            raise ValueError(f"不是颜文字检索索引: {path}")
+        self.record_count = record_count
+        self.emoticon_count = emoticon_count
+
+        offset = _HEADER.size
+        kind_entries = []
+        for _ in range(kind_count):
+            kind_entries.append(_KIND.unpack_from(self._mm, offset))
+            offset += _KIND.size
+        self._emoticon_offsets = offset
+        self._key_offsets = self._emoticon_offsets + (emoticon_count + 1) * 4
+        self._emoticon_ids = self._key_offsets + (record_count + 1) * 4
+        self._blob = self._emoticon_ids + record_count * 4
+
+        # 类别名称到记录区间的映射，类别数很少，打开时读取
+        self.kinds: Dict[str, Tuple[int, int]] = {}
+        for name_offset, name_length, start, end in kind_entries:
+            name = self._mm[self._blob + name_offset:self._blob + name_offset + name_length].decode('utf-8')
+            self.kinds[name] = (start, end)
+
+    def close(self):
+        """关闭索引文件"""
+        if getattr(self, '_mm', None) is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _uint32(self, base: int, index: int) -> int:
+        return _UINT32.unpack_from(self._mm, base + index * 4)[0]
+
+    def _key(self, record: int) -> bytes:
+        start = self._blob + self._uint32(self._key_offsets, record)
+        end = self._blob + self._uint32(self._key_offsets, record + 1)
+        return self._mm[start:end]
+
+    def _emoticon(self, emoticon_id: int) -> str:
+        start = self._blob + self._uint32(self._emoticon_offsets, emoticon_id)
+        end = self._blob + self._uint32(self._emoticon_offsets, emoticon_id + 1)
+        return self._mm[start:end].decode('utf-8')
+
+    def _lower_bound(self, prefix: bytes, start: int, end: int) -> int:
+        """在[start, end)中二分查找第一个不小于prefix的检索键"""
+        while start < end:
+            middle = (start + end) // 2
+            if self._key(middle) < prefix:
+                start = middle + 1
+            else:
+                end = middle
+        return start
+
+    def _search_kind(self, kind: str, prefix: bytes, limit: int, seen: set, results: List[str]):
+        """在一个类别中按前缀查询，结果追加到results中"""
+        start, end = self.kinds[kind]
+        record = self._lower_bound(prefix, start, end)
+        while record < end and len(results) < limit:
+            if not self._key(record).startswith(prefix):
+                break
+            emoticon_id = self._uint32(self._emoticon_ids, record)
+            if emoticon_id not in seen:
+                seen.add(emoticon_id)
+                results.append(self._emoticon(emoticon_id))
+            record += 1
+
+    def prefix(self, query: str, kind: Optional[str] = None, limit: int = 20) -> List[str]:
+        """
+        按前缀查询颜文字
+
+        Args:
+            query: 查询文本，与检索键一样经过normalize_key
+            kind: 只检索指定类别，为None时依次检索所有类别
+            limit: 最多返回的颜文字数
+
+        Returns:
+            去除重复后的颜文字列表，按类别和检索键的顺序排列
+
+        Raises:
+            KeyError: 索引中没有指定的类别
+        """
+        prefix = normalize_key(query).encode('utf-8')
+        results: List[str] = []
+        seen: set = set()
+        if kind is not None:
+            if kind not in self.kinds:
+                raise KeyError(f"索引中没有类别: {kind}")
+            self._search_kind(kind, prefix, limit, seen, results)
+        else:
+            for name in self.kinds:
+                if len(results) >= limit:
+                    break
+                self._search_kind(name, prefix, limit, seen, results)
+        return results
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='颜文字检索索引查询工具')
+    parser.add_argument('index_file', help='索引文件路径')
+    parser.add_argument('query', help='查询的前缀，如kaixin、开心')
+    parser.add_argument('--kind', type=str, default=None,
+                        help='只检索指定类别(如pinyin、shuangpin:xiaohe、desc)')
+    parser.add_argument('--limit', type=int, default=20,
+                        help='最多返回的颜文字数 (默认: 20)')
+    args = parser.parse_args()
+
+    with KaomojiIndex(args.index_file) as index:
+        start = time.perf_counter()
+        results = index.prefix(args.query, args.kind, args.limit)
+        elapsed = time.perf_counter() - start
+        for emoticon in results:
+            print(emoticon)
+        print(f"共 {len(results)} 个结果，类别: {', '.join(index.kinds)}，查询耗时 {elapsed * 1000:.3f} 毫秒")
+
+
+if __name__ == "__main__":
+    main()
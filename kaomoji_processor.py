@@ -8,21 +8,184 @@
 """
 
 import re
-from typing import List, Tuple
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
 from pypinyin import pinyin, Style
 
 
+class DictEntry(NamedTuple):
+    """
+    词条记录，在解析、去重排序、双拼转换等各阶段之间传递，只在写出词库时才格式化为文本行
+    """
+    emoticon: str
+    code: str
+    weight: int = 0
+    source: str = ''
+    # 音节切分结果，每个片段为 (原始片段, 音节元组或None)，只在双拼转换阶段使用
+    syllables: Optional[tuple] = None
+    # 编码和权重之后的附加列，如详细模式下的全拼和汉字
+    extra: Tuple[str, ...] = ()
+    
+    def sort_key(self) -> tuple:
+        """
+        排序键，按编码(忽略大小写)排序，编码相同时按各列排序
+        
+        排序键同时用于去重：排序键相同的词条视为重复，不比较来源和音节切分结果
+        """
+        return self.code.lower(), self.emoticon, self.code, self.weight, self.extra
+    
+    def to_line(self) -> str:
+        """
+        格式化为词库文本行
+        
+        Returns:
+            以制表符分隔、以换行符结尾的词库行
+        """
+        if self.extra:
+            return f"{self.emoticon}\t{self.code}\t{self.weight}\t" + '\t'.join(self.extra) + '\n'
+        return f"{self.emoticon}\t{self.code}\t{self.weight}\n"
+
+
+# 词库文本行格式：颜文字\t编码\t权重
+_DICT_LINE_PATTERN = re.compile(r'^(.*?)\t(.*)\t(.*)$')
+
+
+def parse_dict_line(line: str, source: str = '') -> Optional[DictEntry]:
+    """
+    将词库文本行(如中间文件all_output_result_*.txt中的行)解析为词条记录
+    
+    Args:
+        line: 词库行
+        source: 词条来源
+        
+    Returns:
+        词条记录，格式不符时返回None
+    """
+    match = _DICT_LINE_PATTERN.search(line)
+    if not match:
+        return None
+    weight = match.group(3)
+    return DictEntry(match.group(1), match.group(2), int(weight) if weight.isdigit() else 0, source)
+
+
+class SourceAdapter:
+    """
+    数据源适配器，包含预编译的正则表达式和对应的逐行提取函数
+    
+    提取函数签名为 extractor(processor, match, use_special_space)，
+    返回 (颜文字, 编码, 描述) 元组，返回None表示跳过该行。
+    pattern为None时，提取函数收到的是整行文本而不是匹配对象。
+    """
+    
+    def __init__(self, name: str, pattern: Optional[str], extractor: Callable, file_keyword: str = None):
+        """
+        初始化数据源适配器
+        
+        Args:
+            name: 数据源格式名称
+            pattern: 逐行匹配的正则表达式，为None时按整行处理
+            extractor: 逐行提取函数
+            file_keyword: 用于从文件名推断格式的关键字，默认与格式名称相同
+        """
+        self.name = name
+        self.pattern = re.compile(pattern) if pattern else None
+        self.extractor = extractor
+        self.file_keyword = file_keyword or name
+
+
+# 已注册的数据源适配器，格式名称到适配器的映射
+SOURCE_ADAPTERS: Dict[str, SourceAdapter] = {}
+
+
+def register_source_adapter(adapter: SourceAdapter) -> SourceAdapter:
+    """
+    注册数据源适配器，同名适配器会被覆盖
+    
+    Args:
+        adapter: 数据源适配器
+        
+    Returns:
+        注册的适配器
+    """
+    SOURCE_ADAPTERS[adapter.name] = adapter
+    return adapter
+
+
+def detect_source_format(filename: str) -> Optional[str]:
+    """
+    根据文件名推断数据源格式，用于兼容未显式声明格式的调用
+    
+    Args:
+        filename: 数据源文件名
+        
+    Returns:
+        格式名称，无法推断时返回None
+    """
+    for name, adapter in SOURCE_ADAPTERS.items():
+        if adapter.file_keyword in filename:
+            return name
+    return None
+
+
+def _extract_described(processor, match, use_special_space: bool):
+    """提取带中文描述的条目(lmeee、sougou)，描述在生成拼音词库时才转换为拼音"""
+    return processor.process_kaomoji(match.group(1), use_special_space), None, match.group(2)
+
+
+def _extract_temreg(processor, match, use_special_space: bool):
+    """提取Temreg条目：颜文字\t拼音\t权重"""
+    return processor.process_kaomoji(match.group(1), use_special_space), match.group(2), None
+
+
+def _extract_custom_phrase(processor, match, use_special_space: bool):
+    """提取custom_phrase条目：拼音    颜文字"""
+    return processor.process_kaomoji(match.group(2), use_special_space), match.group(1), None
+
+
+def _extract_plain(processor, line: str, use_special_space: bool):
+    """提取无编码信息的条目(A_kaomoji)，只能生成kmj条目"""
+    return processor.process_kaomoji(line.strip(), use_special_space), None, None
+
+
+register_source_adapter(SourceAdapter(
+    'lmeee',
+    r'<p>(.*?)<\/p><span class="copyBtn".*?data-desc="(.*?)".*?data-clipboard-text=".*?">.*?<\/span>',
+    _extract_described
+))
+register_source_adapter(SourceAdapter('Temreg', r'^(.*?)\t(.*)\t(.*)$', _extract_temreg))
+register_source_adapter(SourceAdapter('A_kaomoji', None, _extract_plain))
+register_source_adapter(SourceAdapter('custom_phrase', r'^(.*?)    (.*)$', _extract_custom_phrase))
+register_source_adapter(SourceAdapter(
+    'sougou',
+    r'<div class="ywz_content">(.*?)<\/div>.*?<div class="ywz_cont_name">输入文字：(.*?)<\/div>',
+    _extract_described
+))
+
+
 class KaomojiProcessor:
     """
     颜文字处理类，提供颜文字相关的处理功能
     """
     
-    def __init__(self):
-        """初始化颜文字处理器"""
+    def __init__(self, cache=None, pinyin_memo_size: int = 4096):
+        """
+        初始化颜文字处理器
+        
+        Args:
+            cache: 可选的构建缓存(build_cache.BuildCache)，用于在多次构建之间复用拼音转换结果
+            pinyin_memo_size: 进程内拼音转换结果的LRU缓存容量，为0时不缓存
+        """
+        self.cache = cache
+        # 同一批描述("好"、"哭"、"开心")会被成千上万个颜文字重复使用，转换结果在进程内做LRU缓存
+        self.pinyin_memo_size = pinyin_memo_size
+        self.pinyin_memo = OrderedDict()
+        self.pinyin_memo_hits = 0
+        self.pinyin_memo_misses = 0
         # 禁止的前缀，Rime词库规定某些前缀无法作为开头需要删除
         self.invalid_prefixes = ["---", "..."]
         # 中文和英文字符的正则表达式
         self.chinese_english_pattern = r'^[a-zA-Z\u4e00-\u9fa5]+$'
+        self.chinese_english_regex = re.compile(self.chinese_english_pattern)
         
     def replace_spaces(self, text: str) -> str:
         """
@@ -79,7 +242,21 @@ class KaomojiProcessor:
         Returns:
             如果只包含中文和英文字符，返回True；否则返回False
         """
-        return bool(re.match(self.chinese_english_pattern, text.replace(" ", "")))
+        return bool(self.chinese_english_regex.match(text.replace(" ", "")))
+    
+    def has_pinyin(self, code: Optional[str], description: Optional[str]) -> bool:
+        """
+        判断解析出的条目能否生成拼音：数据源自带编码，或描述只含中英文
+        
+        Args:
+            code: 数据源自带的编码
+            description: 数据源中的描述
+            
+        Returns:
+            能生成拼音时返回True
+        """
+        # 去除空格后，检查中文或英文字符是否占据整个描述
+        return code is not None or (description is not None and self.is_chinese_english_text(description))
     
     def get_pinyin_for_text(self, text: str) -> str:
         """
@@ -91,9 +268,108 @@ class KaomojiProcessor:
         Returns:
             文本的拼音，以空格分隔
         """
+        memo = self.pinyin_memo
+        pinyin_str = memo.get(text)
+        if pinyin_str is not None:
+            self.pinyin_memo_hits += 1
+            memo.move_to_end(text)
+            return pinyin_str
+            
+        self.pinyin_memo_misses += 1
+        if self.cache is not None:
+            pinyin_str = self.cache.get_or_compute('pinyin', text, self._convert_pinyin)
+        else:
+            pinyin_str = self._convert_pinyin(text)
+            
+        if self.pinyin_memo_size > 0:
+            memo[text] = pinyin_str
+            if len(memo) > self.pinyin_memo_size:
+                memo.popitem(last=False)
+        return pinyin_str
+    
+    def get_pinyin_for_texts(self, texts: List[str]) -> List[str]:
+        """
+        批量获取文本的拼音，重复的文本只转换一次
+        
+        Args:
+            texts: 需要转换的文本列表
+            
+        Returns:
+            与输入一一对应的拼音列表
+        """
+        converted = {text: self.get_pinyin_for_text(text) for text in dict.fromkeys(texts)}
+        return [converted[text] for text in texts]
+    
+    def pinyin_memo_stats(self) -> Dict[str, int]:
+        """
+        获取进程内拼音缓存的统计信息
+        
+        Returns:
+            包含命中次数、未命中次数和当前条目数的字典
+        """
+        return {
+            'hits': self.pinyin_memo_hits,
+            'misses': self.pinyin_memo_misses,
+            'size': len(self.pinyin_memo)
+        }
+    
+    def _convert_pinyin(self, text: str) -> str:
+        """调用pypinyin将文本转换为以空格分隔的拼音"""
         pinyin_result = pinyin(text, style=Style.NORMAL, heteronym=False)
         return ' '.join([item[0] for item in pinyin_result])
     
+    def parse_source_data(self,
+                          content: str,
+                          source_type: str,
+                          use_special_space: bool = True,
+                          stats: Dict[str, int] = None) -> List[Tuple[str, Optional[str], Optional[str]]]:
+        """
+        解析源数据，一次性提取颜文字及其编码和描述，供拼音词库、kmj词库和描述索引共用
+        
+        Args:
+            content: 源数据内容
+            source_type: 数据源格式名称（见SOURCE_ADAPTERS），也兼容传入包含格式关键字的文件名
+            use_special_space: 是否使用特殊空格替换普通空格
+            stats: 可选的统计字典，累加读取行数(lines)、生成条目数(entries)、
+                   正则不匹配的行数(rejected)和没有拼音的条目数(without_pinyin)
+            
+        Returns:
+            (颜文字, 编码, 描述) 元组列表：编码为数据源自带的拼音(Temreg、custom_phrase)，
+            描述为数据源中的中文描述(lmeee、sougou)，没有时为None；描述在build_pinyin_entries中才转换为拼音
+        """
+        source_format = source_type if source_type in SOURCE_ADAPTERS else detect_source_format(source_type)
+        if source_format is None:
+            return []
+        
+        # 每个文件只选择一次适配器，逐行循环中不再做格式分派
+        adapter = SOURCE_ADAPTERS[source_format]
+        extract = adapter.extractor
+        entries = []
+        lines = content.splitlines()
+        
+        if adapter.pattern is None:
+            for line in lines:
+                entry = extract(self, line, use_special_space)
+                if entry is not None:
+                    entries.append(entry)
+        else:
+            search = adapter.pattern.search
+            for line in lines:
+                match = search(line)
+                if match:
+                    entry = extract(self, match, use_special_space)
+                    if entry is not None:
+                        entries.append(entry)
+        
+        if stats is not None:
+            # 描述含中英文以外字符的条目没有拼音，不会进入拼音词库
+            without_pinyin = sum(1 for _, code, description in entries if not self.has_pinyin(code, description))
+            for key, value in (('lines', len(lines)), ('entries', len(entries)),
+                               ('rejected', len(lines) - len(entries)), ('without_pinyin', without_pinyin)):
+                stats[key] = stats.get(key, 0) + value
+                
+        return entries
+    
     def process_source_data(self, 
                            content: str, 
                            source_type: str, 
@@ -111,70 +387,122 @@ class KaomojiProcessor:
         Returns:
             包含处理结果的元组 (拼音结果列表, kmj结果列表)
         """
-        output_result_pinyin = []
-        output_result_kmj = []
-        
-        # 根据不同的数据源使用不同的正则表达式
-        pattern = None
-        chinese_english_pattern = None
-        
-        if 'lmeee' in source_type:
-            pattern = r'<p>(.*?)<\/p><span class="copyBtn".*?data-desc="(.*?)".*?data-clipboard-text=".*?">.*?<\/span>'
-            chinese_english_pattern = self.chinese_english_pattern
-        elif 'Temreg' in source_type:
-            pattern = r'^(.*?)\t(.*)\t(.*)$'
-        elif 'A_kaomoji' in source_type:
-            pattern = None
-        elif 'custom_phrase' in source_type:
-            pattern = r'^(.*?)    (.*)$'
-        elif 'sougou' in source_type:
-            pattern = r'<div class="ywz_content">(.*?)<\/div>.*?<div class="ywz_cont_name">输入文字：(.*?)<\/div>'
-            chinese_english_pattern = self.chinese_english_pattern
-        
-        # 按行处理内容
-        lines = content.splitlines()
-        for line in lines:
-            if pattern:
-                match = re.search(pattern, line)
-                if match:
-                    if 'lmeee' in source_type or 'sougou' in source_type:
-                        emoticon = self.process_kaomoji(match.group(1), use_special_space)
-                        chinese_text = match.group(2)
-                        if is_pinyin:
-                            # 去除空格后，检查中文或英文字符是否占据整个字符串
-                            if re.match(chinese_english_pattern, chinese_text.replace(" ", "")):
-                                pinyin_str = self.get_pinyin_for_text(chinese_text)
-                                output_line = f"{emoticon}\t{pinyin_str}\t0\n"
-                                output_result_pinyin.append(output_line)
-                            else:
-                                continue
-                        else:
-                            output_line = f"{emoticon}\tkmj\t0\n"
-                            output_result_kmj.append(output_line)
-                    elif 'Temreg' in source_type:
-                        chinese_text = match.group(2)  # 提取拼音
-                        emoticon = self.process_kaomoji(match.group(1), use_special_space)
-                        if is_pinyin:
-                            output_line = f"{emoticon}\t{chinese_text}\t0\n"
-                            output_result_pinyin.append(output_line)
-                        else:
-                            output_line = f"{emoticon}\tkmj\t0\n"
-                            output_result_kmj.append(output_line)
-                    elif 'custom_phrase' in source_type:
-                        emoticon = self.process_kaomoji(match.group(2), use_special_space)
-                        chinese_text = match.group(1)  # 提取拼音
-                        if is_pinyin:
-                            output_line = f"{emoticon}\t{chinese_text}\t0\n"
-                            output_result_pinyin.append(output_line)
-                        else:
-                            output_line = f"{emoticon}\tkmj\t0\n"
-                            output_result_kmj.append(output_line)
-            elif 'A_kaomoji' in source_type:
-                emoticon = self.process_kaomoji(line.strip(), use_special_space)
-                output_line = f"{emoticon}\tkmj\t0\n"
-                output_result_kmj.append(output_line)
-                
-        return output_result_pinyin, output_result_kmj
+        entries = self.parse_source_data(content, source_type, use_special_space)
+        
+        # A_kaomoji素材无论哪种模式都只输出kmj条目
+        if is_pinyin and 'A_kaomoji' not in source_type:
+            return self.format_pinyin_lines(entries), []
+        return [], self.format_kmj_lines(entries)
+    
+    def build_pinyin_entries(self, entries: List[Tuple[str, Optional[str], Optional[str]]],
+                             source: str = '') -> List[DictEntry]:
+        """
+        将解析结果转换为拼音词库的词条记录
+        
+        数据源自带编码的条目直接使用编码；只含中英文的描述去重后批量转换为拼音；其余条目没有拼音，跳过。
+        
+        Args:
+            entries: parse_source_data返回的 (颜文字, 编码, 描述) 列表
+            source: 词条来源(数据源文件)
+            
+        Returns:
+            词条记录列表
+        """
+        texts = list(dict.fromkeys(
+            description for _, code, description in entries if code is None and self.has_pinyin(code, description)
+        ))
+        pinyin_map = dict(zip(texts, self.get_pinyin_for_texts(texts)))
+        
+        pinyin_entries = []
+        for emoticon, code, description in entries:
+            if code is None:
+                code = pinyin_map.get(description)
+            if code is not None:
+                pinyin_entries.append(DictEntry(emoticon, code, 0, source))
+        return pinyin_entries
+    
+    def build_kmj_entries(self, entries: List[Tuple[str, Optional[str], Optional[str]]],
+                          source: str = '') -> List[DictEntry]:
+        """
+        将解析结果转换为kmj词库的词条记录
+        
+        Args:
+            entries: parse_source_data返回的 (颜文字, 编码, 描述) 列表
+            source: 词条来源(数据源文件)
+            
+        Returns:
+            词条记录列表
+        """
+        return [DictEntry(emoticon, 'kmj', 0, source) for emoticon, _, _ in entries]
+    
+    def format_pinyin_lines(self, entries: List[Tuple[str, Optional[str], Optional[str]]]) -> List[str]:
+        """
+        将解析结果格式化为拼音词库行，跳过没有拼音的条目
+        
+        Args:
+            entries: parse_source_data返回的 (颜文字, 编码, 描述) 列表
+            
+        Returns:
+            拼音词库行列表
+        """
+        return [entry.to_line() for entry in self.build_pinyin_entries(entries)]
+    
+    def format_kmj_lines(self, entries: List[Tuple[str, Optional[str], Optional[str]]]) -> List[str]:
+        """
+        将解析结果格式化为kmj词库行
+        
+        Args:
+            entries: parse_source_data返回的 (颜文字, 编码, 描述) 列表
+            
+        Returns:
+            kmj词库行列表
+        """
+        return [entry.to_line() for entry in self.build_kmj_entries(entries)]
+    
+    def read_source_file(self, input_filename: str, source_format: str = None) -> str:
+        """
+        读取数据源文件并检查声明的数据源格式
+        
+        Args:
+            input_filename: 输入文件名
+            source_format: 数据源格式名称，为None时不检查
+            
+        Returns:
+            文件内容
+            
+        Raises:
+            ValueError: 数据源格式未注册
+        """
+        if source_format is not None and source_format not in SOURCE_ADAPTERS:
+            raise ValueError(f"未知的数据源格式: {source_format}")
+            
+        with open(input_filename, 'r', encoding='utf-8') as file:
+            return file.read()
+    
+    def parse_file(self,
+                   input_filename: str,
+                   use_special_space: bool = True,
+                   source_format: str = None,
+                   stats: Dict[str, int] = None) -> List[Tuple[str, Optional[str], Optional[str]]]:
+        """
+        读取并解析颜文字文件，每个文件只读取和解析一次
+        
+        Args:
+            input_filename: 输入文件名
+            use_special_space: 是否使用特殊空格替换普通空格
+            source_format: 数据源格式名称，为None时根据文件名推断
+            stats: 可选的统计字典，见parse_source_data
+            
+        Returns:
+            (颜文字, 编码, 描述) 元组列表
+            
+        Raises:
+            OSError: 文件无法读取
+            UnicodeDecodeError: 文件不是UTF-8编码
+            ValueError: 数据源格式未注册
+        """
+        content = self.read_source_file(input_filename, source_format)
+        return self.parse_source_data(content, source_format or input_filename, use_special_space, stats)
     
     def process_file(self, 
                     input_filename: str, 
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+颜文字描述检索模块 - 以中文描述的字二元组倒排索引按语义检索颜文字
+
+主要功能：
+1. 将数据源中的(颜文字, 描述)合并为每个颜文字一个文档，为描述中的单字和相邻两字(二元组)建立倒排索引
+2. 写出为紧凑的二进制文件，通过mmap打开，查询时只读取命中的检索词和倒排列表
+3. 按BM25为命中的颜文字打分排序，"开心"能检索到描述为"真开心"、"不开心"的颜文字
+
+检索词规则：单字查询(如"哭")使用单字检索词，两字及以上的查询使用其中所有的二元组，
+描述中的二元组不跨越不同的描述。
+
+索引文件格式(所有整数为小端序uint32)：
+    文件头        8字节标识KMJDESC1，文档数，检索词数，倒排记录数，所有文档长度之和
+    颜文字偏移    文档数+1个偏移，第i个文档的颜文字为字符串区[offset[i], offset[i+1])
+    描述偏移      文档数+1个偏移，描述以"、"连接
+    文档长度      文档数个长度(描述的字数之和)
+    检索词偏移    检索词数+1个偏移，检索词按UTF-8字节序排列
+    倒排起点      检索词数+1个位置，第i个检索词的倒排记录为[start[i], start[i+1])
+    文档编号      倒排记录数个文档编号，每个检索词内按编号递增
+    词频          倒排记录数个词频
+    字符串区      UTF-8编码的颜文字、描述和检索词
+
+使用方法:
+    python kaomoji_search.py INDEX_FILE QUERY [options]
+
+选项:
+    --limit N              最多返回的颜文字数 (默认: 20)
+    --help                 显示帮助信息
+"""
+
+import argparse
+import heapq
+import math
+import mmap
+import os
+import struct
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+from kaomoji_index import normalize_key
+
+# 索引文件标识和文件名
+DESC_INDEX_MAGIC = b'KMJDESC1'
+DESC_INDEX_FILENAME = 'kaomoji_desc_index.bin'
+
+# BM25参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_UINT32 = struct.Struct('<I')
+_HEADER = struct.Struct('<8sIIII')
+
+
+def description_terms(description: str) -> List[str]:
+    """
+    提取描述中的检索词：所有单字和相邻两字的二元组
+
+    Args:
+        description: 中文描述
+
+    Returns:
+        检索词列表(含重复，用于统计词频)
+    """
+    text = normalize_key(description)
+    return list(text) + [text[i:i + 2] for i in range(len(text) - 1)]
+
+
+def query_terms(query: str) -> List[str]:
+    """
+    提取查询的检索词：单字查询为该字，两字及以上为去除重复后的二元组
+
+    Args:
+        query: 查询文本
+
+    Returns:
+        检索词列表
+    """
+    text = normalize_key(query)
+    if len(text) <= 1:
+        return [text] if text else []
+    return list(dict.fromkeys(text[i:i + 2] for i in range(len(text) - 1)))
+
+
+def write_description_index(descriptions: Iterable[Tuple[str, str]], path: str) -> int:
+    """
+    写出描述检索索引
+
+    Args:
+        descriptions: (颜文字, 描述) 元组，同一颜文字的多个描述合并为一个文档
+        path: 索引文件路径
+
+    Returns:
+        写入的文档(颜文字)数
+    """
+    # 按颜文字首次出现的顺序编号，同分时靠前的颜文字排在前面
+    documents: Dict[str, List[str]] = {}
+    for emoticon, description in descriptions:
+        description = description.strip()
+        if not normalize_key(description):
+            continue
+        document = documents.setdefault(emoticon, [])
+        if description not in document:
+            document.append(description)
+
+    postings: Dict[bytes, List[Tuple[int, int]]] = {}
+    doc_lengths = []
+    for doc_id, document in enumerate(documents.values()):
+        term_counts = Counter()
+        for description in document:
+            term_counts.update(description_terms(description))
+        for term, count in term_counts.items():
+            postings.setdefault(term.encode('utf-8'), []).append((doc_id, count))
+        doc_lengths.append(sum(len(normalize_key(description)) for description in document))
+    terms = sorted(postings)
+
+    blob = bytearray()
+    emoticon_offsets = []
+    description_offsets = []
+    for emoticon in documents:
+        emoticon_offsets.append(len(blob))
+        blob += emoticon.encode('utf-8')
+    emoticon_offsets.append(len(blob))
+    for document in documents.values():
+        description_offsets.append(len(blob))
+        blob += '、'.join(document).encode('utf-8')
+    description_offsets.append(len(blob))
+
+    term_offsets = []
+    posting_starts = []
+    posting_docs = []
+    posting_counts = []
+    for term in terms:
+        term_offsets.append(len(blob))
+        posting_starts.append(len(posting_docs))
+        blob += term
+        for doc_id, count in postings[term]:
+            posting_docs.append(doc_id)
+            posting_counts.append(count)
+    term_offsets.append(len(blob))
+    posting_starts.append(len(posting_docs))
+
+    def pack(values: List[int]) -> bytes:
+        return struct.pack(f'<{len(values)}I', *values)
+
+    # 先写临时文件再替换，已通过mmap打开旧索引的进程不会读到写了一半的文件
+    tmp_file = f'{path}.tmp'
+    with open(tmp_file, 'wb') as file:
+        file.write(_HEADER.pack(DESC_INDEX_MAGIC, len(documents), len(terms), len(posting_docs), sum(doc_lengths)))
+        for values in (emoticon_offsets, description_offsets, doc_lengths, term_offsets, posting_starts,
+                       posting_docs, posting_counts):
+            file.write(pack(values))
+        file.write(blob)
+    os.replace(tmp_file, path)
+    return len(documents)
+
+
+class DescriptionIndex:
+    """
+    通过mmap打开的描述检索索引，按BM25为命中的颜文字排序
+    """
+
+    def __init__(self, path: str):
+        """
+        打开描述检索索引
+
+        Args:
+            path: 索引文件路径
+
+        Raises:
+            ValueError: 文件不是描述检索索引
+        """
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, doc_count, term_count, posting_count, total_length = _HEADER.unpack_from(self._mm, 0)
+        if magic != DESC_INDEX_MAGIC:
+            self.close()
+            raise ValueError(f"不是颜文字描述检索索引: {path}")
+        self.doc_count = doc_count
+        self.term_count = term_count
+        self._average_length = total_length / doc_count if doc_count else 0.0
+
+        self._emoticon_offsets = _HEADER.size
+        self._description_offsets = self._emoticon_offsets + (doc_count + 1) * 4
+        self._doc_lengths = self._description_offsets + (doc_count + 1) * 4
+        self._term_offsets = self._doc_lengths + doc_count * 4
+        self._posting_starts = self._term_offsets + (term_count + 1) * 4
+        self._posting_docs = self._posting_starts + (term_count + 1) * 4
+        self._posting_counts = self._posting_docs + posting_count * 4
+        self._blob = self._posting_counts + posting_count * 4
+        # 打分时每条倒排记录都要用到文档长度，打开时一次读出BM25的长度归一化系数(每个文档一个浮点数)
+        self._length_norms = [BM25_K1 * (1 - BM25_B + BM25_B * length / self._average_length)
+                              for length in struct.unpack_from(f'<{doc_count}I', self._mm, self._doc_lengths)]
+
+    def close(self):
+        """关闭索引文件"""
+        if getattr(self, '_mm', None) is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _uint32(self, base: int, index: int) -> int:
+        return _UINT32.unpack_from(self._mm, base + index * 4)[0]
+
+    def _string(self, offsets: int, index: int) -> str:
+        start = self._blob + self._uint32(offsets, index)
+        end = self._blob + self._uint32(offsets, index + 1)
+        return self._mm[start:end].decode('utf-8')
+
+    def _find_term(self, term: bytes) -> int:
+        """二分查找检索词的编号，不存在时返回-1"""
+        start, end = 0, self.term_count
+        while start < end:
+            middle = (start + end) // 2
+            key_start = self._blob + self._uint32(self._term_offsets, middle)
+            key_end = self._blob + self._uint32(self._term_offsets, middle + 1)
+            key = self._mm[key_start:key_end]
+            if key == term:
+                return middle
+            if key < term:
+                start = middle + 1
+            else:
+                end = middle
+        return -1
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, float, str]]:
+        """
+        按描述检索颜文字
+
+        Args:
+            query: 查询文本，如"开心"、"哭"
+            limit: 最多返回的颜文字数
+
+        Returns:
+            (颜文字, 得分, 描述) 列表，按得分从高到低排列，同分时按颜文字在数据源中首次出现的顺序
+        """
+        scores: Dict[int, float] = {}
+        for term in query_terms(query):
+            term_id = self._find_term(term.encode('utf-8'))
+            if term_id < 0:
+                continue
+            start = self._uint32(self._posting_starts, term_id)
+            count = self._uint32(self._posting_starts, term_id + 1) - start
+            doc_ids = struct.unpack_from(f'<{count}I', self._mm, self._posting_docs + start * 4)
+            term_counts = struct.unpack_from(f'<{count}I', self._mm, self._posting_counts + start * 4)
+            idf = math.log(1 + (self.doc_count - count + 0.5) / (count + 0.5))
+            weight = idf * (BM25_K1 + 1)
+            length_norms = self._length_norms
+            for doc_id, term_count in zip(doc_ids, term_counts):
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight * term_count / (term_count + length_norms[doc_id])
+
+        top = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(self._string(self._emoticon_offsets, doc_id), round(score, 4),
+                 self._string(self._description_offsets, doc_id)) for doc_id, score in top]
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='颜文字描述检索工具')
+    parser.add_argument('index_file', help='索引文件路径')
+    parser.add_argument('query', help='查询文本，如开心、哭')
+    parser.add_argument('--limit', type=int, default=20,
+                        help='最多返回的颜文字数 (默认: 20)')
+    args = parser.parse_args()
+
+    with DescriptionIndex(args.index_file) as index:
+        start = time.perf_counter()
+        results = index.search(args.query, args.limit)
+        elapsed = time.perf_counter() - start
+        for emoticon, score, description in results:
+            print(f"{emoticon}\t{score}\t{description}")
+        print(f"共 {len(results)} 个结果，索引共 {index.doc_count} 个颜文字，查询耗时 {elapsed * 1000:.3f} 毫秒")
+
+
+if __name__ == "__main__":
+    main()
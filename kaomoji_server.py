@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+颜文字查询服务 - 常驻进程，通过HTTP或Unix套接字按编码前缀返回候选颜文字
+
+主要功能：
+1. 启动时打开generate_dict.py --index生成的检索索引，按拼音、双拼编码和中文描述前缀查询候选
+2. 定期检查索引文件，生成器写出新的索引后自动重新加载，不需要重启服务
+3. 以有界的LRU缓存保存最近的查询结果，并统计请求延迟、QPS和缓存命中率
+
+使用方法:
+    python kaomoji_server.py [options]
+
+选项:
+    --index-file FILE      检索索引文件 (默认: output/kaomoji_index.bin)
+    --host HOST            监听地址 (默认: 127.0.0.1)
+    --port PORT            监听端口，0为随机端口 (默认: 8765)
+    --unix-socket PATH     监听Unix套接字而不是TCP端口
+    --cache-size N         查询结果LRU缓存的容量，0为不缓存 (默认: 4096)
+    --reload-interval SEC  检查索引文件是否更新的间隔秒数，0为不检查 (默认: 2)
+    --help                 显示帮助信息
+
+接口:
+    GET /lookup?q=kaix&kind=pinyin&limit=10   按前缀查询候选，kind和limit可省略
+    GET /metrics                              请求数、QPS、延迟分位数、缓存和索引信息
+    GET /health                               服务状态
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import stat
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from kaomoji_index import INDEX_FILENAME, KaomojiIndex, normalize_key
+
+# 单次查询最多返回的候选数
+MAX_LIMIT = 200
+DEFAULT_LIMIT = 20
+
+# 计算延迟分位数时保留的最近请求数，以及计算最近QPS的时间窗口(秒)
+_LATENCY_SAMPLES = 10000
+_RECENT_WINDOW = 60.0
+
+_STATUS_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                   503: 'Service Unavailable'}
+
+
+def parse_arguments():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='颜文字查询服务')
+    parser.add_argument('--index-file', type=str, default=os.path.join('output', INDEX_FILENAME),
+                        help=f'检索索引文件 (默认: output/{INDEX_FILENAME})')
+    parser.add_argument('--host', type=str, default='127.0.0.1',
+                        help='监听地址 (默认: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765,
+                        help='监听端口，0为随机端口 (默认: 8765)')
+    parser.add_argument('--unix-socket', type=str, default=None,
+                        help='监听Unix套接字而不是TCP端口')
+    parser.add_argument('--cache-size', type=int, default=4096,
+                        help='查询结果LRU缓存的容量，0为不缓存 (默认: 4096)')
+    parser.add_argument('--reload-interval', type=float, default=2.0,
+                        help='检查索引文件是否更新的间隔秒数，0为不检查 (默认: 2)')
+    args = parser.parse_args()
+    if args.cache_size < 0:
+        parser.error('--cache-size 不能小于0')
+    return args
+
+
+class LRUCache:
+    """
+    有界的最近最少使用缓存，容量为0时不保存任何结果
+    """
+
+    def __init__(self, capacity: int):
+        """
+        初始化缓存
+
+        Args:
+            capacity: 最多保存的结果数
+        """
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._items: 'OrderedDict[Hashable, Any]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        读取缓存的结果，命中时将其移到最近使用的位置
+
+        Returns:
+            缓存的结果，未命中时返回None
+        """
+        if key in self._items:
+            self._items.move_to_end(key)
+            self.hits += 1
+            return self._items[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: Hashable, value: Any):
+        """保存结果，超出容量时淘汰最久未使用的结果"""
+        if self.capacity <= 0:
+            return
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.capacity:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        """清空缓存，命中统计保留"""
+        self._items.clear()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """导出缓存统计"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._items),
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    """从已排序的数值中取分位数(最近秩法)"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+class ServerMetrics:
+    """
+    查询服务的请求指标
+
+    延迟为服务端处理请求的耗时(解析请求到生成响应)，不含网络传输；
+    分位数和最近QPS基于最近的_LATENCY_SAMPLES个请求计算。
+    """
+
+    def __init__(self):
+        """初始化请求指标"""
+        self.started = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self._samples: deque = deque(maxlen=_LATENCY_SAMPLES)
+
+    def record(self, latency: float, status: int):
+        """
+        记录一个请求
+
+        Args:
+            latency: 处理耗时秒数
+            status: HTTP状态码
+        """
+        self.requests += 1
+        if status >= 400:
+            self.errors += 1
+        self._samples.append((time.monotonic(), latency))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """导出请求数、QPS和延迟分位数"""
+        now = time.monotonic()
+        uptime = now - self.started
+        window_start = now - _RECENT_WINDOW
+        recent = [timestamp for timestamp, _ in self._samples if timestamp >= window_start]
+        if recent and len(self._samples) == self._samples.maxlen and self._samples[0][0] >= window_start:
+            # 样本数达到上限时时间窗口内较早的请求已被丢弃，按保留的样本覆盖的时间计算
+            recent_span = now - self._samples[0][0]
+        else:
+            recent_span = min(_RECENT_WINDOW, uptime)
+        latencies = sorted(latency for _, latency in self._samples)
+        return {
+            'uptime_s': round(uptime, 3),
+            'requests': self.requests,
+            'errors': self.errors,
+            'qps': round(self.requests / uptime, 2) if uptime > 0 else 0.0,
+            'recent_qps': round(len(recent) / recent_span, 2) if recent_span > 0 else 0.0,
+            'latency_ms': {
+                'p50': round(_percentile(latencies, 0.50) * 1000, 4),
+                'p95': round(_percentile(latencies, 0.95) * 1000, 4),
+                'p99': round(_percentile(latencies, 0.99) * 1000, 4),
+                'max': round(latencies[-1] * 1000, 4) if latencies else 0.0
+            }
+        }
+
+
+class KaomojiLookupService:
+    """
+    颜文字查询服务
+
+    所有请求都在事件循环线程中处理：索引查询是mmap上的二分查找，单次耗时远小于1毫秒，
+    不需要再交给线程池。重新加载索引时直接替换并关闭旧索引，不会与查询同时发生。
+    """
+
+    def __init__(self, index_file: str, cache_size: int = 4096):
+        """
+        初始化查询服务，索引文件尚不存在时在其生成后加载
+
+        Args:
+            index_file: 检索索引文件路径
+            cache_size: 查询结果LRU缓存的容量
+        """
+        self.index_file = index_file
+        self.index: Optional[KaomojiIndex] = None
+        self.cache = LRUCache(cache_size)
+        self.metrics = ServerMetrics()
+        self.reloads = 0
+        self.loaded_at: Optional[float] = None
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self.reload_if_changed()
+
+    def _file_signature(self) -> Optional[Tuple[int, int, int]]:
+        """索引文件的inode、修改时间和大小，文件不存在时返回None"""
+        try:
+            file_stat = os.stat(self.index_file)
+        except FileNotFoundError:
+            return None
+        return file_stat.st_ino, file_stat.st_mtime_ns, file_stat.st_size
+
+    def reload_if_changed(self) -> bool:
+        """
+        索引文件有变化时重新加载索引并清空缓存
+
+        生成器通过替换文件写出新索引，已打开的旧索引在关闭前仍然可以安全读取；
+        新索引无法打开时继续使用旧索引。
+
+        Returns:
+            是否重新加载了索引
+        """
+        signature = self._file_signature()
+        if signature is None or signature == self._signature:
+            return False
+        try:
+            index = KaomojiIndex(self.index_file)
+        except (OSError, ValueError) as e:
+            print(f"警告: 无法加载检索索引 {self.index_file}: {e}")
+            return False
+
+        old_index, self.index = self.index, index
+        if old_index is not None:
+            old_index.close()
+            self.reloads += 1
+        self._signature = signature
+        self.loaded_at = time.time()
+        self.cache.clear()
+        print(f"已加载检索索引: {self.index_file}，共 {index.record_count} 条记录，类别: {', '.join(index.kinds)}")
+        return True
+
+    def lookup(self, query: str, kind: Optional[str] = None, limit: int = DEFAULT_LIMIT) -> Tuple[List[str], bool]:
+        """
+        按前缀查询候选颜文字
+
+        Args:
+            query: 查询的前缀
+            kind: 只检索指定类别，为None时检索所有类别
+            limit: 最多返回的颜文字数
+
+        Returns:
+            (候选颜文字列表, 是否命中缓存)
+
+        Raises:
+            KeyError: 索引中没有指定的类别
+        """
+        key = (normalize_key(query), kind, limit)
+        candidates = self.cache.get(key)
+        if candidates is not None:
+            return candidates, True
+        candidates = self.index.prefix(query, kind, limit)
+        self.cache.put(key, candidates)
+        return candidates, False
+
+    def index_info(self) -> Dict[str, Any]:
+        """导出当前索引的信息"""
+        info = {'path': self.index_file, 'loaded': self.index is not None, 'reloads': self.reloads}
+        if self.index is not None:
+            info.update({
+                'records': self.index.record_count,
+                'emoticons': self.index.emoticon_count,
+                'kinds': list(self.index.kinds),
+                'loaded_at': round(self.loaded_at, 3)
+            })
+        return info
+
+    def handle(self, method: str, target: str) -> Tuple[int, Dict[str, Any]]:
+        """
+        处理一个请求
+
+        Args:
+            method: HTTP方法
+            target: 请求路径和查询参数
+
+        Returns:
+            (HTTP状态码, 响应对象)
+        """
+        if method not in ('GET', 'HEAD'):
+            return 405, {'error': f'不支持的方法: {method}'}
+        url = urlsplit(target)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+
+        if url.path == '/health':
+            return 200, {'status': 'ok' if self.index is not None else 'waiting', 'index_loaded': self.index is not None}
+        if url.path == '/metrics':
+            return 200, dict(self.metrics.to_dict(), cache=self.cache.to_dict(), index=self.index_info())
+        if url.path != '/lookup':
+            return 404, {'error': f'未知的路径: {url.path}'}
+
+        query = params.get('q', '')
+        if not normalize_key(query):
+            return 400, {'error': '缺少查询参数q'}
+        try:
+            limit = int(params.get('limit', DEFAULT_LIMIT))
+        except ValueError:
+            return 400, {'error': f"limit不是整数: {params['limit']}"}
+        if not 1 <= limit <= MAX_LIMIT:
+            return 400, {'error': f'limit需要在1到{MAX_LIMIT}之间'}
+        if self.index is None:
+            return 503, {'error': f'检索索引尚未生成: {self.index_file}'}
+
+        kind = params.get('kind') or None
+        try:
+            candidates, cached = self.lookup(query, kind, limit)
+        except KeyError:
+            return 400, {'error': f'索引中没有类别: {kind}', 'kinds': list(self.index.kinds)}
+        return 200, {'query': query, 'kind': kind, 'candidates': candidates, 'cached': cached}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """处理一个HTTP连接，支持HTTP/1.1持久连接"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                # 查询接口不使用请求体，读取后丢弃以便继续处理下一个请求
+                content_length = headers.get('content-length', '0')
+                if content_length.isdigit() and int(content_length) > 0:
+                    await reader.readexactly(int(content_length))
+
+                start = time.perf_counter()
+                parts = request_line.decode('latin-1').split()
+                if len(parts) == 3:
+                    method, target, version = parts
+                    status, body = self.handle(method, target)
+                else:
+                    method, version = 'GET', 'HTTP/1.0'
+                    status, body = 400, {'error': '无法解析的请求行'}
+                payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.metrics.record(time.perf_counter() - start, status)
+
+                connection = headers.get('connection', '').lower()
+                keep_alive = (connection == 'keep-alive' if version == 'HTTP/1.0' else connection != 'close')
+                keep_alive = keep_alive and status != 400
+                head = (f"HTTP/1.1 {status} {_STATUS_REASONS[status]}\r\n"
+                        f"Content-Type: application/json; charset=utf-8\r\n"
+                        f"Content-Length: {len(payload)}\r\n"
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+                writer.write(head.encode('latin-1') + (payload if method != 'HEAD' else b''))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            # 客户端断开或请求行超出StreamReader的长度限制
+            pass
+        finally:
+            writer.close()
+
+    async def watch(self, interval: float):
+        """
+        定期检查索引文件，有变化时重新加载
+
+        Args:
+            interval: 检查间隔秒数
+        """
+        while True:
+            await asyncio.sleep(interval)
+            self.reload_if_changed()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8765, unix_socket: Optional[str] = None,
+                    reload_interval: float = 2.0):
+        """
+        启动服务并运行到收到停止信号
+
+        Args:
+            host: 监听地址
+            port: 监听端口
+            unix_socket: Unix套接字路径，指定时不监听TCP端口
+            reload_interval: 检查索引文件的间隔秒数，0为不检查
+        """
+        if unix_socket:
+            # 清理上次异常退出遗留的套接字文件，不删除其他类型的文件
+            if os.path.exists(unix_socket) and stat.S_ISSOCK(os.stat(unix_socket).st_mode):
+                os.remove(unix_socket)
+            server = await asyncio.start_unix_server(self.handle_connection, path=unix_socket)
+            address = f'unix:{unix_socket}'
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            address = f'http://{host}:{server.sockets[0].getsockname()[1]}'
+        if self.index is None:
+            print(f"检索索引尚未生成: {self.index_file}，生成后自动加载")
+
+        # 收到SIGINT或SIGTERM时停止接受连接并退出(Windows的事件循环不支持信号处理，仍由KeyboardInterrupt退出)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signal_number, stop.set)
+            except NotImplementedError:
+                pass
+
+        watcher = asyncio.create_task(self.watch(reload_interval)) if reload_interval > 0 else None
+        print(f"颜文字查询服务已启动: {address}")
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            if unix_socket and os.path.exists(unix_socket):
+                os.remove(unix_socket)
+
+    def close(self):
+        """关闭索引"""
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+
+
+def main():
+    """主函数"""
+    args = parse_arguments()
+    service = KaomojiLookupService(args.index_file, args.cache_size)
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.unix_socket, args.reload_interval))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+    print("颜文字查询服务已停止")
+
+
+if __name__ == "__main__":
+    main()
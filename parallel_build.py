@@ -0,0 +1,144 @@
+"""
+并行构建模块 - 在进程池中执行互相独立的生成任务
+
+主要功能：
+1. 根据--jobs选项创建进程池，jobs为1时不创建进程池，保持串行执行
+2. 将大输入按行范围切分为多个分块，结果按分块顺序合并，保证输出确定
+3. 为工作进程提供只读的构建缓存，新增的缓存条目由主进程统一写回
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
+
+import pychaifen
+from build_cache import BuildCache
+from kaomoji_processor import KaomojiProcessor
+
+# 每个分块的默认行数，小于该行数的输入不切分
+DEFAULT_CHUNK_SIZE = 2000
+
+# 工作进程内的只读构建缓存(按缓存路径)和颜文字处理器，在进程内复用
+_worker_caches: Dict[str, BuildCache] = {}
+_worker_processor: Optional[KaomojiProcessor] = None
+
+
+def resolve_jobs(jobs: int) -> int:
+    """
+    解析并行任务数
+
+    Args:
+        jobs: --jobs选项的值，0表示使用全部CPU核心
+
+    Returns:
+        实际使用的进程数，至少为1
+    """
+    if jobs is None or jobs < 0:
+        return 1
+    if jobs == 0:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def create_executor(jobs: int) -> Optional[Executor]:
+    """
+    创建进程池
+
+    以fork方式创建工作进程时，先在主进程中加载HMM模型，工作进程直接共用已加载的模型，
+    不需要各自再读取模型快照；spawn方式的工作进程仍在第一次使用时各自加载。
+
+    Args:
+        jobs: 进程数，0表示使用全部CPU核心
+
+    Returns:
+        进程池，进程数为1时返回None，调用方直接串行执行
+    """
+    workers = resolve_jobs(jobs)
+    if workers <= 1:
+        return None
+    if multiprocessing.get_start_method() == 'fork':
+        pychaifen.get_hmm_params()
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+def split_chunks(items: Sequence, chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[Sequence]:
+    """
+    按范围将序列切分为分块
+
+    Args:
+        items: 需要切分的序列
+        chunk_size: 每个分块的长度
+
+    Returns:
+        分块列表，按原顺序排列
+    """
+    chunk_size = max(1, chunk_size)
+    return [items[start:start + chunk_size] for start in range(0, len(items), chunk_size)] or [items[:0]]
+
+
+def get_worker_cache(cache_path: Optional[str]) -> Optional[BuildCache]:
+    """
+    获取工作进程内的只读构建缓存
+
+    Args:
+        cache_path: 构建缓存路径，为None时不使用缓存
+
+    Returns:
+        只读的构建缓存
+    """
+    if cache_path is None:
+        return None
+    cache = _worker_caches.get(cache_path)
+    if cache is None:
+        cache = _worker_caches[cache_path] = BuildCache(cache_path, readonly=True)
+    return cache
+
+
+def get_worker_processor() -> KaomojiProcessor:
+    """
+    获取工作进程内的颜文字处理器，进程内的多个解析任务共用
+
+    Returns:
+        颜文字处理器
+    """
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = KaomojiProcessor()
+    return _worker_processor
+
+
+def take_worker_cache_updates(cache: Optional[BuildCache]) -> Optional[Dict]:
+    """取出工作进程缓存中新增和命中的条目，随任务结果返回主进程"""
+    return cache.take_updates() if cache is not None else None
+
+
+def run_ordered(executor: Optional[Executor], func: Callable, tasks: Sequence[tuple],
+                cache: Optional[BuildCache] = None) -> List:
+    """
+    执行一组任务并按提交顺序返回结果
+
+    任务函数返回 (结果, 缓存更新) 元组，缓存更新由主进程合并到cache中。
+    executor为None时在当前进程中依次执行。
+
+    Args:
+        executor: 进程池
+        func: 模块级的任务函数
+        tasks: 每个任务的参数元组
+        cache: 主进程的构建缓存
+
+    Returns:
+        与tasks一一对应的结果列表
+    """
+    if executor is None:
+        outcomes = [func(*task) for task in tasks]
+    else:
+        futures = [executor.submit(func, *task) for task in tasks]
+        outcomes = [future.result() for future in futures]
+
+    results = []
+    for result, updates in outcomes:
+        if cache is not None and updates:
+            cache.merge_updates(updates)
+        results.append(result)
+    return results
@@ -1,9 +1,116 @@
 # 参考 py之拼音拆分 ：https://www.jianshu.com/p/35215c6e2b8b
 
+import hashlib
+import os
+import pickle
+import sys
+import threading
+
 from Pinyin2Hanzi import DefaultHmmParams
 from Pinyin2Hanzi import viterbi
+from Pinyin2Hanzi import simplify_pinyin
+from pyshuangpin import PINYIN_SYLLABLES
+
+# HMM模型在第一次使用时才加载，进程内所有调用方共用同一份
+_hmmparams = None
+_hmmparams_lock = threading.Lock()
+
+# HMM模型快照目录，可通过环境变量 PYCHAIFEN_CACHE_DIR 指定
+HMM_SNAPSHOT_DIR = os.environ.get('PYCHAIFEN_CACHE_DIR',
+                                  os.path.join(os.path.expanduser('~'), '.cache', 'pychaifen'))
+
+_HMM_TABLES = ('py2hz_dict', 'start_dict', 'emission_dict', 'transition_dict')
+_HMM_FILES = ('hmm_py2hz.json', 'hmm_start.json', 'hmm_emission.json', 'hmm_transition.json')
+
+# 音节前缀树的结束标记
+_END = ''
+
+# 零声母音节的首字母
+_ZERO_INITIAL_LETTERS = frozenset('aoe')
+
+# 连写时零声母音节前面的音节需以元音或鼻音(n、ng)结尾，如 tian'an、xian'er
+_ZERO_INITIAL_AFTER = frozenset('aeiouvng')
+
+# 参与打分的候选切分数量上限，避免病态输入导致候选数爆炸
+MAX_SEGMENT_CANDIDATES = 16
 
-hmmparams = DefaultHmmParams()
+
+def _build_syllable_trie(syllables):
+    """构建音节前缀树，节点为 字符->子节点 的字典，_END 键表示到此为一个完整音节"""
+    trie = {}
+    for syllable in syllables:
+        node = trie
+        for char in syllable:
+            node = node.setdefault(char, {})
+        node[_END] = True
+    return trie
+
+
+_SYLLABLE_TRIE = _build_syllable_trie(PINYIN_SYLLABLES)
+
+
+def _hmm_snapshot_path():
+    """根据 Pinyin2Hanzi 模型文件的大小和修改时间生成快照路径，模型文件变化后旧快照自动失效"""
+    data_dir = os.path.join(os.path.dirname(sys.modules[DefaultHmmParams.__module__].__file__), 'data')
+    digest = hashlib.sha1()
+    for filename in _HMM_FILES:
+        stat = os.stat(os.path.join(data_dir, filename))
+        digest.update(f'{filename}:{stat.st_size}:{stat.st_mtime_ns};'.encode('utf-8'))
+    return os.path.join(HMM_SNAPSHOT_DIR, f'hmm_params-{digest.hexdigest()[:16]}.pickle')
+
+
+def _load_hmm_params():
+    """
+    加载HMM模型：优先读取pickle快照，没有快照时解析 Pinyin2Hanzi 的JSON并写入快照
+    """
+    try:
+        snapshot_path = _hmm_snapshot_path()
+    except OSError:
+        return DefaultHmmParams()
+        
+    try:
+        with open(snapshot_path, 'rb') as file:
+            tables = pickle.load(file)
+        params = DefaultHmmParams.__new__(DefaultHmmParams)
+        for name in _HMM_TABLES:
+            setattr(params, name, tables[name])
+        return params
+    except (OSError, pickle.UnpicklingError, EOFError, KeyError):
+        pass
+        
+    params = DefaultHmmParams()
+    try:
+        os.makedirs(HMM_SNAPSHOT_DIR, exist_ok=True)
+        tmp_path = f'{snapshot_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            pickle.dump({name: getattr(params, name) for name in _HMM_TABLES}, file,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, snapshot_path)
+    except OSError:
+        # 快照只是加速手段，写入失败不影响使用
+        pass
+    return params
+
+
+def get_hmm_params():
+    """
+    获取进程内共享的HMM模型，第一次调用时加载
+    
+    在创建子进程前调用一次，fork出的工作进程即可直接共用已加载的模型
+    """
+    global _hmmparams
+    if _hmmparams is None:
+        with _hmmparams_lock:
+            if _hmmparams is None:
+                _hmmparams = _load_hmm_params()
+    return _hmmparams
+
+
+def __getattr__(name):
+    # 兼容旧代码直接访问 pychaifen.hmmparams
+    if name == 'hmmparams':
+        return get_hmm_params()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def sm(strs):
@@ -50,8 +157,84 @@ def onep(strs):
     return restr.split(' ')
 
 
+def _viterbi_score(syllablelist):
+    """用 Pinyin2Hanzi 的HMM模型为一种音节切分打分，无法识别时返回负无穷"""
+    try:
+        result = viterbi(hmm_params=get_hmm_params(), observations=[simplify_pinyin(s) for s in syllablelist],
+                         path_num=1, log=True)
+    except Exception:
+        return float('-inf')
+    return result[0].score if result else float('-inf')
+
+
+def segment_pinyin(quanpin):
+    """
+    将连写的全拼切分为音节列表
+    
+    从左到右单遍扫描，用音节前缀树找出每个位置可达的音节，
+    动态规划求出音节数最少的切分；音节数最少的切分不止一种时，才调用 viterbi 打分选出最可能的一种
+    (pingan 可切为 ping/an 或 pin/gan，由 viterbi 选出 ping/an)。
+    
+    以a、o、e开头的零声母音节可以出现在开头，或跟在以元音、n、ng结尾的音节之后
+    (tiananmen 切为 tian/an/men)。单独的a、o、e多为语气词，只在整个字符串就是该音节时才使用，
+    因此 emo、oye、bingo、mua 等英文单词或拟声词不会被拼凑成拼音，返回原文。
+    
+    Args:
+        quanpin: 全拼字符串
+        
+    Returns:
+        音节列表，无法完整切分时返回只包含原字符串的列表
+    """
+    text = quanpin.lower()
+    n = len(text)
+    if n == 0:
+        return [quanpin]
+        
+    # best[i]: 切分 text[:i] 所需的最少音节数；prev[i]: 达到最少音节数的所有上一个切分点
+    best = [0] + [None] * n
+    prev = [[] for _ in range(n + 1)]
+    for start in range(n):
+        if best[start] is None:
+            continue
+        if start > 0 and text[start] in _ZERO_INITIAL_LETTERS and text[start - 1] not in _ZERO_INITIAL_AFTER:
+            continue
+        count = best[start] + 1
+        node = _SYLLABLE_TRIE
+        for end in range(start, n):
+            node = node.get(text[end])
+            if node is None:
+                break
+            if _END in node:
+                stop = end + 1
+                if stop - start == 1 and n > 1 and text[start] in _ZERO_INITIAL_LETTERS:
+                    continue
+                if best[stop] is None or count < best[stop]:
+                    best[stop] = count
+                    prev[stop] = [start]
+                elif count == best[stop]:
+                    prev[stop].append(start)
+                    
+    if best[n] is None:
+        return [quanpin]
+        
+    # 回溯出所有最少音节数的切分(数量有上限)
+    candidates = []
+    stack = [(n, [])]
+    while stack and len(candidates) < MAX_SEGMENT_CANDIDATES:
+        stop, tail = stack.pop()
+        if stop == 0:
+            candidates.append(tail)
+            continue
+        for start in reversed(prev[stop]):
+            stack.append((start, [text[start:stop]] + tail))
+            
+    if len(candidates) == 1:
+        return candidates[0]
+    return max(candidates, key=_viterbi_score)
+
+
 def quanp2shuangp(quanpin):
-    syllablelist = onep(sm(quanpin))
+    syllablelist = segment_pinyin(quanpin)
     return syllablelist
 
 
@@ -59,7 +242,7 @@ def py2hz(syllablelist):
     """
     用 Pinyin2Hanzi 库将音节列表识别为汉语词组，汉字可辅助校验全拼音节划分是否正确
     """
-    result = viterbi(hmm_params=hmmparams, observations=(syllablelist), path_num=1, log=True)
+    result = viterbi(hmm_params=get_hmm_params(), observations=(syllablelist), path_num=1, log=True)
     for item in result:
         phrase = ''.join(item.path)
         # print(phrase)
@@ -1,59 +1,169 @@
 from pyshuangpin.scheme import Scheme, xiaohe, ziranma, sogou, microsoft, znabc
 
 import pypinyin
+from Pinyin2Hanzi import all_pinyin
 
+# 各双拼方案的 全拼片段->双拼键位 映射
+SCHEME_DICTS = {
+    Scheme.Xiaohe: xiaohe.scheme,
+    Scheme.Ziranma: ziranma.scheme,
+    Scheme.Sogou: sogou.scheme,
+    Scheme.Microsoft: microsoft.scheme,
+    Scheme.ZNABC: znabc.scheme,
+}
 
-def shuangpin(hans, scheme: Scheme, **kwargs):
-    pinyin = pypinyin.pinyin(hans, **kwargs)
-    if scheme == Scheme.Xiaohe:
-        scheme_dict = xiaohe.scheme
-    elif scheme == Scheme.Ziranma:
-        scheme_dict = ziranma.scheme
-    elif scheme == Scheme.Sogou:
-        scheme_dict = sogou.scheme
-    elif scheme == Scheme.Microsoft:
-        scheme_dict = microsoft.scheme
-    elif scheme == Scheme.ZNABC:
-        scheme_dict = znabc.scheme
-    else:
+# 各双拼方案零声母音节的完整编码
+ZERO_INITIAL_DICTS = {
+    Scheme.Xiaohe: xiaohe.zero_initial,
+    Scheme.Ziranma: ziranma.zero_initial,
+    Scheme.Sogou: sogou.zero_initial,
+    Scheme.Microsoft: microsoft.zero_initial,
+    Scheme.ZNABC: znabc.zero_initial,
+}
+
+# 已知正确的双拼编码，用于校验查找表
+KNOWN_CODES = {
+    Scheme.Xiaohe: {'a': 'aa', 'ai': 'ai', 'ang': 'ah', 'ao': 'ao', 'ou': 'ou', 'er': 'er',
+                    'chen': 'if', 'cang': 'ch', 'jue': 'jt', 'lve': 'lt'},
+    Scheme.Ziranma: {'a': 'aa', 'ai': 'ai', 'ang': 'ah', 'e': 'ee', 'shuang': 'ud', 'jue': 'jt'},
+    Scheme.Sogou: {'a': 'oa', 'ai': 'ol', 'ang': 'oh', 'er': 'or', 'ying': 'y;', 'jue': 'jt'},
+    Scheme.Microsoft: {'a': 'oa', 'ai': 'ol', 'ang': 'oh', 'er': 'or', 'ou': 'ob', 'jue': 'jv', 'lve': 'lv'},
+    Scheme.ZNABC: {'a': 'oa', 'ai': 'ol', 'ei': 'oq', 'zhang': 'ah', 'jue': 'jm'},
+}
+
+# 声母，zh/ch/sh 需排在单字母声母之前匹配
+_INITIALS = ('zh', 'ch', 'sh') + tuple('bpmfdtnlgkhjqxrzcsyw')
+
+# 合法拼音音节表，额外收录 jue/que/xue/yue/lue/nue 等写法(Pinyin2Hanzi内部写作 ve)
+PINYIN_SYLLABLES = frozenset(
+    [py for py in all_pinyin() if py != 'null'] +
+    [py.replace('ve', 'ue') for py in all_pinyin() if py.endswith('ve')]
+)
+
+
+def _get_scheme_dict(scheme: Scheme):
+    scheme_dict = SCHEME_DICTS.get(scheme)
+    if scheme_dict is None:
         raise NotImplementedError('scheme not implemented')
+    return scheme_dict
 
+
+def _replace_by_scheme(text, scheme_dict):
+    """
+    按方案字典顺序逐个替换片段，即查表前的转换方式，结果依赖字典顺序
+    """
     for key, value in scheme_dict.items():
-        for item in pinyin:
-            for index in range(len(item)):
-                item[index] = item[index].replace(key, value)
+        text = text.replace(key, value)
+    return text
+
+
+def split_syllable(syllable):
+    """
+    将音节拆分为声母和韵母，零声母音节的声母为空字符串
+    """
+    for initial in _INITIALS:
+        if syllable.startswith(initial) and len(syllable) > len(initial):
+            return initial, syllable[len(initial):]
+    return '', syllable
+
+
+def convert_syllable(syllable, scheme_dict, zero_initial=None):
+    """
+    按 声母键位+韵母键位 转换单个音节，方案中没有的声母或韵母保留原样
+
+    零声母音节(如ai、ang)按方案的零声母规则整体转换；韵母写作ue而方案只有ve键位时(如微软双拼)，
+    按ve查找键位
+    """
+    initial, final = split_syllable(syllable)
+    if not initial and zero_initial and final in zero_initial:
+        return zero_initial[final]
+    if final == 'ue' and final not in scheme_dict:
+        final = 've'
+    return scheme_dict.get(initial, initial) + scheme_dict.get(final, final)
+
+
+def build_shuangpin_table(scheme: Scheme):
+    """
+    为指定方案生成 音节->双拼编码 的完整查找表
+    """
+    scheme_dict = _get_scheme_dict(scheme)
+    zero_initial = ZERO_INITIAL_DICTS[scheme]
+    return {syllable: convert_syllable(syllable, scheme_dict, zero_initial) for syllable in PINYIN_SYLLABLES}
+
+
+# 导入时为所有内置方案预先生成查找表，转换单个音节只需一次字典查找
+SHUANGPIN_TABLES = {scheme: build_shuangpin_table(scheme) for scheme in SCHEME_DICTS}
+
+
+def _lookup(item, scheme: Scheme):
+    """
+    查表转换单个拼音，查不到(如带声调或非拼音文本)时退回逐片段替换
+    """
+    code = SHUANGPIN_TABLES[scheme].get(item)
+    if code is None:
+        code = _replace_by_scheme(item, SCHEME_DICTS[scheme])
+    return code
+
+
+def shuangpin(hans, scheme: Scheme, **kwargs):
+    _get_scheme_dict(scheme)
+    pinyin = pypinyin.pinyin(hans, **kwargs)
+
+    for item in pinyin:
+        for index in range(len(item)):
+            item[index] = _lookup(item[index], scheme)
 
     return pinyin
+
+
 def shuangpin_by_syllabl(syllablelist, scheme: Scheme, **kwargs):
 
     """
     使用全拼音节列表导出双拼编码
     """
-    def l2ll(l):
-        ll = []
-        for index in range(len(l)):
-            ll.append([l[index]])
-        # print(ll)
-        return ll
-
-    pinyin=l2ll(syllablelist)
-
-    if scheme == Scheme.Xiaohe:
-        scheme_dict = xiaohe.scheme
-    elif scheme == Scheme.Ziranma:
-        scheme_dict = ziranma.scheme
-    elif scheme == Scheme.Sogou:
-        scheme_dict = sogou.scheme
-    elif scheme == Scheme.Microsoft:
-        scheme_dict = microsoft.scheme
-    elif scheme == Scheme.ZNABC:
-        scheme_dict = znabc.scheme
-    else:
-        raise NotImplementedError('scheme not implemented')
+    _get_scheme_dict(scheme)
+    return [[_lookup(syllable, scheme)] for syllable in syllablelist]
 
-    for key, value in scheme_dict.items():
-        for item in pinyin:
-            for index in range(len(item)):
-                item[index] = item[index].replace(key, value)
 
-    return pinyin
+def verify_tables(schemes=None):
+    """
+    校验查找表：每个音节的编码都必须是两个键位，已知的编码(含零声母音节)必须与KNOWN_CODES一致
+
+    Args:
+        schemes: 需要校验的方案列表，默认校验所有内置方案
+
+    Returns:
+        错误条目列表，每项为 (方案, 音节, 查表结果, 期望结果)，编码长度错误时期望结果为None
+    """
+    errors = []
+    for scheme in schemes or SCHEME_DICTS:
+        _get_scheme_dict(scheme)
+        table = SHUANGPIN_TABLES[scheme]
+        for syllable in sorted(PINYIN_SYLLABLES):
+            if len(table[syllable]) != 2:
+                errors.append((scheme, syllable, table[syllable], None))
+        for syllable, expected in sorted(KNOWN_CODES.get(scheme, {}).items()):
+            if table.get(syllable) != expected:
+                errors.append((scheme, syllable, table.get(syllable), expected))
+    return errors
+
+
+def diff_tables(schemes=None):
+    """
+    列出查找表与逐片段替换方式(查表前的转换方式)结果不同的音节，用于确认差异都是有意的修正
+
+    Args:
+        schemes: 需要比较的方案列表，默认比较所有内置方案
+
+    Returns:
+        不同条目列表，每项为 (方案, 音节, 查表结果, 替换结果)
+    """
+    differences = []
+    for scheme in schemes or SCHEME_DICTS:
+        scheme_dict = _get_scheme_dict(scheme)
+        table = SHUANGPIN_TABLES[scheme]
+        for syllable in sorted(PINYIN_SYLLABLES):
+            replaced = _replace_by_scheme(syllable, scheme_dict)
+            if table[syllable] != replaced:
+                differences.append((scheme, syllable, table[syllable], replaced))
+    return differences
@@ -0,0 +1,53 @@
+"""
+双拼查找表校验工具
+
+使用方法:
+    python -m pyshuangpin [--scheme {xiaohe,ziranma,sogou,microsoft,znabc}] [--diff]
+
+列出查找表中编码不是两个键位或与已知编码不一致的音节；
+指定--diff时列出查表结果与逐片段替换方式结果不同的音节。
+"""
+
+import argparse
+import sys
+
+from pyshuangpin import Scheme, diff_tables, verify_tables
+
+
+def main():
+    """主函数"""
+    scheme_map = {
+        'xiaohe': Scheme.小鹤,
+        'ziranma': Scheme.自然码,
+        'sogou': Scheme.搜狗,
+        'microsoft': Scheme.微软,
+        'znabc': Scheme.智能ABC
+    }
+    parser = argparse.ArgumentParser(description='双拼查找表校验工具')
+    parser.add_argument('--scheme', type=str, choices=list(scheme_map),
+                        help='只校验指定的双拼方案 (默认: 全部)')
+    parser.add_argument('--diff', action='store_true',
+                        help='列出查表结果与逐片段替换方式结果不同的音节')
+    args = parser.parse_args()
+
+    schemes = [scheme_map[args.scheme]] if args.scheme else None
+    if args.diff:
+        differences = diff_tables(schemes)
+        for scheme, syllable, table_code, replaced in differences:
+            print(f"{scheme.name}\t{syllable}\t查表: {table_code}\t替换: {replaced}")
+        print(f"共 {len(differences)} 个音节的查表结果与替换结果不同")
+        return
+
+    errors = verify_tables(schemes)
+    for scheme, syllable, table_code, expected in errors:
+        if expected is None:
+            print(f"{scheme.name}\t{syllable}\t查表: {table_code}\t编码不是两个键位")
+        else:
+            print(f"{scheme.name}\t{syllable}\t查表: {table_code}\t期望: {expected}")
+    print(f"共 {len(errors)} 个音节的查表结果有误")
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 scheme = {
     'v': 'y',
     'iong': 's',
-    'uang': 's',
+    'ong': 's',
     'iang': 'd',
     'uang': 'd',
     'uan': 'r',
@@ -31,3 +31,19 @@ scheme = {
     'ou': 'b',
     'in': 'n',
 }
+
+# 零声母音节：以o键作为声母，后接韵母键位(单字母韵母为其本身)
+zero_initial = {
+    'a': 'oa',
+    'o': 'oo',
+    'e': 'oe',
+    'ai': 'ol',
+    'ei': 'oz',
+    'ao': 'ok',
+    'ou': 'ob',
+    'an': 'oj',
+    'en': 'of',
+    'er': 'or',
+    'ang': 'oh',
+    'eng': 'og',
+}
@@ -10,7 +10,7 @@ scheme = {
     'uan': 'r',
     'iao': 'n',
     'ian': 'm',
-    'ui': 'q',
+    'iu': 'q',
     'ei': 'w',
     'ue': 't',
     've': 't',
@@ -31,3 +31,19 @@ scheme = {
     'zh': 'v',
     'in': 'b',
 }
+
+# 零声母音节：单字母韵母双写，双字母韵母保持原样，三字母韵母为首字母+韵母键位
+zero_initial = {
+    'a': 'aa',
+    'o': 'oo',
+    'e': 'ee',
+    'ai': 'ai',
+    'ei': 'ei',
+    'ao': 'ao',
+    'ou': 'ou',
+    'an': 'an',
+    'en': 'en',
+    'er': 'er',
+    'ang': 'ah',
+    'eng': 'eg',
+}
@@ -30,3 +30,19 @@ scheme = {
     'ou': 'b',
     'in': 'n',
 }
+
+# 零声母音节：单字母韵母双写，双字母韵母保持原样，三字母韵母为首字母+韵母键位
+zero_initial = {
+    'a': 'aa',
+    'o': 'oo',
+    'e': 'ee',
+    'ai': 'ai',
+    'ei': 'ei',
+    'ao': 'ao',
+    'ou': 'ou',
+    'an': 'an',
+    'en': 'en',
+    'er': 'er',
+    'ang': 'ah',
+    'eng': 'eg',
+}
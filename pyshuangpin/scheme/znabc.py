@@ -14,7 +14,7 @@ scheme = {
     'ch': 'e',
     'er': 'r',
     'iu': 'r',
-    'ou': 'o',
+    'uo': 'o',
     'zh': 'a',
     'ia': 'd',
     'ua': 'd',
@@ -31,3 +31,19 @@ scheme = {
     'ue': 'm',
     'ui': 'm',
 }
+
+# 零声母音节：以o键作为声母，后接韵母键位(单字母韵母为其本身)
+zero_initial = {
+    'a': 'oa',
+    'o': 'oo',
+    'e': 'oe',
+    'ai': 'ol',
+    'ei': 'oq',
+    'ao': 'ok',
+    'ou': 'ob',
+    'an': 'oj',
+    'en': 'of',
+    'er': 'or',
+    'ang': 'oh',
+    'eng': 'og',
+}
@@ -0,0 +1,253 @@
+"""
+构建阶段调度模块 - 按依赖关系执行词库生成的各个阶段
+
+主要功能：
+1. 以有向无环图描述构建阶段(解析数据源、生成词库、转换双拼、写出Rime词库等)
+2. 依赖全部完成的阶段可以并发执行，输出已是最新的阶段直接跳过
+3. 统计各阶段耗时并报告关键路径
+4. 并发执行时收集各阶段的输出，阶段完成后由调度线程整段输出，不同阶段的输出不会交错
+"""
+
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# 阶段状态
+STATUS_DONE = 'done'
+STATUS_SKIPPED = 'skipped'
+
+
+class Stage:
+    """
+    构建阶段
+
+    执行函数签名为 func(results)，results为已完成阶段名称到结果的映射；
+    is_fresh签名相同，返回True时跳过该阶段，结果为None。
+    """
+
+    def __init__(self, name: str, func: Callable[[Dict[str, Any]], Any],
+                 deps: Iterable[str] = (), is_fresh: Callable[[Dict[str, Any]], bool] = None):
+        """
+        初始化构建阶段
+
+        Args:
+            name: 阶段名称
+            func: 执行函数
+            deps: 依赖的阶段名称
+            is_fresh: 判断输出是否已是最新的函数，为None时总是执行
+        """
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.is_fresh = is_fresh
+        self.status: Optional[str] = None
+        self.duration = 0.0
+        self.output = ''
+
+
+class _StageOutput:
+    """
+    并发执行阶段时替代sys.stdout，阶段线程的输出写入该线程的缓冲区，其他线程直接输出
+
+    阶段中创建的fork子进程会继承缓冲区，子进程中的输出不经缓冲区直接写出。
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+        self._pid = os.getpid()
+
+    def capture(self):
+        """开始收集当前线程的输出"""
+        self._local.buffer = []
+
+    def release(self) -> str:
+        """结束收集当前线程的输出并返回收集到的文本"""
+        buffer = self._local.buffer
+        self._local.buffer = None
+        return ''.join(buffer)
+
+    def _buffer(self) -> Optional[List[str]]:
+        if os.getpid() != self._pid:
+            return None
+        return getattr(self._local, 'buffer', None)
+
+    def write(self, text: str) -> int:
+        buffer = self._buffer()
+        if buffer is None:
+            return self.stream.write(text)
+        buffer.append(text)
+        return len(text)
+
+    def flush(self):
+        if self._buffer() is None:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class StageScheduler:
+    """
+    构建阶段调度器
+    """
+
+    def __init__(self, metrics=None):
+        """
+        初始化调度器
+
+        Args:
+            metrics: 可选的构建指标(build_metrics.BuildMetrics)，记录每个阶段的状态、耗时和内存峰值
+        """
+        self.stages: Dict[str, Stage] = {}
+        self.results: Dict[str, Any] = {}
+        self.metrics = metrics
+
+    def add_stage(self, name: str, func: Callable[[Dict[str, Any]], Any],
+                  deps: Iterable[str] = (), is_fresh: Callable[[Dict[str, Any]], bool] = None) -> Stage:
+        """
+        添加构建阶段，依赖的阶段需要先添加
+
+        Args:
+            name: 阶段名称
+            func: 执行函数
+            deps: 依赖的阶段名称
+            is_fresh: 判断输出是否已是最新的函数
+
+        Returns:
+            添加的阶段
+
+        Raises:
+            ValueError: 阶段重名或依赖的阶段不存在
+        """
+        if name in self.stages:
+            raise ValueError(f"构建阶段重复: {name}")
+        stage = Stage(name, func, deps, is_fresh)
+        for dep in stage.deps:
+            if dep not in self.stages:
+                raise ValueError(f"构建阶段 {name} 依赖的阶段 {dep} 不存在")
+        self.stages[name] = stage
+        return stage
+
+    def _execute(self, stage: Stage) -> Any:
+        """执行单个阶段，输出已是最新时跳过"""
+        measure = self.metrics.measure_stage(stage.name) if self.metrics is not None else nullcontext()
+        start = time.perf_counter()
+        try:
+            with measure:
+                if stage.is_fresh is not None and stage.is_fresh(self.results):
+                    stage.status = STATUS_SKIPPED
+                    return None
+                result = stage.func(self.results)
+                stage.status = STATUS_DONE
+                return result
+        finally:
+            stage.duration = time.perf_counter() - start
+            if self.metrics is not None:
+                self.metrics.record_stage(stage.name, status=stage.status)
+
+    def _execute_captured(self, stage: Stage, output: _StageOutput) -> Any:
+        """在线程池中执行单个阶段，阶段的输出保存到stage.output"""
+        output.capture()
+        try:
+            return self._execute(stage)
+        finally:
+            stage.output = output.release()
+
+    def run(self, max_workers: int = 1) -> Dict[str, Any]:
+        """
+        按依赖关系执行所有阶段
+
+        max_workers为1时按添加顺序依次执行；大于1时在线程池中并发执行依赖已完成的阶段，
+        各阶段内部的计算密集任务可以再提交到进程池。并发执行时各阶段的print输出先被收集，
+        阶段完成后由调度线程整段输出。
+
+        Args:
+            max_workers: 同时执行的阶段数
+
+        Returns:
+            阶段名称到结果的映射，跳过的阶段结果为None
+        """
+        if max_workers <= 1:
+            # 添加阶段时已保证依赖在前，按添加顺序执行即满足依赖关系
+            for stage in self.stages.values():
+                self.results[stage.name] = self._execute(stage)
+            return self.results
+
+        remaining = {name: set(stage.deps) for name, stage in self.stages.items()}
+        dependents: Dict[str, List[str]] = {name: [] for name in self.stages}
+        for name, stage in self.stages.items():
+            for dep in stage.deps:
+                dependents[dep].append(name)
+
+        output = _StageOutput(sys.stdout)
+        sys.stdout = output
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                running = {}
+
+                def submit_ready():
+                    for name in [name for name, deps in remaining.items() if not deps]:
+                        del remaining[name]
+                        running[pool.submit(self._execute_captured, self.stages[name], output)] = name
+
+                submit_ready()
+                while running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        output.stream.write(self.stages[name].output)
+                        output.stream.flush()
+                        # 阶段失败时等待已提交的阶段结束后抛出异常
+                        self.results[name] = future.result()
+                        for dependent in dependents[name]:
+                            remaining[dependent].discard(name)
+                    submit_ready()
+        finally:
+            sys.stdout = output.stream
+
+        return self.results
+
+    def critical_path(self) -> Tuple[List[str], float]:
+        """
+        计算关键路径，即依赖链上阶段耗时之和最大的路径
+
+        Returns:
+            (阶段名称列表, 总耗时秒数)
+        """
+        finish: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+        for name, stage in self.stages.items():
+            slowest = max(stage.deps, key=lambda dep: finish[dep], default=None)
+            previous[name] = slowest
+            finish[name] = stage.duration + (finish[slowest] if slowest is not None else 0.0)
+
+        if not finish:
+            return [], 0.0
+        last = max(finish, key=finish.get)
+        path = []
+        node = last
+        while node is not None:
+            path.append(node)
+            node = previous[node]
+        return path[::-1], finish[last]
+
+    def report(self) -> str:
+        """
+        生成执行报告
+
+        Returns:
+            包含执行和跳过的阶段数以及关键路径的文本
+        """
+        executed = [stage.name for stage in self.stages.values() if stage.status == STATUS_DONE]
+        skipped = [stage.name for stage in self.stages.values() if stage.status == STATUS_SKIPPED]
+        path, total = self.critical_path()
+        lines = [f"构建阶段: 执行 {len(executed)} 个，跳过 {len(skipped)} 个"]
+        if skipped:
+            lines.append(f"已跳过: {', '.join(skipped)}")
+        lines.append(f"关键路径: {' -> '.join(path)} ({total:.2f} 秒)")
+        return '\n'.join(lines)
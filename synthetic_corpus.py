@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+合成颜文字语料生成工具 - 为性能测试生成与真实数据源格式一致的输入
+
+主要功能：
+1. 随机组合颜文字和中文描述，生成lmeee、sougou、Temreg、custom_phrase、A_kaomoji五种格式的数据源
+2. 颜文字和描述从有限的组合中抽取，不同数据源之间存在重复条目，与真实数据相似
+3. 使用固定的随机种子，相同参数生成的语料完全一致
+
+使用方法:
+    python synthetic_corpus.py [options]
+
+选项:
+    --output-dir DIR       指定输出目录 (默认: bench_data)
+    --size N               每种格式生成的条目数，支持10k、1M等写法 (默认: 10k)
+    --seed N               随机种子 (默认: 0)
+    --help                 显示帮助信息
+"""
+
+import argparse
+import os
+import random
+from typing import Dict, Iterator, List, Tuple
+
+# 数据源格式到文件名的映射，文件名与data目录下的真实数据源一致
+SOURCE_FILENAMES = {
+    'A_kaomoji': 'A_kaomoji_dict_data.txt',
+    'custom_phrase': 'custom_phrase_dict_data.txt',
+    'lmeee': 'lmeee_dict_data.txt',
+    'sougou': 'sougou_dict_data.txt',
+    'Temreg': 'Temreg_dict_data.txt'
+}
+
+# 描述词汇及其拼音
+_WORDS: List[Tuple[str, str]] = [
+    ('开心', 'kai xin'), ('哭', 'ku'), ('生气', 'sheng qi'), ('害羞', 'hai xiu'), ('好的', 'hao de'),
+    ('同意', 'tong yi'), ('惊讶', 'jing ya'), ('无语', 'wu yu'), ('晚安', 'wan an'), ('早安', 'zao an'),
+    ('拜拜', 'bai bai'), ('谢谢', 'xie xie'), ('抱抱', 'bao bao'), ('亲亲', 'qin qin'), ('喜欢', 'xi huan'),
+    ('委屈', 'wei qu'), ('难过', 'nan guo'), ('得意', 'de yi'), ('卖萌', 'mai meng'), ('摸鱼', 'mo yu'),
+    ('加油', 'jia you'), ('困', 'kun'), ('饿', 'e'), ('吃饭', 'chi fan'), ('睡觉', 'shui jiao'),
+    ('跑', 'pao'), ('跳舞', 'tiao wu'), ('唱歌', 'chang ge'), ('鼓掌', 'gu zhang'), ('点赞', 'dian zan'),
+    ('疑问', 'yi wen'), ('思考', 'si kao'), ('发呆', 'fa dai'), ('偷笑', 'tou xiao'), ('大笑', 'da xiao'),
+    ('擦汗', 'ca han'), ('流泪', 'liu lei'), ('愤怒', 'fen nu'), ('掀桌', 'xian zhuo'), ('投降', 'tou xiang'),
+    ('猫', 'mao'), ('狗', 'gou'), ('熊', 'xiong'), ('兔子', 'tu zi'), ('小鸟', 'xiao niao'),
+    ('爱心', 'ai xin'), ('星星', 'xing xing'), ('花', 'hua'), ('音乐', 'yin yue'), ('庆祝', 'qing zhu'),
+    ('平安', 'ping an'), ('西安', 'xi an'), ('答案', 'da an'), ('女儿', 'nv er'), ('略略', 'lve lve'),
+]
+
+# 英文缩写编码，用于覆盖无法切分为拼音音节的编码
+_ABBREVIATIONS = ['awsl', 'orz', 'qwq', 'yyds', 'xswl', 'kx', 'ok', 'emmm']
+
+# 颜文字组件
+_LEFT = ['(', '（', 'ヽ(', 'o(', '(〃', '\\(', 'Σ(', '(ノ', 'ฅ(', '٩(', '(っ', '(*']
+_EYES = ['ﾟ', '・', '≧', '^', '´', 'T', '>', '˘', '◕', '￣', 'ω', '⊙', '≖', '•̀', 'ᵔ']
+_MOUTHS = ['∀', 'ω', '▽', '口', 'Д', '_', '‿', 'ε', '益', 'ᴗ', 'ロ', '︿', '∇', '△']
+_RIGHT = [')', '）', ')ノ', ')o', ')〃', ')/', ')ﾉ', ')و', ')ฅ', ')っ', '*)', ')✧']
+_DECORATIONS = ['', '', '', '✿', '♡', '☆', '~', '💦', '彡', '↑↑']
+
+
+def parse_size(text: str) -> int:
+    """
+    解析条目数，支持 10k、100K、1M 等写法
+
+    Args:
+        text: 条目数文本
+
+    Returns:
+        条目数
+    """
+    text = text.strip().lower()
+    multiplier = 1
+    if text.endswith('k'):
+        multiplier, text = 1000, text[:-1]
+    elif text.endswith('m'):
+        multiplier, text = 1000000, text[:-1]
+    return int(float(text) * multiplier)
+
+
+def _make_kaomoji(rng: random.Random) -> str:
+    """随机组合一个颜文字，部分带普通空格或需要移除的前缀"""
+    eye = rng.choice(_EYES)
+    inner = f"{eye}{rng.choice(_MOUTHS)}{rng.choice(_EYES) if rng.random() < 0.2 else eye}"
+    if rng.random() < 0.25:
+        inner = f" {inner} "
+    kaomoji = f"{rng.choice(_LEFT)}{inner}{rng.choice(_RIGHT)}{rng.choice(_DECORATIONS)}"
+    if rng.random() < 0.02:
+        kaomoji = '---' + kaomoji
+    return kaomoji
+
+
+def _make_description(rng: random.Random) -> Tuple[str, str]:
+    """随机组合一到三个词作为描述，返回 (描述, 拼音)"""
+    words = rng.sample(_WORDS, rng.choice((1, 1, 2, 2, 3)))
+    return ''.join(word for word, _ in words), ' '.join(pinyin for _, pinyin in words)
+
+
+class _Vocabulary:
+    """
+    有限的颜文字和描述候选集，从中抽样以产生跨数据源的重复条目
+    """
+
+    def __init__(self, rng: random.Random, size: int):
+        self.rng = rng
+        pool_size = max(16, int(size * 0.8))
+        self.kaomoji = [_make_kaomoji(rng) for _ in range(pool_size)]
+        self.descriptions = [_make_description(rng) for _ in range(max(16, min(pool_size, 20000)))]
+
+    def entry(self) -> Tuple[str, str, str]:
+        """抽取一个条目，返回 (颜文字, 描述, 拼音)"""
+        description, pinyin_str = self.rng.choice(self.descriptions)
+        return self.rng.choice(self.kaomoji), description, pinyin_str
+
+    def code(self, pinyin_str: str) -> str:
+        """按真实数据的分布生成编码：带空格的全拼、不带空格的全拼或英文缩写"""
+        roll = self.rng.random()
+        if roll < 0.5:
+            return pinyin_str
+        if roll < 0.9:
+            return pinyin_str.replace(' ', '')
+        return self.rng.choice(_ABBREVIATIONS)
+
+
+def generate_lines(source_format: str, size: int, seed: int = 0) -> Iterator[str]:
+    """
+    生成指定格式的数据源行
+
+    Args:
+        source_format: 数据源格式名称(见SOURCE_FILENAMES)
+        size: 条目数
+        seed: 随机种子
+
+    Returns:
+        数据源行的迭代器，每行以换行符结尾
+    """
+    if source_format not in SOURCE_FILENAMES:
+        raise ValueError(f"未知的数据源格式: {source_format}")
+
+    # 每种格式使用独立的随机序列，但共用同一个颜文字候选集
+    vocabulary = _Vocabulary(random.Random(seed), size)
+    vocabulary.rng = random.Random(f"{seed}:{source_format}")
+    for _ in range(size):
+        kaomoji, description, pinyin_str = vocabulary.entry()
+        if source_format == 'lmeee':
+            if vocabulary.rng.random() < 0.05:
+                description += '~'  # 含符号的描述不会生成拼音条目
+            yield (f'<li class=""><p>{kaomoji}</p><span class="copyBtn" data-desc="{description}" '
+                   f'data-clipboard-text="{kaomoji}">{description}</span></li>\n')
+        elif source_format == 'sougou':
+            yield (f'<div class="ywz_content">{kaomoji}</div>\t'
+                   f'<div class="ywz_cont_name">输入文字：{description}</div>\n')
+        elif source_format == 'Temreg':
+            yield f"{kaomoji}\t{vocabulary.code(pinyin_str)}\t0\n"
+        elif source_format == 'custom_phrase':
+            yield f"{vocabulary.code(pinyin_str)}    {kaomoji}\n"
+        else:
+            yield f"{kaomoji}\n"
+
+
+def write_corpus(output_dir: str, size: int, seed: int = 0) -> Dict[str, str]:
+    """
+    生成全部五种格式的数据源文件
+
+    Args:
+        output_dir: 输出目录
+        size: 每种格式的条目数
+        seed: 随机种子
+
+    Returns:
+        数据源格式到文件路径的映射
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {}
+    for source_format, filename in SOURCE_FILENAMES.items():
+        paths[source_format] = os.path.join(output_dir, filename)
+        with open(paths[source_format], 'w', encoding='utf-8') as file:
+            file.writelines(generate_lines(source_format, size, seed))
+    return paths
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='合成颜文字语料生成工具')
+    parser.add_argument('--output-dir', type=str, default='bench_data',
+                        help='指定输出目录 (默认: bench_data)')
+    parser.add_argument('--size', type=str, default='10k',
+                        help='每种格式生成的条目数，支持10k、1M等写法 (默认: 10k)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='随机种子 (默认: 0)')
+    args = parser.parse_args()
+
+    paths = write_corpus(args.output_dir, parse_size(args.size), args.seed)
+    for source_format, path in paths.items():
+        print(f"{source_format}: {path}")
+
+
+if __name__ == "__main__":
+    main()